@@ -0,0 +1,149 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+
+GENERATION_KEY = 'catalog:generation'
+HITS_KEY = 'catalog:hits'
+MISSES_KEY = 'catalog:misses'
+
+
+def get_response_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def catalog_generation():
+    '''
+    Current catalog generation. A generation lost to eviction or a
+    restart starts again from the clock, so it never meets the keys
+    of responses cached before.
+    '''
+    cache = get_response_cache()
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_catalog_generation():
+    '''
+    Starts a new catalog generation once the current transaction
+    commits, so no response of the old data is cached under it.
+    '''
+    transaction.on_commit(_bump_catalog_generation)
+
+
+def _bump_catalog_generation():
+    cache = get_response_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def _count(key):
+    cache = get_response_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def response_cache_stats():
+    cache = get_response_cache()
+    return {
+        'generation': cache.get(GENERATION_KEY),
+        'hits': cache.get(HITS_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0),
+    }
+
+
+class CatalogCacheMixin:
+    '''
+    Caches the successful GET responses of a catalog view by path and
+    catalog generation, imports and shop status changes bump the
+    generation, which invalidates all of them at once. The X-Cache
+    header tells a hit from a miss.
+    '''
+    cache_key_prefix = None
+
+    def get_response_cache_key(self, request):
+        prefix = self.cache_key_prefix or type(self).__name__
+        return (
+            f'response:{prefix}:{catalog_generation()}:'
+            f'{request.get_full_path()}'
+        )
+
+    def cached_response(self, request, build, *args, **kwargs):
+        cache = get_response_cache()
+        key = self.get_response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            _count(HITS_KEY)
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        _count(MISSES_KEY)
+        response = build(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, super().retrieve, *args, **kwargs
+        )
+
+
+class CatalogETagMixin:
+    '''
+    Strong ETags for the GET responses of a catalog view, a hash of the
+    catalog generation, the path with its query and the accepted media
+    type. A matching If-None-Match is answered with 304 before the
+    queryset or the serializer are touched.
+    '''
+    def get_etag(self, request):
+        key = '\n'.join((
+            str(catalog_generation()),
+            request.get_full_path(),
+            request.META.get('HTTP_ACCEPT', ''),
+        ))
+        return f'"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+
+    def conditional_response(self, request, build, *args, **kwargs):
+        etag = self.get_etag(request)
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = [
+                tag.removeprefix('W/') for tag in parse_etags(if_none_match)
+            ]
+            if '*' in etags or etag in etags:
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+                response['ETag'] = etag
+                return response
+        response = build(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, super().retrieve, *args, **kwargs
+        )
@@ -0,0 +1,126 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from rest_framework.renderers import BaseRenderer
+
+from .fastpath import ProductInfoValuesSerializer
+from .models import Parameter
+
+
+CSV_COLUMNS = (
+    'id', 'external_id', 'product', 'category', 'name', 'model', 'price',
+    'price_rrc', 'quantity', 'shop',
+)
+
+
+class NDJSONRenderer(BaseRenderer):
+    '''
+    One JSON document per line, the export streams its items itself,
+    this renders the error responses.
+    '''
+    media_type = 'application/x-ndjson'
+    format = 'jsonl'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return (json.dumps(data, ensure_ascii=False) + '\n').encode()
+
+
+class CSVRenderer(BaseRenderer):
+    '''
+    CSV with a header row, the export streams its rows itself, this
+    renders the error responses as a row of their values.
+    '''
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, dict):
+            data = {'detail': data}
+        stream = io.StringIO()
+        writer = csv.writer(stream)
+        writer.writerow(data)
+        writer.writerow(data.values())
+        return stream.getvalue().encode()
+
+
+class Echo:
+    '''
+    File-like object that returns what is written, csv.writer
+    then returns each row as a string.
+    '''
+    def write(self, value):
+        return value
+
+
+def iter_product_chunks(queryset, chunk_size):
+    '''
+    Lists of /products items of the product info in queryset, read
+    through a server-side cursor chunk_size rows at a time with the
+    parameters of each chunk loaded in one query.
+    '''
+    values_serializer = ProductInfoValuesSerializer()
+    rows = values_serializer.values(queryset).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield values_serializer.serialize(chunk)
+
+
+def export_parameter_names():
+    '''
+    Names of all parameters, read from the small Parameter table so
+    the header does not wait for a scan of the exported catalog, a
+    column may be empty for the exported goods.
+    '''
+    return list(
+        Parameter.objects.order_by('name').values_list('name', flat=True)
+    )
+
+
+def stream_ndjson(queryset, chunk_size):
+    for items in iter_product_chunks(queryset, chunk_size):
+        yield ''.join(
+            json.dumps(item, ensure_ascii=False) + '\n' for item in items
+        )
+
+
+def stream_csv(queryset, chunk_size):
+    '''
+    CSV rows of the product info, a column per parameter as in the
+    CSV price lists.
+    '''
+    writer = csv.writer(Echo())
+    parameter_names = export_parameter_names()
+    yield writer.writerow(CSV_COLUMNS + tuple(parameter_names))
+    for items in iter_product_chunks(queryset, chunk_size):
+        lines = []
+        for item in items:
+            parameters = {
+                parameter['parameter']: parameter['value']
+                for parameter in item['product_parameters']
+            }
+            lines.append(writer.writerow([
+                item['id'],
+                item['external_id'],
+                item['product']['name'],
+                item['product']['category'],
+                item['name'],
+                item['model'],
+                item['price'],
+                item['price_rrc'],
+                item['quantity'],
+                item['shop'],
+                *(parameters.get(name, '') for name in parameter_names),
+            ]))
+        yield ''.join(lines)
+
+
+STREAMS = {
+    'jsonl': stream_ndjson,
+    'csv': stream_csv,
+}
@@ -0,0 +1,154 @@
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .models import OrderItem, ProductParameter
+from .serializers import OrderSerializer, ProductInfoSerializer
+
+
+class ValuesSerializer:
+    '''
+    Builds the items of serializer_class from values() rows of the
+    page and a few lookups keyed by id, without serializer instances
+    or per-field to_representation calls. field_names is the output
+    order, the fast path is skipped when serializer_class renders
+    other fields.
+    '''
+    serializer_class = None
+    field_names = ()
+    value_fields = ()
+
+    @classmethod
+    def matches_serializer(cls):
+        if '_matches' not in cls.__dict__:
+            cls._matches = (
+                tuple(cls.serializer_class().fields) == cls.field_names
+            )
+        return cls._matches
+
+    def values(self, queryset):
+        '''
+        Rows of the queryset with pk and its annotations, which the
+        keyset paginator reads for the cursor.
+        '''
+        return queryset.select_related(None).prefetch_related(None).values(
+            'pk', *self.value_fields, *queryset.query.annotations
+        )
+
+    def serialize(self, rows):
+        raise NotImplementedError
+
+
+class ProductInfoValuesSerializer(ValuesSerializer):
+    serializer_class = ProductInfoSerializer
+    field_names = (
+        'id', 'product', 'product_parameters', 'external_id', 'name',
+        'model', 'quantity', 'price', 'price_rrc', 'shop',
+    )
+    value_fields = (
+        'id', 'product__name', 'product__category__name', 'external_id',
+        'name', 'model', 'quantity', 'price', 'price_rrc', 'shop_id',
+    )
+
+    def serialize(self, rows):
+        parameters = {row['id']: [] for row in rows}
+        for product_info_id, name, value in ProductParameter.objects.filter(
+            product_info_id__in=parameters
+        ).order_by('id').values_list(
+            'product_info_id', 'parameter__name', 'value'
+        ):
+            parameters[product_info_id].append(
+                {'parameter': name, 'value': value}
+            )
+        return [
+            {
+                'id': row['id'],
+                'product': {
+                    'name': row['product__name'],
+                    'category': row['product__category__name'],
+                },
+                'product_parameters': parameters[row['id']],
+                'external_id': row['external_id'],
+                'name': row['name'],
+                'model': row['model'],
+                'quantity': row['quantity'],
+                'price': row['price'],
+                'price_rrc': row['price_rrc'],
+                'shop': row['shop_id'],
+            }
+            for row in rows
+        ]
+
+
+class OrderValuesSerializer(ValuesSerializer):
+    serializer_class = OrderSerializer
+    field_names = ('id', 'user', 'items', 'total_sum', 'dt', 'status')
+    value_fields = ('id', 'user_id', 'dt', 'status')
+
+    # formats dt like the serializer, honouring DATETIME_FORMAT
+    dt_field = serializers.DateTimeField()
+
+    def values(self, queryset):
+        if 'total_sum' not in queryset.query.annotations:
+            queryset = queryset.with_total_sum()
+        return super().values(queryset)
+
+    def serialize(self, rows):
+        items = {row['id']: [] for row in rows}
+        for order_id, product_info_id, quantity in (
+            OrderItem.objects.filter(order_id__in=items).order_by(
+                'id'
+            ).values_list('order_id', 'product_info_id', 'quantity')
+        ):
+            items[order_id].append(
+                {'product_info': product_info_id, 'quantity': quantity}
+            )
+        to_representation = self.dt_field.to_representation
+        return [
+            {
+                'id': row['id'],
+                'user': row['user_id'],
+                'items': items[row['id']],
+                'total_sum': row['total_sum'],
+                'dt': to_representation(row['dt']),
+                'status': row['status'],
+            }
+            for row in rows
+        ]
+
+
+class FastPathMixin:
+    '''
+    List view mixin that serves the list with values_serializer_class
+    when FAST_SERIALIZERS is on and the view renders serializer_class
+    with all of its fields, otherwise with the serializer.
+    '''
+    values_serializer_class = None
+
+    def use_fast_path(self):
+        values_serializer_class = self.values_serializer_class
+        if not settings.FAST_SERIALIZERS or values_serializer_class is None:
+            return False
+        # sparse fieldsets render with the serializer
+        get_sparse_fields = getattr(self, 'get_sparse_fields', None)
+        if get_sparse_fields and get_sparse_fields() != (None, None):
+            return False
+        return (
+            self.get_serializer_class()
+            is values_serializer_class.serializer_class
+            and values_serializer_class.matches_serializer()
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_path():
+            return super().list(request, *args, **kwargs)
+        values_serializer = self.values_serializer_class()
+        queryset = values_serializer.values(
+            self.filter_queryset(self.get_queryset())
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                values_serializer.serialize(page)
+            )
+        return Response(values_serializer.serialize(list(queryset)))
@@ -0,0 +1,65 @@
+import tempfile
+from collections import namedtuple
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+FetchResult = namedtuple(
+    'FetchResult', ('file', 'etag', 'last_modified', 'content_type')
+)
+
+
+def make_session():
+    '''
+    HTTP session with a connection pool shared by all price list fetches
+    of the worker process.
+    '''
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=settings.PRICE_LIST_FETCH_POOL_SIZE,
+        pool_maxsize=settings.PRICE_LIST_FETCH_POOL_SIZE,
+        max_retries=settings.PRICE_LIST_FETCH_RETRIES,
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+session = make_session()
+
+
+def fetch_price_list(url, etag='', last_modified=''):
+    '''
+    Downloads the price list at url into a temporary file.
+
+    The request is conditional on the etag and last_modified of the
+    previous fetch, None is returned when the server answers
+    304 Not Modified.
+    '''
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    with session.get(
+        url,
+        headers=headers,
+        stream=True,
+        timeout=settings.PRICE_LIST_FETCH_TIMEOUT
+    ) as response:
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        file = tempfile.TemporaryFile()
+        for chunk in response.iter_content(chunk_size=2 ** 16):
+            file.write(chunk)
+        file.seek(0)
+        return FetchResult(
+            file,
+            response.headers.get('ETag', ''),
+            response.headers.get('Last-Modified', ''),
+            response.headers.get('Content-Type', ''),
+        )
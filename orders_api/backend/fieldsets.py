@@ -0,0 +1,120 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+def parse_field_list(value):
+    '''
+    Field names of a comma separated query parameter, None if absent.
+    '''
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class SparseFieldsMixin:
+    '''
+    Model serializer mixin for sparse fieldsets. ``fields`` keeps only
+    the named fields, ``expand`` renders only the named relations of
+    Meta.expandable_fields nested and the other ones as primary keys.
+    Unknown names are ignored.
+    '''
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        expandable = getattr(self.Meta, 'expandable_fields', ())
+        self.expanded = set(expandable)
+        if expand is not None:
+            self.expanded &= set(expand)
+            for name in expandable:
+                if name in self.fields and name not in self.expanded:
+                    self.fields[name] = self.build_shallow_field(
+                        name, self.fields[name]
+                    )
+
+    @staticmethod
+    def build_shallow_field(name, field):
+        kwargs = {}
+        if field.source != name:
+            kwargs['source'] = field.source
+        return serializers.PrimaryKeyRelatedField(
+            read_only=True,
+            many=isinstance(field, serializers.ListSerializer),
+            **kwargs
+        )
+
+    def get_loaded_fields(self):
+        '''
+        Names of the model fields read by the serializer fields or
+        None if some field reads the whole instance.
+        '''
+        opts = self.Meta.model._meta
+        names = {opts.pk.name}
+        for field in self.fields.values():
+            if field.source == '*':
+                return None
+            try:
+                model_field = opts.get_field(field.source.split('.')[0])
+            except FieldDoesNotExist:
+                return None
+            if model_field.concrete and not model_field.many_to_many:
+                names.add(model_field.name)
+        return names
+
+    def narrow_queryset(self, queryset, extra=()):
+        '''
+        Defers the model fields the serializer does not read, extra
+        are loaded anyway, e.g. the fields a paginator reads.
+        '''
+        names = self.get_loaded_fields()
+        if names is None:
+            return queryset
+        return queryset.only(*names, *extra)
+
+
+class SparseFieldsParamsMixin:
+    '''
+    View mixin that reads the ?fields= and ?expand= lists, APIViews
+    pass them to their SparseFieldsMixin serializer themselves.
+    '''
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def get_sparse_fields(self):
+        params = self.request.query_params
+        return (
+            parse_field_list(params.get(self.fields_query_param)),
+            parse_field_list(params.get(self.expand_query_param)),
+        )
+
+
+class SparseFieldsViewMixin(SparseFieldsParamsMixin):
+    '''
+    Generic view mixin that passes the ?fields= and ?expand= lists to
+    a SparseFieldsMixin serializer and narrows the queryset to what it
+    reads, together with the ordering fields of the view.
+    '''
+
+    def get_serializer(self, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, SparseFieldsMixin):
+            fields, expand = self.get_sparse_fields()
+            kwargs.setdefault('fields', fields)
+            kwargs.setdefault('expand', expand)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields, expand = self.get_sparse_fields()
+        serializer_class = self.get_serializer_class()
+        if (fields is None and expand is None) or not issubclass(
+            serializer_class, SparseFieldsMixin
+        ):
+            return queryset
+        ordering_fields = getattr(self, 'ordering_fields', None)
+        if not isinstance(ordering_fields, (list, tuple)):
+            ordering_fields = ()
+        return self.get_serializer().narrow_queryset(
+            queryset, ordering_fields
+        )
@@ -0,0 +1,166 @@
+import math
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Exists, F, FloatField, OuterRef
+from django.db.models.functions import Cast
+from django_filters import rest_framework as django_filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+from .models import CatalogEntry, Parameter, ProductParameter
+
+
+SEARCH_CONFIG = 'russian'
+
+
+class CatalogEntryFilterSet(django_filters.FilterSet):
+    '''
+    The filterset_fields of the product listing on catalog entries.
+    '''
+    shop_id = django_filters.NumberFilter(field_name='shop_id')
+    product__category_id = django_filters.NumberFilter(
+        field_name='category_id'
+    )
+
+    class Meta:
+        model = CatalogEntry
+        fields = ['shop_id', 'product__category_id']
+
+
+class ProductSearchFilter(BaseFilterBackend):
+    '''
+    Full-text search of product info on Product.search_vector (name and
+    category name, GIN indexed) with Russian stemming.
+
+    Takes the ``?search=`` parameter of SearchFilter: every word has to
+    match, as a prefix of a word of the product or category name. The
+    results are ranked unless an explicit ordering is requested.
+    '''
+    search_param = api_settings.SEARCH_PARAM
+    ordering_param = api_settings.ORDERING_PARAM
+    search_field = 'product__search_vector'
+
+    def get_search_query(self, request):
+        terms = re.findall(r'\w+', request.query_params.get(
+            self.search_param, ''
+        ))
+        if not terms:
+            return None
+        return SearchQuery(
+            ' & '.join(f'{term}:*' for term in terms),
+            config=SEARCH_CONFIG,
+            search_type='raw'
+        )
+
+    def filter_queryset(self, request, queryset, view):
+        query = self.get_search_query(request)
+        if query is None:
+            return queryset
+        # ts_rank is a real, as double precision the rank round-trips
+        # exactly through the pagination cursor
+        queryset = queryset.filter(**{self.search_field: query}).annotate(
+            rank=Cast(SearchRank(F(self.search_field), query), FloatField())
+        )
+        if request.query_params.get(self.ordering_param):
+            return queryset
+        return queryset.order_by('-rank')
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.search_param,
+                'required': False,
+                'in': 'query',
+                'description': (
+                    'Full-text search in product and category names.'
+                ),
+                'schema': {'type': 'string'},
+            },
+        ]
+
+
+class ProductParameterFilter(BaseFilterBackend):
+    '''
+    Filters product info by parameter values with
+    ``?param[<name>]=<value>``. Repeated values of a parameter match
+    any of them, different parameters all have to match.
+    ``?param_min[<name>]=<number>`` and ``?param_max[<name>]=<number>``
+    filter by the numeric value of a parameter, inclusive.
+    '''
+    param_pattern = re.compile(r'^(param|param_min|param_max)\[(.+)\]$')
+    lookups = {
+        'param': 'value__in',
+        'param_min': 'numeric_value__gte',
+        'param_max': 'numeric_value__lte',
+    }
+
+    def get_parameter_lookups(self, request):
+        parameters = {}
+        for key in request.query_params:
+            match = self.param_pattern.match(key)
+            if not match:
+                continue
+            kind, name = match.groups()
+            if kind == 'param':
+                value = request.query_params.getlist(key)
+            else:
+                value = self.get_number(key, request.query_params[key])
+            parameters.setdefault(name, {})[self.lookups[kind]] = value
+        return parameters
+
+    def get_number(self, key, value):
+        try:
+            number = float(value.replace(',', '.'))
+        except ValueError:
+            number = math.nan
+        if not math.isfinite(number):
+            raise ValidationError({key: 'A number is required.'})
+        return number
+
+    def filter_queryset(self, request, queryset, view):
+        parameters = self.get_parameter_lookups(request)
+        if not parameters:
+            return queryset
+        parameter_ids = dict(
+            Parameter.objects.filter(name__in=list(parameters)).values_list(
+                'name', 'id'
+            )
+        )
+        if len(parameter_ids) < len(parameters):
+            return queryset.none()
+        for name, lookups in parameters.items():
+            queryset = queryset.filter(Exists(
+                ProductParameter.objects.filter(
+                    product_info=OuterRef('pk'),
+                    parameter_id=parameter_ids[name],
+                    **lookups
+                )
+            ))
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': 'param[<name>]',
+                'required': False,
+                'in': 'query',
+                'description': 'Value of the parameter <name>.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': 'param_min[<name>]',
+                'required': False,
+                'in': 'query',
+                'description': 'Minimum numeric value of the parameter.',
+                'schema': {'type': 'number'},
+            },
+            {
+                'name': 'param_max[<name>]',
+                'required': False,
+                'in': 'query',
+                'description': 'Maximum numeric value of the parameter.',
+                'schema': {'type': 'number'},
+            },
+        ]
@@ -0,0 +1,605 @@
+import hashlib
+import json
+import math
+import re
+from itertools import islice
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from .cache import bump_catalog_generation
+from .models import (
+    CatalogEntry,
+    Category,
+    Parameter,
+    Product,
+    ProductInfo,
+    ProductParameter,
+    Shop,
+)
+from .pricelist import make_item
+from .readmodel import (
+    rebuild_shop_catalog_entries,
+    refresh_catalog_entries,
+    refresh_product_offers,
+    shop_product_ids,
+)
+
+
+class QueryCounter:
+    '''
+    Database execute wrapper that counts the queries
+    issued while it is installed.
+    '''
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+NUMBER_PATTERN = re.compile(r'^\s*[+-]?\d+(?:[.,]\d+)?\s*$')
+
+
+def parse_number(value):
+    '''
+    Numeric value of a parameter value string (a decimal comma is
+    accepted) or None.
+    '''
+    if not NUMBER_PATTERN.match(value):
+        return None
+    number = float(value.replace(',', '.'))
+    return number if math.isfinite(number) else None
+
+
+def fingerprint_item(item):
+    '''
+    Hash of the canonical JSON form of a price list item. Parameter
+    values are hashed as stored (str), so the same item read from
+    different formats hashes the same.
+    '''
+    item = make_item(item)
+    canonical = json.dumps(
+        [
+            item.id, item.category, item.model, item.name,
+            item.price, item.price_rrc, item.quantity,
+            sorted((name, str(value)) for name, value in item.parameters),
+        ],
+        ensure_ascii=False
+    )
+    return hashlib.md5(canonical.encode()).hexdigest()
+
+
+class CatalogImporter:
+    '''
+    Imports a shop price list with set-based queries.
+
+    Categories, products and parameters are resolved in a handful
+    of queries per batch of goods and kept in in-memory id maps,
+    product info and product parameters are upserted with
+    bulk_create on their unique constraints (ON CONFLICT), so
+    concurrent imports neither race nor create duplicates.
+
+    In ``replace`` mode the goods are written into a new catalog
+    version batch by batch and the shop's active version is flipped
+    once they are all in, so readers never see a half-imported
+    catalog. Older versions are removed by collect_catalog_versions.
+    The catalog entries (read model) of the shop are rebuilt in the
+    transaction that flips the version.
+    In ``sync`` mode the goods are diffed against the active version
+    by external_id and only the changes are written, in a single
+    transaction. Goods whose fingerprint (content_hash) did not change
+    are skipped without loading their parameters. The catalog entries
+    of the written goods are refreshed batch by batch.
+    With PRODUCT_OFFER_ROLLUPS the ProductOffer rollups of the products
+    the shop offered before and after the import are refreshed too.
+
+    Goods are read as pricelist.Item (dicts are converted). Price lists
+    without a shop (CSV) are imported into the user's shop, categories
+    not listed in the price list are looked up or created from the
+    item's category_name.
+    '''
+    MODE_CHOICES = ('replace', 'sync')
+    UNIQUE_FIELDS = ('shop', 'external_id', 'version')
+    DIFF_FIELDS = ('product_id', 'model', 'price', 'price_rrc', 'quantity')
+    SYNC_FIELDS = DIFF_FIELDS + ('content_hash',)
+
+    batch_size = 1000
+
+    def __init__(self, user, mode='replace', batch_size=None, progress=None):
+        if mode not in self.MODE_CHOICES:
+            raise ValueError(f'unknown import mode: {mode}')
+        self.user = user
+        self.mode = mode
+        self.progress = progress
+        if batch_size:
+            self.batch_size = batch_size
+        self.parameter_ids = {}
+        self.category_ids = set()
+        self.report = {
+            'mode': mode,
+            'categories': 0,
+            'products': 0,
+            'goods': 0,
+            'inserted': 0,
+            'updated': 0,
+            'deleted': 0,
+            'retired': 0,
+            'parameters': 0,
+            'product_parameters': 0,
+            'queries': 0,
+            'duration': 0.0,
+        }
+
+    def run(self, data):
+        counter = QueryCounter()
+        start = perf_counter()
+        with connection.execute_wrapper(counter):
+            self.notify('categories')
+            with transaction.atomic():
+                shop = self.import_shop(data['shop'])
+                self.import_categories(shop, data['categories'])
+            try:
+                self.notify('goods')
+                if self.mode == 'sync':
+                    with transaction.atomic():
+                        self.sync_catalog(shop, data['goods'])
+                else:
+                    self.replace_catalog(shop, data['goods'])
+            finally:
+                # categories and shops may have changed even if the
+                # goods failed
+                bump_catalog_generation()
+        self.report['shop'] = shop.id
+        self.report['version'] = shop.catalog_version
+        self.report['queries'] = counter.count
+        self.report['duration'] = round(perf_counter() - start, 3)
+        return self.report
+
+    def notify(self, phase):
+        if self.progress is not None:
+            self.progress(phase, self.report['goods'])
+
+    def batches(self, goods):
+        goods = iter(goods)
+        while True:
+            batch = [
+                make_item(item) for item in islice(goods, self.batch_size)
+            ]
+            if not batch:
+                return
+            yield batch
+            self.notify('goods')
+
+    def replace_catalog(self, shop, goods):
+        version = self.allocate_version(shop)
+        for batch in self.batches(goods):
+            with transaction.atomic():
+                self.import_goods(shop, batch, version)
+        self.notify('activate')
+        self.activate_version(shop, version)
+
+    def allocate_version(self, shop):
+        with transaction.atomic():
+            Shop.objects.filter(id=shop.id).update(
+                last_catalog_version=F('last_catalog_version') + 1
+            )
+            shop.refresh_from_db(fields=['last_catalog_version'])
+        return shop.last_catalog_version
+
+    def activate_version(self, shop, version):
+        '''
+        Flips the shop's active catalog version in a single update.
+        '''
+        with transaction.atomic():
+            active = Shop.objects.select_for_update().values_list(
+                'catalog_version', flat=True
+            ).get(id=shop.id)
+            if active >= version:
+                return
+            self.report['deleted'] += ProductInfo.objects.filter(
+                shop_id=shop.id, version=active
+            ).count()
+            Shop.objects.filter(id=shop.id).update(catalog_version=version)
+            shop.catalog_version = version
+            rebuild_shop_catalog_entries(shop.id)
+            if settings.PRODUCT_OFFER_ROLLUPS:
+                refresh_product_offers(
+                    shop_product_ids(shop.id, (active, version))
+                )
+
+    def sync_catalog(self, shop, goods):
+        existing_ids = set(
+            ProductInfo.objects.filter(
+                shop_id=shop.id, version=shop.catalog_version
+            ).values_list('external_id', flat=True)
+        )
+        if settings.PRODUCT_OFFER_ROLLUPS:
+            product_ids = shop_product_ids(shop.id, [shop.catalog_version])
+        seen_ids = set()
+        for batch in self.batches(goods):
+            seen_ids.update(item.id for item in batch)
+            self.sync_goods(shop, batch, existing_ids)
+        self.notify('cleanup')
+        self.remove_goods(shop, existing_ids - seen_ids)
+        if settings.PRODUCT_OFFER_ROLLUPS:
+            refresh_product_offers(
+                product_ids
+                | shop_product_ids(shop.id, [shop.catalog_version])
+            )
+
+    def import_shop(self, name):
+        if name is None:
+            shop = Shop.objects.filter(user_id=self.user.id).first()
+            if shop is None:
+                raise ValueError('price list has no shop and user has none')
+            return shop
+        shop, _ = Shop.objects.get_or_create(name=name, user_id=self.user.id)
+        return shop
+
+    def import_categories(self, shop, categories):
+        names = {category['id']: category['name'] for category in categories}
+        existing = Category.objects.in_bulk(list(names))
+
+        renamed = []
+        for category_id, category in existing.items():
+            if category.name != names[category_id]:
+                category.name = names[category_id]
+                renamed.append(category)
+        if renamed:
+            Category.objects.bulk_update(renamed, ['name'])
+            for category in renamed:
+                CatalogEntry.objects.filter(category_id=category.id).update(
+                    category_name=category.name
+                )
+
+        Category.objects.bulk_create(
+            [
+                Category(id=category_id, name=name)
+                for category_id, name in names.items()
+                if category_id not in existing
+            ],
+            ignore_conflicts=True
+        )
+
+        through = Category.shops.through
+        through.objects.bulk_create(
+            [
+                through(category_id=category_id, shop_id=shop.id)
+                for category_id in names
+            ],
+            ignore_conflicts=True
+        )
+        self.category_ids.update(names)
+        self.report['categories'] += len(names)
+
+    def ensure_categories(self, shop, goods):
+        '''
+        Links categories of the batch that the price list did not
+        list to the shop, creating the missing ones by category_name.
+        '''
+        names = {
+            item.category: item.category_name
+            for item in goods
+            if item.category not in self.category_ids
+        }
+        if not names:
+            return
+        existing = set(
+            Category.objects.filter(id__in=list(names)).values_list(
+                'id', flat=True
+            )
+        )
+        unknown = [
+            category_id
+            for category_id in names
+            if category_id not in existing and not names[category_id]
+        ]
+        if unknown:
+            raise ValueError(
+                f'unknown categories: {", ".join(map(str, sorted(unknown)))}'
+            )
+        self.import_categories(shop, [
+            {'id': category_id, 'name': name}
+            for category_id, name in names.items()
+            if category_id not in existing
+        ])
+        through = Category.shops.through
+        through.objects.bulk_create(
+            [
+                through(category_id=category_id, shop_id=shop.id)
+                for category_id in existing
+            ],
+            ignore_conflicts=True
+        )
+        self.category_ids.update(existing)
+
+    def resolve_products(self, goods):
+        keys = {(item.name, item.category) for item in goods}
+        product_ids = self.fetch_product_ids(keys)
+
+        missing = [
+            Product(name=name, category_id=category_id)
+            for name, category_id in keys
+            if (name, category_id) not in product_ids
+        ]
+        if missing:
+            # products created by a concurrent import are skipped
+            # by ON CONFLICT and picked up by the second lookup
+            Product.objects.bulk_create(missing, ignore_conflicts=True)
+            product_ids.update(self.fetch_product_ids(
+                (product.name, product.category_id) for product in missing
+            ))
+            self.report['products'] += len(missing)
+        return product_ids
+
+    def fetch_product_ids(self, keys):
+        keys = set(keys)
+        product_ids = Product.objects.filter(
+            name__in={name for name, _ in keys},
+            category_id__in={category_id for _, category_id in keys},
+        ).values_list('name', 'category_id', 'id')
+        return {
+            (name, category_id): product_id
+            for name, category_id, product_id in product_ids
+            if (name, category_id) in keys
+        }
+
+    def resolve_parameters(self, goods):
+        names = {
+            name
+            for item in goods
+            for name, _ in item.parameters
+            if name not in self.parameter_ids
+        }
+        if not names:
+            return self.parameter_ids
+
+        self.parameter_ids.update(
+            Parameter.objects.filter(name__in=names).values_list('name', 'id')
+        )
+        missing = [
+            Parameter(name=name)
+            for name in names
+            if name not in self.parameter_ids
+        ]
+        if missing:
+            Parameter.objects.bulk_create(missing, ignore_conflicts=True)
+            self.parameter_ids.update(
+                Parameter.objects.filter(
+                    name__in=[parameter.name for parameter in missing]
+                ).values_list('name', 'id')
+            )
+            self.report['parameters'] += len(missing)
+        return self.parameter_ids
+
+    def build_product_info(
+        self, shop, version, item, product_ids, content_hash=None
+    ):
+        return ProductInfo(
+            product_id=product_ids[(item.name, item.category)],
+            external_id=item.id,
+            model=item.model,
+            price=item.price,
+            price_rrc=item.price_rrc,
+            quantity=item.quantity,
+            shop_id=shop.id,
+            version=version,
+            content_hash=content_hash or fingerprint_item(item)
+        )
+
+    def build_parameters(self, item, parameter_ids):
+        return {
+            parameter_ids[name]: str(value)
+            for name, value in item.parameters
+        }
+
+    def write_product_infos(self, shop, version, product_infos):
+        '''
+        Upserts product info on (shop, external_id, version) in a single
+        statement and returns the ids of the written rows by external_id.
+        '''
+        ProductInfo.objects.bulk_create(
+            product_infos,
+            update_conflicts=True,
+            unique_fields=self.UNIQUE_FIELDS,
+            update_fields=self.SYNC_FIELDS
+        )
+        return dict(
+            ProductInfo.objects.filter(
+                shop_id=shop.id,
+                version=version,
+                external_id__in=[
+                    product_info.external_id for product_info in product_infos
+                ]
+            ).values_list('external_id', 'id')
+        )
+
+    def write_parameters(self, parameters, current=None):
+        '''
+        Upserts product parameters on (product_info, parameter) and
+        deletes the ones that are no longer in the price list.
+        '''
+        current = current or {}
+        changed = []
+        removed = []
+        for product_info_id, values in parameters.items():
+            old_values = current.get(product_info_id, {})
+            for parameter_id, value in values.items():
+                old = old_values.get(parameter_id)
+                if old is None or old[1] != value:
+                    changed.append(ProductParameter(
+                        product_info_id=product_info_id,
+                        parameter_id=parameter_id,
+                        value=value,
+                        numeric_value=parse_number(value)
+                    ))
+            removed.extend(
+                product_parameter_id
+                for parameter_id, (product_parameter_id, _) in (
+                    old_values.items()
+                )
+                if parameter_id not in values
+            )
+        if changed:
+            ProductParameter.objects.bulk_create(
+                changed,
+                update_conflicts=True,
+                unique_fields=('product_info', 'parameter'),
+                update_fields=('value', 'numeric_value')
+            )
+        if removed:
+            ProductParameter.objects.filter(id__in=removed).delete()
+        self.report['product_parameters'] += len(changed)
+
+    def import_goods(self, shop, batch, version):
+        goods = {item.id: item for item in batch}
+        self.ensure_categories(shop, goods.values())
+        product_ids = self.resolve_products(goods.values())
+        parameter_ids = self.resolve_parameters(goods.values())
+
+        product_info_ids = self.write_product_infos(shop, version, [
+            self.build_product_info(shop, version, item, product_ids)
+            for item in goods.values()
+        ])
+        self.write_parameters({
+            product_info_ids[external_id]: self.build_parameters(
+                item, parameter_ids
+            )
+            for external_id, item in goods.items()
+        })
+        self.report['goods'] += len(batch)
+        self.report['inserted'] += len(goods)
+
+    def sync_goods(self, shop, batch, existing_ids):
+        version = shop.catalog_version
+        goods = {item.id: item for item in batch}
+        fingerprints = {
+            external_id: fingerprint_item(item)
+            for external_id, item in goods.items()
+        }
+        self.report['goods'] += len(batch)
+
+        existing = {}
+        if any(external_id in existing_ids for external_id in goods):
+            existing = {
+                product_info.external_id: product_info
+                for product_info in ProductInfo.objects.filter(
+                    shop_id=shop.id,
+                    version=version,
+                    external_id__in=list(goods)
+                )
+            }
+        # goods with an unchanged fingerprint need no further diffing
+        goods = {
+            external_id: item
+            for external_id, item in goods.items()
+            if external_id not in existing
+            or existing[external_id].content_hash != fingerprints[external_id]
+        }
+        if not goods:
+            return
+        self.ensure_categories(shop, goods.values())
+        product_ids = self.resolve_products(goods.values())
+        parameter_ids = self.resolve_parameters(goods.values())
+
+        current = {}
+        for product_parameter_id, product_info_id, parameter_id, value in (
+            ProductParameter.objects.filter(
+                product_info_id__in=[
+                    existing[external_id].id
+                    for external_id in goods
+                    if external_id in existing
+                ]
+            ).values_list('id', 'product_info_id', 'parameter_id', 'value')
+        ):
+            current.setdefault(product_info_id, {})[parameter_id] = (
+                product_parameter_id, value
+            )
+
+        changed = []
+        parameters = {}
+        updated = 0
+        for external_id, item in goods.items():
+            product_info = self.build_product_info(
+                shop, version, item, product_ids, fingerprints[external_id]
+            )
+            changed.append(product_info)
+            values = self.build_parameters(item, parameter_ids)
+            old = existing.get(external_id)
+            if old is None:
+                parameters[external_id] = values
+                continue
+            is_changed = any(
+                getattr(old, field) != getattr(product_info, field)
+                for field in self.DIFF_FIELDS
+            )
+            old_values = {
+                parameter_id: value
+                for parameter_id, (_, value) in current.get(old.id, {}).items()
+            }
+            if values != old_values:
+                parameters[external_id] = values
+                is_changed = True
+            updated += is_changed
+
+        product_info_ids = self.write_product_infos(shop, version, changed)
+        self.write_parameters(
+            {
+                product_info_ids[external_id]: values
+                for external_id, values in parameters.items()
+            },
+            current
+        )
+        refresh_catalog_entries(product_info_ids.values())
+        self.report['inserted'] += len(goods) - len(
+            existing.keys() & goods.keys()
+        )
+        self.report['updated'] += updated
+
+    def remove_goods(self, shop, external_ids):
+        '''
+        Deletes goods that disappeared from the price list. Rows that
+        are referenced by orders are retired with zero quantity instead,
+        so existing orders keep their items, and without a fingerprint,
+        so the good is written again when it comes back unchanged.
+        '''
+        if not external_ids:
+            return
+        removed = ProductInfo.objects.filter(
+            shop_id=shop.id,
+            version=shop.catalog_version,
+            external_id__in=list(external_ids)
+        )
+        self.report['retired'] += removed.filter(
+            ordered_items__isnull=False
+        ).distinct().update(quantity=0, content_hash='')
+        CatalogEntry.objects.filter(
+            shop_id=shop.id, external_id__in=list(external_ids)
+        ).update(quantity=0)
+        _, deleted = removed.filter(ordered_items__isnull=True).delete()
+        self.report['deleted'] += deleted.get(ProductInfo._meta.label, 0)
+
+
+def collect_catalog_versions(shop_id, chunk_size=5000):
+    '''
+    Deletes product info of the shop's superseded catalog versions in
+    chunks. Rows referenced by orders are kept, versions newer than
+    the active one may still be in the middle of an import.
+    '''
+    shop = Shop.objects.get(id=shop_id)
+    stale = ProductInfo.objects.filter(
+        shop_id=shop.id,
+        version__lt=shop.catalog_version,
+        ordered_items__isnull=True
+    )
+    deleted = 0
+    while True:
+        ids = list(stale.values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        _, counts = ProductInfo.objects.filter(id__in=ids).delete()
+        deleted += counts.get(ProductInfo._meta.label, 0)
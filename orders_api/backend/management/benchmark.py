@@ -0,0 +1,27 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import (
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+
+@contextmanager
+def benchmark_database(keepdb=False):
+    '''
+    Runs the block on a test database, created first and destroyed
+    afterwards unless keepdb, in the test environment.
+    '''
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, keepdb=keepdb
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(
+            old_name, verbosity=0, keepdb=keepdb
+        )
+        teardown_test_environment()
@@ -0,0 +1,232 @@
+import json
+import os
+import resource
+import tempfile
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from backend.importer import CatalogImporter, QueryCounter
+from backend.models import ImportJob, Shop, User
+from backend.pricelist import CONTENT_TYPES, READERS, write_price_list
+from orders_api.celery import app as celery_app
+
+from ..benchmark import benchmark_database
+from .generate_price_list import generate_price_list, parameter_names
+
+
+CONTENT_TYPE_BY_FORMAT = {
+    format: content_type
+    for content_type, format in reversed(CONTENT_TYPES.items())
+}
+
+# metrics compared against a baseline with a relative tolerance and
+# the absolute slack below it, queries are deterministic and must not
+# grow at all
+TIMING_METRICS = {'wall': 0.05, 'peak_rss': 1.0}
+
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def write_price_lists(path, shops, categories, goods, parameters, format):
+    paths = []
+    for shop_number in range(1, shops + 1):
+        file = os.path.join(path, f'shop_{shop_number}.{format}')
+        with open(file, 'w', newline='') as f:
+            write_price_list(
+                f,
+                generate_price_list(
+                    shop_number, categories, goods, parameters
+                ),
+                format,
+                parameter_names(parameters)
+            )
+        paths.append(file)
+    return paths
+
+
+def post_price_list(client, path, format, mode, source, force):
+    '''
+    Posts a price list to PartnerUpdate and returns the finished job,
+    the celery task runs eagerly inside the request.
+    '''
+    url = reverse('partner-update')
+    if source == 'body':
+        with open(path, 'rb') as f:
+            response = client.post(
+                f'{url}?mode={mode}&force={force}',
+                data=f.read(),
+                content_type=CONTENT_TYPE_BY_FORMAT[format]
+            )
+    else:
+        response = client.post(
+            url, data={'file': path, 'mode': mode, 'force': force},
+            format='json'
+        )
+    if response.status_code != 202:
+        raise CommandError(f'{path}: {response.status_code} {response.data}')
+    job = ImportJob.objects.get(id=response.data['job'])
+    if job.status != 'done':
+        raise CommandError(f'{path}: import {job.status} {job.errors}')
+    return job
+
+
+def run_benchmark(
+    shops=1, categories=10, goods=1000, parameters=4, format='yaml',
+    mode='replace', rounds=1, source='file'
+):
+    '''
+    Imports synthetic price lists through PartnerUpdate end to end and
+    measures every round of imports: wall time, query count, growth of
+    the peak RSS and goods per second. Rounds after the first re-import
+    the same price lists, which exercises the replace or sync path on
+    an existing catalog.
+    '''
+    clients = []
+    for shop_number in range(1, shops + 1):
+        user = User.objects.create_user(
+            username=f'benchmark-shop-{shop_number}',
+            email=f'benchmark-shop-{shop_number}@example.com',
+            type='shop'
+        )
+        Shop.objects.create(name=f'Магазин {shop_number}', user=user)
+        client = APIClient()
+        client.force_authenticate(user=user)
+        clients.append(client)
+
+    results = []
+    always_eager = celery_app.conf.task_always_eager
+    celery_app.conf.task_always_eager = True
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = write_price_lists(
+                tmp, shops, categories, goods, parameters, format
+            )
+            for round_number in range(1, rounds + 1):
+                counter = QueryCounter()
+                rows = 0
+                rss = peak_rss_kb()
+                start = perf_counter()
+                with connection.execute_wrapper(counter):
+                    for client, path in zip(clients, paths):
+                        job = post_price_list(
+                            client, path, format, mode, source,
+                            force=round_number > 1
+                        )
+                        rows += job.rows_processed
+                wall = perf_counter() - start
+                results.append({
+                    'round': round_number,
+                    'format': format,
+                    'mode': mode,
+                    'shops': shops,
+                    'goods': rows,
+                    'wall': round(wall, 3),
+                    'queries': counter.count,
+                    'peak_rss': round((peak_rss_kb() - rss) / 1024, 1),
+                    'rows_per_sec': round(rows / wall, 1),
+                })
+    finally:
+        celery_app.conf.task_always_eager = always_eager
+    return results
+
+
+def compare_results(results, baseline, tolerance):
+    '''
+    Regressions of the results against a baseline of the same rounds.
+    '''
+    regressions = []
+    for result, expected in zip(results, baseline):
+        round_number = result['round']
+        if result['queries'] > expected['queries']:
+            regressions.append(
+                f'round {round_number}: queries {result["queries"]} > '
+                f'{expected["queries"]}'
+            )
+        for metric, slack in TIMING_METRICS.items():
+            limit = max(
+                expected[metric] * (1 + tolerance), expected[metric] + slack
+            )
+            if result[metric] > limit:
+                regressions.append(
+                    f'round {round_number}: {metric} {result[metric]} > '
+                    f'{expected[metric]} + {tolerance:.0%}'
+                )
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks price list imports through PartnerUpdate on a '
+        'test database with synthetic price lists.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shops', type=int, default=1)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--goods', type=int, default=1000)
+        parser.add_argument('--parameters', type=int, default=4)
+        parser.add_argument(
+            '--format', choices=sorted(READERS), default='yaml'
+        )
+        parser.add_argument(
+            '--mode',
+            choices=CatalogImporter.MODE_CHOICES,
+            default='replace'
+        )
+        parser.add_argument(
+            '--rounds', type=int, default=2,
+            help='Imports of the same price lists, the first one is fresh.'
+        )
+        parser.add_argument(
+            '--source', choices=('file', 'body'), default='file',
+            help='Post a file path or the price list as the request body.'
+        )
+        parser.add_argument('--save', help='Write the results as JSON.')
+        parser.add_argument(
+            '--baseline', help='Fail on regressions against saved results.'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Allowed growth of wall time and peak RSS.'
+        )
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        with benchmark_database(options['keepdb']):
+            results = run_benchmark(
+                shops=options['shops'],
+                categories=options['categories'],
+                goods=options['goods'],
+                parameters=options['parameters'],
+                format=options['format'],
+                mode=options['mode'],
+                rounds=options['rounds'],
+                source=options['source'],
+            )
+
+        for result in results:
+            self.stdout.write(
+                f'round {result["round"]}: {result["goods"]} goods '
+                f'{result["wall"]:.2f} s {result["queries"]} queries '
+                f'{result["peak_rss"]:.1f} MiB peak '
+                f'{result["rows_per_sec"]:.0f} rows/s'
+            )
+        if options['save']:
+            with open(options['save'], 'w') as f:
+                json.dump(results, f, indent=2)
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = compare_results(
+                results, baseline, options['tolerance']
+            )
+            if regressions:
+                raise CommandError(
+                    'regressions:\n' + '\n'.join(regressions)
+                )
@@ -0,0 +1,139 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+
+from backend.fastpath import OrderValuesSerializer, ProductInfoValuesSerializer
+from backend.importer import CatalogImporter, QueryCounter
+from backend.models import Order, OrderItem, ProductInfo, User
+
+from ..benchmark import benchmark_database
+from .generate_price_list import generate_price_list
+
+
+def make_catalog(goods, parameters, orders, items_per_order=3):
+    user = User.objects.create_user(
+        username='benchmark-shop',
+        email='benchmark-shop@example.com',
+        type='shop'
+    )
+    CatalogImporter(user).run(
+        generate_price_list(goods=goods, parameters=parameters)
+    )
+    product_info_ids = list(
+        ProductInfo.objects.active().values_list('id', flat=True)
+    )
+    order_items = []
+    for number in range(orders):
+        order = Order.objects.create(user=user, status='new')
+        for index in range(items_per_order):
+            order_items.append(OrderItem(
+                order=order,
+                product_info_id=product_info_ids[
+                    (number * items_per_order + index) % len(product_info_ids)
+                ],
+                quantity=index + 1
+            ))
+    OrderItem.objects.bulk_create(order_items)
+
+
+def measure(build, repeat):
+    '''
+    Best time of repeat runs of build() and the JSON it renders,
+    with the queries of one run.
+    '''
+    best = None
+    for _ in range(repeat):
+        counter = QueryCounter()
+        start = perf_counter()
+        with connection.execute_wrapper(counter):
+            content = JSONRenderer().render(build())
+        duration = perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best, content, counter.count
+
+
+def run_benchmark(
+    goods=1000, parameters=4, orders=300, page_size=100, repeat=10
+):
+    '''
+    Renders a page of /products and partner/orders items to JSON with
+    the serializers and with their values() fast path and reports the
+    cost per row of each, the JSON of both must be the same.
+    '''
+    make_catalog(goods, parameters, orders)
+    endpoints = [
+        (
+            'products',
+            ProductInfo.objects.active().with_details().order_by('-pk'),
+            ProductInfoValuesSerializer,
+        ),
+        (
+            'orders',
+            Order.objects.exclude(status='basket').with_items().order_by(
+                '-pk'
+            ),
+            OrderValuesSerializer,
+        ),
+    ]
+    results = []
+    for endpoint, queryset, values_serializer_class in endpoints:
+        serializer_class = values_serializer_class.serializer_class
+        values_serializer = values_serializer_class()
+        paths = {
+            'serializer': lambda: serializer_class(
+                list(queryset[:page_size]), many=True
+            ).data,
+            'fast': lambda: values_serializer.serialize(
+                list(values_serializer.values(queryset)[:page_size])
+            ),
+        }
+        rows = min(page_size, queryset.count())
+        contents = set()
+        for path, build in paths.items():
+            duration, content, queries = measure(build, repeat)
+            contents.add(content)
+            results.append({
+                'endpoint': endpoint,
+                'path': path,
+                'rows': rows,
+                'queries': queries,
+                'us_per_row': round(duration / rows * 1e6, 1),
+            })
+        if len(contents) != 1:
+            raise CommandError(f'{endpoint}: fast path JSON differs')
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the per-row cost of the serializers of /products and '
+        'partner/orders against their values() fast path on a test '
+        'database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--goods', type=int, default=1000)
+        parser.add_argument('--parameters', type=int, default=4)
+        parser.add_argument('--orders', type=int, default=300)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        with benchmark_database(options['keepdb']):
+            results = run_benchmark(
+                goods=options['goods'],
+                parameters=options['parameters'],
+                orders=options['orders'],
+                page_size=options['page_size'],
+                repeat=options['repeat'],
+            )
+
+        for result in results:
+            self.stdout.write(
+                f'{result["endpoint"]:<9} {result["path"]:<10} '
+                f'{result["rows"]:>5} rows {result["queries"]:>3} queries '
+                f'{result["us_per_row"]:>8.1f} us/row'
+            )
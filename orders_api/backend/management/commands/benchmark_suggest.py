@@ -0,0 +1,111 @@
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from backend.importer import CatalogImporter
+from backend.models import CatalogEntry, User
+from backend.suggest import get_prefix_index, suggest_names, trigram_available
+
+from ..benchmark import benchmark_database
+from .generate_price_list import generate_price_list
+
+
+def make_terms(names, count, seed):
+    '''
+    count terms a user types: the first one to eight characters of a
+    word of a product name.
+    '''
+    rng = random.Random(seed)
+    terms = []
+    for _ in range(count):
+        words = rng.choice(names).split()
+        word_index = rng.randrange(len(words))
+        text = ' '.join(words[word_index:])
+        terms.append(text[:rng.randint(1, 8)])
+    return terms
+
+
+def percentile(durations, fraction):
+    durations = sorted(durations)
+    return durations[min(len(durations) - 1, int(len(durations) * fraction))]
+
+
+def run_benchmark(goods=10000, requests=500, limit=10, seed=1):
+    '''
+    Times suggest_names over the database and over the in-process
+    prefix index for the same terms and reports the latency
+    percentiles of each in milliseconds.
+    '''
+    user = User.objects.create_user(
+        username='benchmark-shop',
+        email='benchmark-shop@example.com',
+        type='shop'
+    )
+    CatalogImporter(user).run(generate_price_list(goods=goods, parameters=1))
+    with connection.cursor() as cursor:
+        # the statistics autovacuum keeps on a live database
+        cursor.execute('ANALYZE backend_product, backend_catalogentry')
+    names = list(
+        CatalogEntry.objects.values_list('product_name', flat=True)
+    )
+    terms = make_terms(names, requests, seed)
+    results = []
+    for backend, prefix_index in (('database', False), ('prefix', True)):
+        with override_settings(PRODUCT_SUGGEST_PREFIX_INDEX=prefix_index):
+            start = perf_counter()
+            if prefix_index:
+                get_prefix_index()
+            build = perf_counter() - start
+            durations = []
+            suggestions = 0
+            for term in terms:
+                start = perf_counter()
+                suggestions += len(suggest_names(term, limit))
+                durations.append(perf_counter() - start)
+        results.append({
+            'backend': backend,
+            'requests': len(terms),
+            'suggestions': suggestions,
+            'build_ms': round(build * 1e3, 1),
+            'p50_ms': round(percentile(durations, 0.5) * 1e3, 2),
+            'p99_ms': round(percentile(durations, 0.99) * 1e3, 2),
+            'max_ms': round(max(durations) * 1e3, 2),
+        })
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the latency of products/suggest over the database and '
+        'over the in-process prefix index on a test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--goods', type=int, default=10000)
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        with benchmark_database(options['keepdb']):
+            results = run_benchmark(
+                goods=options['goods'],
+                requests=options['requests'],
+                limit=options['limit'],
+                seed=options['seed'],
+            )
+            trigram = trigram_available()
+
+        self.stdout.write(f'pg_trgm index: {"yes" if trigram else "no"}')
+        for result in results:
+            self.stdout.write(
+                f'{result["backend"]:<9} {result["requests"]:>5} requests '
+                f'build {result["build_ms"]:>7.1f} ms '
+                f'p50 {result["p50_ms"]:>6.2f} ms '
+                f'p99 {result["p99_ms"]:>6.2f} ms '
+                f'max {result["max_ms"]:>6.2f} ms'
+            )
@@ -0,0 +1,110 @@
+import os
+import random
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.pricelist import READERS, write_price_list
+
+
+COLORS = ('черный', 'белый', 'золотистый', 'красный', 'синий', 'серебристый')
+
+
+def parameter_names(parameters):
+    return [f'Параметр {number}' for number in range(1, parameters + 1)]
+
+
+def generate_goods(rng, categories, goods, parameters):
+    '''
+    Yields goods in the schema of data/shop_1.yaml. Product names
+    repeat across shops so they share products the way real price
+    lists do.
+    '''
+    names = parameter_names(parameters)
+    for number in range(goods):
+        price = rng.randrange(100, 200000)
+        values = {}
+        for index, name in enumerate(names):
+            if index % 2:
+                values[name] = rng.choice(COLORS)
+            else:
+                values[name] = rng.choice((16, 32, 64, 128, 256, 512))
+        yield {
+            'id': number + 1,
+            'category': rng.randint(1, categories),
+            'model': f'model/{number % 1000}',
+            'name': f'Товар {number}',
+            'price': price,
+            'price_rrc': price + price // 10,
+            'quantity': rng.randrange(0, 100),
+            'parameters': values,
+        }
+
+
+def generate_price_list(
+    shop_number=1, categories=10, goods=1000, parameters=4, seed=0
+):
+    '''
+    Synthetic price list of a shop with goods as a generator.
+    '''
+    rng = random.Random(f'{seed}-{shop_number}')
+    return {
+        'shop': f'Магазин {shop_number}',
+        'categories': [
+            {'id': number, 'name': f'Категория {number}'}
+            for number in range(1, categories + 1)
+        ],
+        'goods': generate_goods(rng, categories, goods, parameters),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates synthetic price lists in the schema of '
+        'data/shop_1.yaml for import benchmarks.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shops', type=int, default=1)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--goods', type=int, default=1000)
+        parser.add_argument(
+            '--parameters', type=int, default=4,
+            help='Parameters per good.'
+        )
+        parser.add_argument(
+            '--format', choices=sorted(READERS), default='yaml'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', default='-',
+            help=(
+                'Directory for shop_<n>.<format> files, '
+                'or - for stdout with a single shop.'
+            )
+        )
+
+    def handle(self, *args, **options):
+        shops = options['shops']
+        format = options['format']
+        if options['output'] == '-' and shops != 1:
+            raise CommandError('--output directory required for many shops')
+        for shop_number in range(1, shops + 1):
+            data = generate_price_list(
+                shop_number,
+                options['categories'],
+                options['goods'],
+                options['parameters'],
+                options['seed'],
+            )
+            parameters = parameter_names(options['parameters'])
+            if options['output'] == '-':
+                write_price_list(sys.stdout, data, format, parameters)
+                continue
+            os.makedirs(options['output'], exist_ok=True)
+            path = os.path.join(
+                options['output'], f'shop_{shop_number}.{format}'
+            )
+            with open(path, 'w', newline='') as f:
+                write_price_list(f, data, format, parameters)
+            self.stdout.write(path)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from backend.models import Product, ProductOffer
+from backend.readmodel import refresh_product_offers
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds the ProductOffer rollups of all products, run it when '
+        'PRODUCT_OFFER_ROLLUPS is turned on.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            ProductOffer.objects.all().delete()
+            refresh_product_offers(
+                Product.objects.values_list('id', flat=True).iterator()
+            )
+        self.stdout.write(f'{ProductOffer.objects.count()} product offers')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from backend.cache import response_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Prints the hit and miss counters of the catalog response cache.'
+
+    def handle(self, *args, **options):
+        stats = response_cache_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0
+        self.stdout.write(
+            f'generation {stats["generation"]}: {stats["hits"]} hits '
+            f'{stats["misses"]} misses ({ratio:.0%} hit ratio)'
+        )
@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-18 05:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0005_alter_shop_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.CharField(blank=True, default='', max_length=255)),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершен'), ('failed', 'Ошибка')], default='queued', max_length=20)),
+                ('phase', models.CharField(blank=True, default='', max_length=255)),
+                ('mode', models.CharField(default='replace', max_length=20)),
+                ('file', models.CharField(blank=True, default='', max_length=255)),
+                ('url', models.URLField(blank=True, default='')),
+                ('payload', models.TextField(blank=True, default='')),
+                ('rows_processed', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('report', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
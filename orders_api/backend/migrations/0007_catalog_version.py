@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 05:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0006_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productinfo',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='catalog_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='last_catalog_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
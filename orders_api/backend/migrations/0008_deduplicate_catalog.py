@@ -0,0 +1,55 @@
+# Generated by Django 4.2 on 2026-10-18 06:01
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicates(model, fields, references):
+    '''
+    Keeps the oldest row of every group of duplicates on ``fields``,
+    points ``references`` (model, field name) to it and deletes the rest.
+    '''
+    groups = model.objects.values(*fields).annotate(
+        keep=Min('id'), count=Count('id')
+    ).filter(count__gt=1)
+    for group in groups:
+        keep = group.pop('keep')
+        group.pop('count')
+        duplicates = model.objects.filter(**group).exclude(id=keep)
+        for reference, field in references:
+            reference.objects.filter(
+                **{f'{field}__in': duplicates}
+            ).update(**{f'{field}_id': keep})
+        duplicates.delete()
+
+
+def deduplicate_catalog(apps, schema_editor):
+    Parameter = apps.get_model('backend', 'Parameter')
+    Product = apps.get_model('backend', 'Product')
+    ProductInfo = apps.get_model('backend', 'ProductInfo')
+    ProductParameter = apps.get_model('backend', 'ProductParameter')
+    OrderItem = apps.get_model('backend', 'OrderItem')
+
+    merge_duplicates(
+        Parameter, ['name'], [(ProductParameter, 'parameter')]
+    )
+    merge_duplicates(
+        Product, ['name', 'category'], [(ProductInfo, 'product')]
+    )
+    merge_duplicates(
+        ProductInfo,
+        ['shop', 'external_id', 'version'],
+        [(OrderItem, 'product_info'), (ProductParameter, 'product_info')]
+    )
+    merge_duplicates(ProductParameter, ['product_info', 'parameter'], [])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0007_catalog_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_catalog, migrations.RunPython.noop),
+    ]
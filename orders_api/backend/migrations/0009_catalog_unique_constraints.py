@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-18 06:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0008_deduplicate_catalog'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='parameter',
+            constraint=models.UniqueConstraint(fields=('name',), name='unique_parameter_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('name', 'category'), name='unique_product_name_category'),
+        ),
+        migrations.AddConstraint(
+            model_name='productinfo',
+            constraint=models.UniqueConstraint(fields=('shop', 'external_id', 'version'), name='unique_product_info_shop_external_id_version'),
+        ),
+        migrations.AddConstraint(
+            model_name='productparameter',
+            constraint=models.UniqueConstraint(fields=('product_info', 'parameter'), name='unique_product_parameter'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 06:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0011_shop_fetch_validators'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='format',
+            field=models.CharField(default='yaml', max_length=10),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 06:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0012_importjob_format'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'id'], name='order_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productinfo',
+            index=models.Index(fields=['price', 'id'], name='product_info_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productinfo',
+            index=models.Index(fields=['quantity', 'id'], name='product_info_quantity_id_idx'),
+        ),
+    ]
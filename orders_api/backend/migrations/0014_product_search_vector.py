@@ -0,0 +1,77 @@
+# Generated by Django 4.2 on 2026-10-18 06:24
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# the search vector of a product: its name (weight A) and the name
+# of its category (weight B), with Russian stemming
+SEARCH_VECTOR_SQL = '''
+CREATE FUNCTION backend_product_search_vector(
+    product_name text, product_category_id bigint
+) RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('russian', coalesce(product_name, '')), 'A')
+        || setweight(to_tsvector('russian', coalesce((
+            SELECT name FROM backend_category WHERE id = product_category_id
+        ), '')), 'B')
+$$ LANGUAGE sql STABLE;
+
+CREATE FUNCTION backend_product_search_vector_trigger() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := backend_product_search_vector(
+        NEW.name, NEW.category_id
+    );
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER backend_product_search_vector_update
+    BEFORE INSERT OR UPDATE OF name, category_id ON backend_product
+    FOR EACH ROW EXECUTE FUNCTION backend_product_search_vector_trigger();
+
+CREATE FUNCTION backend_category_search_vector_trigger() RETURNS trigger AS $$
+BEGIN
+    UPDATE backend_product
+    SET search_vector = backend_product_search_vector(name, category_id)
+    WHERE category_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER backend_category_search_vector_update
+    AFTER UPDATE OF name ON backend_category
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION backend_category_search_vector_trigger();
+
+UPDATE backend_product
+SET search_vector = backend_product_search_vector(name, category_id);
+'''
+
+DROP_SEARCH_VECTOR_SQL = '''
+DROP TRIGGER backend_category_search_vector_update ON backend_category;
+DROP FUNCTION backend_category_search_vector_trigger();
+DROP TRIGGER backend_product_search_vector_update ON backend_product;
+DROP FUNCTION backend_product_search_vector_trigger();
+DROP FUNCTION backend_product_search_vector(text, bigint);
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0013_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+        ),
+        migrations.RunSQL(SEARCH_VECTOR_SQL, DROP_SEARCH_VECTOR_SQL),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 06:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0014_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productparameter',
+            index=models.Index(fields=['parameter', 'value', 'product_info'], name='product_parameter_value_idx'),
+        ),
+    ]
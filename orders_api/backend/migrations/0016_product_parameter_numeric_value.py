@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-18 06:28
+
+from django.db import migrations, models
+
+
+# the same numbers as backend.importer.parse_number
+BACKFILL_SQL = r'''
+UPDATE backend_productparameter
+SET numeric_value = replace(trim(value), ',', '.')::double precision
+WHERE value ~ '^\s*[+-]?\d+([.,]\d+)?\s*$'
+    AND length(trim(value)) <= 300
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0015_product_parameter_value_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productparameter',
+            name='numeric_value',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='productparameter',
+            index=models.Index(condition=models.Q(('numeric_value__isnull', False)), fields=['parameter', 'numeric_value', 'product_info'], name='product_parameter_number_idx'),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2 on 2026-10-18 06:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# the same rows as backend.readmodel.rebuild_shop_catalog_entries
+BACKFILL_SQL = '''
+INSERT INTO backend_catalogentry (
+    product_info_id, shop_id, shop_name, shop_status, product_id,
+    product_name, category_id, category_name, external_id, model,
+    quantity, price, price_rrc, parameters
+)
+SELECT
+    pi.id, s.id, s.name, s.status, p.id, p.name, c.id, c.name,
+    pi.external_id, pi.model, pi.quantity, pi.price, pi.price_rrc,
+    coalesce((
+        SELECT jsonb_object_agg(pr.name, pp.value)
+        FROM backend_productparameter pp
+        JOIN backend_parameter pr ON pr.id = pp.parameter_id
+        WHERE pp.product_info_id = pi.id
+    ), '{}'::jsonb)
+FROM backend_productinfo pi
+JOIN backend_shop s ON s.id = pi.shop_id
+    AND pi.version = s.catalog_version
+JOIN backend_product p ON p.id = pi.product_id
+JOIN backend_category c ON c.id = p.category_id
+'''
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0016_product_parameter_numeric_value'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogEntry',
+            fields=[
+                ('product_info', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='catalog_entry', serialize=False, to='backend.productinfo')),
+                ('shop_name', models.CharField(max_length=255)),
+                ('shop_status', models.BooleanField(default=True)),
+                ('product_name', models.CharField(max_length=255)),
+                ('category_name', models.CharField(max_length=255)),
+                ('external_id', models.PositiveIntegerField()),
+                ('model', models.CharField(max_length=255)),
+                ('quantity', models.PositiveIntegerField()),
+                ('price', models.PositiveIntegerField()),
+                ('price_rrc', models.PositiveIntegerField()),
+                ('parameters', models.JSONField(default=dict)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='catalog_entries', to='backend.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='catalog_entries', to='backend.product')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='catalog_entries', to='backend.shop')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='catalogentry',
+            index=models.Index(fields=['price', 'product_info'], name='catalog_entry_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='catalogentry',
+            index=models.Index(fields=['quantity', 'product_info'], name='catalog_entry_quantity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='catalogentry',
+            index=models.Index(fields=['category', 'product_info'], name='catalog_entry_category_idx'),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
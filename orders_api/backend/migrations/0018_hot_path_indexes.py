@@ -0,0 +1,45 @@
+# Generated by Django 4.2 on 2026-10-18 06:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0017_catalog_entry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='catalogentry',
+            name='shop',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='catalog_entries', to='backend.shop'),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='product_info',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='ordered_items', to='backend.productinfo'),
+        ),
+        migrations.AlterField(
+            model_name='productinfo',
+            name='shop',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='product_infos', to='backend.shop'),
+        ),
+        migrations.AddIndex(
+            model_name='catalogentry',
+            index=models.Index(fields=['shop', 'product_info'], name='catalog_entry_shop_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', 'basket')), fields=['user', 'id'], name='order_basket_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['product_info', 'order'], name='order_item_product_info_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productinfo',
+            index=models.Index(fields=['shop', 'version', 'id'], name='product_info_shop_version_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-18 06:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0018_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductOffer',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='offer', serialize=False, to='backend.product')),
+                ('min_price', models.PositiveIntegerField()),
+                ('max_price', models.PositiveIntegerField()),
+                ('quantity', models.PositiveIntegerField()),
+                ('shops', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='productinfo',
+            name='product',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='product_infos', to='backend.product'),
+        ),
+        migrations.AddIndex(
+            model_name='productinfo',
+            index=models.Index(fields=['product', 'shop', 'version'], include=('price', 'quantity'), name='product_info_offer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productoffer',
+            index=models.Index(fields=['min_price', 'product'], name='product_offer_min_price_idx'),
+        ),
+    ]
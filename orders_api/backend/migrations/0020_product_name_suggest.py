@@ -0,0 +1,50 @@
+# Generated by Django 4.2 on 2026-10-18 07:01
+
+from django.db import DatabaseError, migrations, models, transaction
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+
+
+TRIGRAM_INDEX_SQL = '''
+CREATE INDEX IF NOT EXISTS product_name_trgm_idx
+ON backend_product USING gin (lower(name) gin_trgm_ops)
+'''
+
+
+def create_trigram_index(apps, schema_editor):
+    '''
+    Substring matches of products/suggest use a trigram index when the
+    server ships pg_trgm and the extension can be created, otherwise
+    suggestions match name prefixes only.
+    '''
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        )
+        if cursor.fetchone() is None:
+            return
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+                cursor.execute(TRIGRAM_INDEX_SQL)
+        except DatabaseError:
+            pass
+
+
+def drop_trigram_index(apps, schema_editor):
+    schema_editor.execute('DROP INDEX IF EXISTS product_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0019_product_offers'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.functions.comparison.Collate(django.db.models.functions.text.Lower('name'), 'C'), name='product_name_prefix_idx'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
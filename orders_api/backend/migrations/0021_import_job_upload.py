@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-18 07:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0020_product_name_suggest'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='importjob',
+            name='payload',
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='upload',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.functions import Cast, Coalesce, Collate, Lower
 from django.utils.crypto import get_random_string
 from rest_framework.authtoken.models import Token
 
@@ -57,7 +60,12 @@ class Shop(models.Model):
     )
     url = models.URLField(default='')
     filename = models.CharField(max_length=255, default='')
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    etag = models.CharField(max_length=255, blank=True, default='')
+    last_modified = models.CharField(max_length=64, blank=True, default='')
     status = models.BooleanField(default=True)
+    catalog_version = models.PositiveIntegerField(default=0)
+    last_catalog_version = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.name
@@ -74,6 +82,39 @@ class Category(models.Model):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    def with_offers(self):
+        '''
+        Aggregates the offers in stock in the active catalog versions
+        of shops with status on per product: min_price, max_price,
+        quantity and shops, in one GROUP BY on product_info_offer_idx.
+        '''
+        return self.filter(
+            product_infos__version=models.F(
+                'product_infos__shop__catalog_version'
+            ),
+            product_infos__shop__status=True,
+            product_infos__quantity__gt=0
+        ).annotate(
+            min_price=models.Min('product_infos__price'),
+            max_price=models.Max('product_infos__price'),
+            quantity=models.Sum('product_infos__quantity'),
+            shops=models.Count('product_infos__shop', distinct=True)
+        )
+
+    def with_offer_rollups(self):
+        '''
+        The same annotations as with_offers from the ProductOffer
+        rollups.
+        '''
+        return self.filter(offer__isnull=False).annotate(
+            min_price=models.F('offer__min_price'),
+            max_price=models.F('offer__max_price'),
+            quantity=models.F('offer__quantity'),
+            shops=models.F('offer__shops')
+        )
+
+
 class Product(models.Model):
     name = models.CharField(max_length=255)
     category = models.ForeignKey(
@@ -81,28 +122,132 @@ class Product(models.Model):
         related_name='products',
         on_delete=models.CASCADE
     )
+    # maintained by database triggers from the product and
+    # category names, see migration 0014_product_search_vector
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'category'],
+                name='unique_product_name_category'
+            ),
+        ]
+        indexes = [
+            GinIndex(
+                fields=['search_vector'], name='product_search_vector_idx'
+            ),
+            # prefix matches of products/suggest in name order, the "C"
+            # collation lets LIKE 'term%' use it; with pg_trgm migration
+            # 0020 adds product_name_trgm_idx for substring matches
+            models.Index(
+                Collate(Lower('name'), 'C'), name='product_name_prefix_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class ProductInfoQuerySet(models.QuerySet):
+    def active(self):
+        '''
+        Product info of the active catalog version of each shop.
+        '''
+        return self.filter(version=models.F('shop__catalog_version'))
+
+    def with_details(self):
+        '''
+        Loads the product with its category and the parameters with
+        their names, so serializing a list takes a constant number of
+        queries.
+        '''
+        return self.select_related('product__category').prefetch_related(
+            models.Prefetch(
+                'product_parameters',
+                queryset=ProductParameter.objects.select_related(
+                    'parameter'
+                ).order_by('id')
+            )
+        )
+
+    def parameter_facets(self):
+        '''
+        Number of product info per parameter value in the queryset,
+        aggregated in a single query as
+        [{'parameter': name, 'values': [{'value', 'count'}, ...]}, ...].
+        '''
+        counts = ProductParameter.objects.filter(
+            product_info__in=self.values('pk')
+        ).values('parameter__name', 'value').annotate(
+            count=models.Count('id')
+        ).order_by('parameter__name', '-count', 'value')
+        facets = {}
+        for row in counts:
+            facets.setdefault(row['parameter__name'], []).append(
+                {'value': row['value'], 'count': row['count']}
+            )
+        return [
+            {'parameter': name, 'values': values}
+            for name, values in facets.items()
+        ]
+
+
 class ProductInfo(models.Model):
     external_id = models.PositiveIntegerField()
+    # indexed as the prefix of product_info_offer_idx
     product = models.ForeignKey(
         Product,
         related_name='product_infos',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
+    # indexed as the prefix of product_info_shop_version_idx
     shop = models.ForeignKey(
         Shop,
         related_name='product_infos',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     name = models.CharField(max_length=255)
     model = models.CharField(max_length=255)
     quantity = models.PositiveIntegerField()
     price = models.PositiveIntegerField()
     price_rrc = models.PositiveIntegerField()
+    version = models.PositiveIntegerField(default=0)
+    content_hash = models.CharField(max_length=32, blank=True, default='')
+
+    objects = ProductInfoQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['shop', 'external_id', 'version'],
+                name='unique_product_info_shop_external_id_version'
+            ),
+        ]
+        # keyset pagination of /products by ordering field and id, the
+        # active version of a shop by id
+        indexes = [
+            models.Index(
+                fields=['price', 'id'], name='product_info_price_id_idx'
+            ),
+            models.Index(
+                fields=['quantity', 'id'], name='product_info_quantity_id_idx'
+            ),
+            models.Index(
+                fields=['shop', 'version', 'id'],
+                name='product_info_shop_version_idx'
+            ),
+            # GROUP BY product of Product.objects.with_offers()
+            models.Index(
+                fields=['product', 'shop', 'version'],
+                include=['price', 'quantity'],
+                name='product_info_offer_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -111,6 +256,14 @@ class ProductInfo(models.Model):
 class Parameter(models.Model):
     name = models.CharField(max_length=255)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name'],
+                name='unique_parameter_name'
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -127,11 +280,161 @@ class ProductParameter(models.Model):
         on_delete=models.CASCADE
     )
     value = models.CharField(max_length=255)
+    # value as a number for range filters, null if it is not numeric
+    numeric_value = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product_info', 'parameter'],
+                name='unique_product_parameter'
+            ),
+        ]
+        # parameter filters and facet counts
+        indexes = [
+            models.Index(
+                fields=['parameter', 'value', 'product_info'],
+                name='product_parameter_value_idx'
+            ),
+            models.Index(
+                fields=['parameter', 'numeric_value', 'product_info'],
+                name='product_parameter_number_idx',
+                condition=models.Q(numeric_value__isnull=False)
+            ),
+        ]
 
     def __str__(self):
         return self.value
 
 
+class CatalogEntry(models.Model):
+    '''
+    Flattened read model of the product listing: one row per product
+    info of the active catalog versions with the names of its product,
+    category and shop and its parameters as {name: value}. It is kept
+    up to date by the importer (backend.readmodel).
+    '''
+    product_info = models.OneToOneField(
+        ProductInfo,
+        primary_key=True,
+        related_name='catalog_entry',
+        on_delete=models.CASCADE
+    )
+    # indexed as the prefix of catalog_entry_shop_idx
+    shop = models.ForeignKey(
+        Shop,
+        related_name='catalog_entries',
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    shop_name = models.CharField(max_length=255)
+    shop_status = models.BooleanField(default=True)
+    product = models.ForeignKey(
+        Product,
+        related_name='catalog_entries',
+        on_delete=models.CASCADE
+    )
+    product_name = models.CharField(max_length=255)
+    category = models.ForeignKey(
+        Category,
+        related_name='catalog_entries',
+        on_delete=models.CASCADE
+    )
+    category_name = models.CharField(max_length=255)
+    external_id = models.PositiveIntegerField()
+    model = models.CharField(max_length=255)
+    quantity = models.PositiveIntegerField()
+    price = models.PositiveIntegerField()
+    price_rrc = models.PositiveIntegerField()
+    parameters = models.JSONField(default=dict)
+
+    class Meta:
+        # keyset pagination by ordering field and id, per category too
+        indexes = [
+            models.Index(
+                fields=['price', 'product_info'],
+                name='catalog_entry_price_idx'
+            ),
+            models.Index(
+                fields=['quantity', 'product_info'],
+                name='catalog_entry_quantity_idx'
+            ),
+            models.Index(
+                fields=['category', 'product_info'],
+                name='catalog_entry_category_idx'
+            ),
+            models.Index(
+                fields=['shop', 'product_info'],
+                name='catalog_entry_shop_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return self.product_name
+
+
+class ProductOffer(models.Model):
+    '''
+    Rollup of Product.objects.with_offers() per product, refreshed by
+    the importer when PRODUCT_OFFER_ROLLUPS is on (backend.readmodel).
+    '''
+    product = models.OneToOneField(
+        Product,
+        primary_key=True,
+        related_name='offer',
+        on_delete=models.CASCADE
+    )
+    min_price = models.PositiveIntegerField()
+    max_price = models.PositiveIntegerField()
+    quantity = models.PositiveIntegerField()
+    shops = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['min_price', 'product'],
+                name='product_offer_min_price_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id}: {self.min_price}-{self.max_price}'
+
+
+# the sum of an order over its items, in bigint as the product of
+# two integer columns overflows integer
+ORDER_ITEMS_TOTAL = models.Sum(
+    Cast('quantity', models.BigIntegerField())
+    * models.F('product_info__price')
+)
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_total_sum(self):
+        '''
+        Annotates total_sum, the sum of quantity times price of the
+        items, computed by a subquery so that joins of the order
+        filters neither restrict nor repeat the items.
+        '''
+        items = OrderItem.objects.filter(order=models.OuterRef('pk')).values(
+            'order'
+        ).annotate(total=ORDER_ITEMS_TOTAL).values('total')
+        return self.annotate(
+            total_sum=Coalesce(
+                models.Subquery(items), 0,
+                output_field=models.BigIntegerField()
+            )
+        )
+
+    def with_items(self):
+        '''
+        Prefetches the items and annotates the order total.
+        '''
+        return self.with_total_sum().prefetch_related(
+            models.Prefetch('items', queryset=OrderItem.objects.order_by('id'))
+        )
+
+
 class Order(models.Model):
     STATE_CHOICES = (
         ('basket', 'Статус корзины'),
@@ -155,6 +458,19 @@ class Order(models.Model):
         default='basket'
     )
 
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        # keyset pagination of the user's orders by id, the basket
+        indexes = [
+            models.Index(fields=['user', 'id'], name='order_user_id_idx'),
+            models.Index(
+                fields=['user', 'id'],
+                condition=models.Q(status='basket'),
+                name='order_basket_user_idx'
+            ),
+        ]
+
     def __str__(self):
         return f'Order {self.pk} ({self.user.username})'
 
@@ -167,13 +483,24 @@ class OrderItem(models.Model):
     )
     # product = models.ForeignKey(Product, on_delete=models.CASCADE)
     # shop = models.ForeignKey(Shop, on_delete=models.CASCADE)
+    # indexed as the prefix of order_item_product_info_idx
     product_info = models.ForeignKey(
         ProductInfo,
         related_name='ordered_items',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     quantity = models.IntegerField()
 
+    class Meta:
+        # the orders of a shop's goods
+        indexes = [
+            models.Index(
+                fields=['product_info', 'order'],
+                name='order_item_product_info_idx'
+            ),
+        ]
+
     def __str__(self):
         return f'{self.product} ({self.quantity})'
 
@@ -215,3 +542,41 @@ class ConfirmEmailToken(models.Model):
 
     def __str__(self):
         return f"{self.user.email} - {self.created_at}"
+
+
+class ImportJob(models.Model):
+    STATUS_CHOICES = (
+        ('queued', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Завершен'),
+        ('failed', 'Ошибка'),
+    )
+
+    user = models.ForeignKey(
+        User,
+        related_name='import_jobs',
+        on_delete=models.CASCADE
+    )
+    task_id = models.CharField(max_length=255, blank=True, default='')
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='queued'
+    )
+    phase = models.CharField(max_length=255, blank=True, default='')
+    mode = models.CharField(max_length=20, default='replace')
+    format = models.CharField(max_length=10, default='yaml')
+    file = models.CharField(max_length=255, blank=True, default='')
+    url = models.URLField(blank=True, default='')
+    # price list posted as the request body, stored in
+    # PRICE_LIST_UPLOAD_DIR until the import is done
+    upload = models.CharField(max_length=255, blank=True, default='')
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    rows_processed = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    report = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Import {self.pk} ({self.status})'
@@ -0,0 +1,174 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import attrgetter, or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    '''
+    Cursor pagination on the values of the ordering fields.
+
+    The ordering comes from OrderingFilter, the view's ``ordering`` or
+    the queryset and gets the primary key as a tiebreaker, the cursor
+    holds the ordering values of the last row of the page, so the next
+    page is a ``WHERE (price, id) > (...)`` range scan on a matching
+    index and deep pages cost the same as the first one.
+    '''
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    ordering = ('-pk',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        values, reverse = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [self.reverse_field(field) for field in ordering]
+        if values is not None:
+            try:
+                queryset = queryset.filter(
+                    self.keyset_filter(ordering, values)
+                )
+            except (TypeError, ValueError, ValidationError):
+                # values of the wrong type for their fields
+                raise NotFound(self.invalid_cursor_message)
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next = values is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = values is not None
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        for backend in getattr(view, 'filter_backends', ()):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+        if not ordering:
+            # e.g. the search rank ordering of a filter backend
+            ordering = (
+                getattr(view, 'ordering', None)
+                or queryset.query.order_by
+                or self.ordering
+            )
+        ordering = [
+            '-pk' if field == '-id' else 'pk' if field == 'id' else field
+            for field in ordering
+        ]
+        if 'pk' not in ordering and '-pk' not in ordering:
+            # the tiebreaker follows the direction of the first field
+            # so both fit one index scanned either way
+            ordering.append('-pk' if ordering[0].startswith('-') else 'pk')
+        return ordering
+
+    @staticmethod
+    def reverse_field(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def keyset_filter(ordering, values):
+        '''
+        Rows after values in ordering: the first field past its value,
+        or equal to it and the next field past its value, and so on.
+        '''
+        conditions = []
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {
+                previous.lstrip('-'): value
+                for previous, value in zip(ordering[:index], values)
+            }
+            conditions.append(
+                Q(**equal, **{f'{name}__{lookup}': values[index]})
+            )
+        return reduce(or_, conditions)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            values, reverse = json.loads(
+                urlsafe_b64decode(cursor.encode()).decode()
+            )
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, bool(reverse)
+
+    def encode_cursor(self, row, reverse):
+        # rows of a values() queryset are dicts
+        if isinstance(row, dict):
+            values = [row[field.lstrip('-')] for field in self.ordering]
+        else:
+            values = [
+                attrgetter(field.lstrip('-').replace('__', '.'))(row)
+                for field in self.ordering
+            ]
+        cursor = urlsafe_b64encode(
+            json.dumps([values, reverse], default=str).encode()
+        ).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, cursor
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(
+                self.base_url, self.cursor_query_param
+            )
+        return self.encode_cursor(self.page[0], True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
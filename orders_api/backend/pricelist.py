@@ -0,0 +1,555 @@
+import codecs
+import contextlib
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+from collections import namedtuple
+from urllib.parse import urlparse
+
+import yaml
+from yaml.events import (
+    AliasEvent,
+    MappingEndEvent,
+    MappingStartEvent,
+    ScalarEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+    StreamEndEvent,
+)
+from yaml.nodes import ScalarNode
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+
+HEADER_KEYS = ('shop', 'categories')
+
+CSV_COLUMNS = (
+    'id', 'category', 'model', 'name', 'price', 'price_rrc', 'quantity'
+)
+CSV_OPTIONAL_COLUMNS = ('category_name',)
+
+CONTENT_TYPES = {
+    'application/x-yaml': 'yaml',
+    'application/yaml': 'yaml',
+    'text/yaml': 'yaml',
+    'application/json': 'json',
+    'application/x-ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+    'application/jsonlines': 'jsonl',
+    'text/csv': 'csv',
+}
+
+EXTENSIONS = {
+    '.yaml': 'yaml',
+    '.yml': 'yaml',
+    '.json': 'json',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.csv': 'csv',
+}
+
+
+class PriceListError(ValueError):
+    pass
+
+
+Item = namedtuple(
+    'Item',
+    (
+        'id', 'category', 'model', 'name', 'price', 'price_rrc', 'quantity',
+        'parameters', 'category_name',
+    ),
+    defaults=(None,)
+)
+Item.__doc__ = '''
+Price list item as read by the importer, parameters is
+a tuple of (name, value) pairs.
+'''
+
+
+def make_item(goods):
+    '''
+    Converts an item of the goods list of a YAML/JSON price list.
+    '''
+    if isinstance(goods, Item):
+        return goods
+    return Item(
+        goods['id'],
+        goods['category'],
+        goods['model'],
+        goods['name'],
+        goods['price'],
+        goods['price_rrc'],
+        goods['quantity'],
+        tuple((goods.get('parameters') or {}).items()),
+        goods.get('category_name'),
+    )
+
+
+class EventBuilder:
+    '''
+    Builds python objects from a stream of YAML parser events
+    without composing the whole document into nodes first.
+    '''
+    def __init__(self, loader):
+        self.loader = loader
+        self.anchors = {}
+
+    def construct(self, event):
+        if isinstance(event, AliasEvent):
+            try:
+                return self.anchors[event.anchor]
+            except KeyError:
+                raise yaml.composer.ComposerError(
+                    None, None,
+                    f'found undefined alias {event.anchor!r}',
+                    event.start_mark
+                )
+        if isinstance(event, ScalarEvent):
+            value = self.construct_scalar(event)
+        elif isinstance(event, SequenceStartEvent):
+            value = list(self.iter_sequence())
+        elif isinstance(event, MappingStartEvent):
+            value = self.construct_mapping()
+        else:
+            raise yaml.composer.ComposerError(
+                None, None, f'unexpected event {event}', event.start_mark
+            )
+        if event.anchor is not None:
+            self.anchors[event.anchor] = value
+        return value
+
+    def construct_scalar(self, event):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = self.loader.resolve(ScalarNode, event.value, event.implicit)
+        node = ScalarNode(
+            tag, event.value, event.start_mark, event.end_mark, event.style
+        )
+        constructors = self.loader.yaml_constructors
+        constructor = constructors.get(tag, constructors[None])
+        return constructor(self.loader, node)
+
+    def construct_mapping(self):
+        mapping = {}
+        while not self.loader.check_event(MappingEndEvent):
+            key = self.construct(self.loader.get_event())
+            mapping[key] = self.construct(self.loader.get_event())
+        self.loader.get_event()
+        return mapping
+
+    def iter_sequence(self):
+        while not self.loader.check_event(SequenceEndEvent):
+            yield self.construct(self.loader.get_event())
+        self.loader.get_event()
+
+
+def iter_goods(loader, builder):
+    try:
+        for goods in builder.iter_sequence():
+            yield make_item(goods)
+    finally:
+        loader.dispose()
+
+
+def read_yaml_price_list(stream):
+    '''
+    Reads a YAML (or JSON) price list from the stream.
+
+    Returns a dict with the top level keys of the document where
+    ``goods`` is an iterator that parses the goods one at a time, so
+    memory does not grow with the size of the price list. Keys that
+    follow ``goods`` are ignored. If ``goods`` comes before ``shop``
+    and ``categories`` the goods are read into a list instead.
+    '''
+    loader = SafeLoader(stream)
+    builder = EventBuilder(loader)
+    loader.get_event()
+    if loader.check_event(StreamEndEvent):
+        loader.dispose()
+        raise yaml.YAMLError('price list is empty')
+    loader.get_event()
+    if not loader.check_event(MappingStartEvent):
+        loader.dispose()
+        raise yaml.YAMLError('price list must be a mapping')
+    loader.get_event()
+
+    data = {}
+    while not loader.check_event(MappingEndEvent):
+        key = builder.construct(loader.get_event())
+        if (
+            key == 'goods'
+            and all(name in data for name in HEADER_KEYS)
+            and loader.check_event(SequenceStartEvent)
+        ):
+            loader.get_event()
+            data[key] = iter_goods(loader, builder)
+            return data
+        data[key] = builder.construct(loader.get_event())
+    loader.dispose()
+    if isinstance(data.get('goods'), list):
+        data['goods'] = [make_item(goods) for goods in data['goods']]
+    return data
+
+
+WHITESPACE = re.compile(r'\s*')
+
+
+class JSONScanner:
+    '''
+    Reads a JSON document from a text or binary stream one value at a
+    time, holding a chunk of the stream and the value being decoded.
+    '''
+    def __init__(self, stream, chunk_size=64 * 1024):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+        self.started = False
+        self.eof = False
+
+    def read(self, size):
+        chunk = self.stream.read(size)
+        self.eof = not chunk
+        if isinstance(chunk, bytes):
+            chunk = self.text_decoder.decode(chunk, final=self.eof)
+        elif not self.started:
+            chunk = chunk.removeprefix('\ufeff')
+        self.started = True
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+
+    def next_char(self):
+        '''
+        The next character that is not whitespace, '' at the end.
+        '''
+        while True:
+            self.position = WHITESPACE.match(
+                self.buffer, self.position
+            ).end()
+            if self.position < len(self.buffer) or self.eof:
+                return self.buffer[self.position:self.position + 1]
+            self.read(self.chunk_size)
+
+    def take(self, char):
+        if self.next_char() != char:
+            return False
+        self.position += 1
+        return True
+
+    def expect(self, char):
+        if not self.take(char):
+            raise PriceListError(
+                f'expected {char!r}, got {self.next_char()!r}'
+            )
+
+    def decode(self):
+        '''
+        The next value. A value that is cut off, or may continue, at
+        the end of the buffer is decoded again with more of the stream,
+        read in growing chunks.
+        '''
+        size = self.chunk_size
+        while True:
+            self.next_char()
+            try:
+                value, end = self.decoder.raw_decode(
+                    self.buffer, self.position
+                )
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            self.read(size)
+            size *= 2
+
+
+def iter_json_goods(scanner):
+    if scanner.take(']'):
+        return
+    while True:
+        yield make_item(scanner.decode())
+        if not scanner.take(','):
+            scanner.expect(']')
+            return
+
+
+def read_json_price_list(stream):
+    '''
+    Reads a JSON price list from the stream like read_yaml_price_list:
+    ``goods`` is an iterator that decodes the goods one at a time when
+    it follows ``shop`` and ``categories``, otherwise a list.
+    '''
+    scanner = JSONScanner(stream)
+    if not scanner.take('{'):
+        raise PriceListError('price list must be an object')
+    data = {}
+    if not scanner.take('}'):
+        while True:
+            key = scanner.decode()
+            scanner.expect(':')
+            if (
+                key == 'goods'
+                and all(name in data for name in HEADER_KEYS)
+                and scanner.take('[')
+            ):
+                data[key] = iter_json_goods(scanner)
+                return data
+            data[key] = scanner.decode()
+            if not scanner.take(','):
+                scanner.expect('}')
+                break
+    data['goods'] = [make_item(goods) for goods in data.get('goods', [])]
+    return data
+
+
+def find_json_key(stream, keys, chunk_size=64 * 1024):
+    '''
+    First of keys among the top level keys of the JSON object in the
+    stream, None if it has none of them or is no object. Only the
+    values of the keys before it are decoded, the document is read no
+    further.
+    '''
+    scanner = JSONScanner(stream, chunk_size)
+    try:
+        if not scanner.take('{'):
+            return None
+        while scanner.next_char() == '"':
+            key = scanner.decode()
+            if key in keys:
+                return key
+            if not scanner.take(':'):
+                return None
+            scanner.decode()
+            if not scanner.take(','):
+                return None
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        pass
+    return None
+
+
+def iter_jsonl_goods(lines):
+    for line in lines:
+        if line.strip():
+            yield make_item(json.loads(line))
+
+
+def read_jsonl_price_list(stream):
+    '''
+    Reads a JSON Lines price list: the first line is an object with
+    the shop and categories, every following line is one item.
+    '''
+    lines = iter(stream)
+    try:
+        data = json.loads(next(lines))
+    except StopIteration:
+        raise PriceListError('price list is empty')
+    if not isinstance(data, dict):
+        raise PriceListError('first line must be an object')
+    data['goods'] = iter_jsonl_goods(lines)
+    return data
+
+
+def iter_csv_goods(reader, header):
+    '''
+    Builds items straight from the CSV row lists by column index,
+    columns other than the item fields are parameters.
+    '''
+    columns = [header.index(name) for name in CSV_COLUMNS]
+    id_, category, model, name, price, price_rrc, quantity = columns
+    category_name = (
+        header.index('category_name') if 'category_name' in header else None
+    )
+    known = set(CSV_COLUMNS + CSV_OPTIONAL_COLUMNS)
+    parameters = [
+        (column, index)
+        for index, column in enumerate(header)
+        if column not in known
+    ]
+    for row in reader:
+        if not row:
+            continue
+        yield Item(
+            int(row[id_]),
+            int(row[category]),
+            row[model],
+            row[name],
+            int(row[price]),
+            int(row[price_rrc]),
+            int(row[quantity]),
+            tuple(
+                (parameter, row[index])
+                for parameter, index in parameters
+                if row[index] != ''
+            ),
+            row[category_name] if category_name is not None else None,
+        )
+
+
+def read_csv_price_list(stream):
+    '''
+    Reads a CSV price list with a header row. It carries no shop and
+    categories: the goods are imported into the user's shop and
+    unknown categories are created from the category_name column.
+    '''
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        raise PriceListError('price list is empty')
+    missing = [name for name in CSV_COLUMNS if name not in header]
+    if missing:
+        raise PriceListError(f'missing columns: {", ".join(missing)}')
+    return {
+        'shop': None,
+        'categories': [],
+        'goods': iter_csv_goods(reader, header),
+    }
+
+
+def guess_format(content_type='', name=''):
+    '''
+    Price list format by content type, falling back to the extension
+    of the file name or url and then to YAML.
+    '''
+    content_type = content_type.split(';')[0].strip().lower()
+    if content_type in CONTENT_TYPES:
+        return CONTENT_TYPES[content_type]
+    extension = os.path.splitext(urlparse(name).path)[1].lower()
+    return EXTENSIONS.get(extension, 'yaml')
+
+
+READERS = {
+    'yaml': read_yaml_price_list,
+    'json': read_json_price_list,
+    'jsonl': read_jsonl_price_list,
+    'csv': read_csv_price_list,
+}
+
+
+def read_price_list(stream, format='yaml'):
+    '''
+    Reads a price list in one of the READERS formats. The result is a
+    dict with shop, categories and goods, an iterable of Item.
+    '''
+    try:
+        reader = READERS[format]
+    except KeyError:
+        raise PriceListError(f'unknown price list format: {format}')
+    return reader(stream)
+
+
+def write_yaml_goods(stream, goods):
+    for item in goods:
+        stream.write(yaml.safe_dump(
+            [item], allow_unicode=True, sort_keys=False
+        ))
+
+
+def write_price_list(stream, data, format='yaml', parameters=None):
+    '''
+    Writes a price list dict (goods as dicts) to a text stream in one
+    of the READERS formats, goods are written one at a time so they
+    may be a generator. CSV needs the parameter names for its header,
+    without them the goods are read into a list to collect the names.
+    '''
+    header = {'shop': data['shop'], 'categories': data['categories']}
+    if format == 'yaml':
+        stream.write(yaml.safe_dump(
+            header, allow_unicode=True, sort_keys=False
+        ))
+        stream.write('goods:\n')
+        write_yaml_goods(stream, data['goods'])
+    elif format == 'json':
+        stream.write(json.dumps(header, ensure_ascii=False)[:-1])
+        stream.write(', "goods": [')
+        for i, item in enumerate(data['goods']):
+            if i:
+                stream.write(', ')
+            stream.write(json.dumps(item, ensure_ascii=False))
+        stream.write(']}\n')
+    elif format == 'jsonl':
+        stream.write(json.dumps(header, ensure_ascii=False) + '\n')
+        for item in data['goods']:
+            stream.write(json.dumps(item, ensure_ascii=False) + '\n')
+    elif format == 'csv':
+        goods = data['goods']
+        if parameters is None:
+            goods = list(goods)
+            parameters = sorted({
+                name for item in goods for name in item['parameters']
+            })
+        # the categories of the header go into the category_name column
+        category_names = {
+            category['id']: category['name']
+            for category in data['categories']
+        }
+        writer = csv.writer(stream)
+        writer.writerow(
+            CSV_COLUMNS + CSV_OPTIONAL_COLUMNS + tuple(parameters)
+        )
+        for item in goods:
+            writer.writerow(
+                [item[column] for column in CSV_COLUMNS]
+                + [category_names.get(item['category'], '')]
+                + [item['parameters'].get(name, '') for name in parameters]
+            )
+    else:
+        raise PriceListError(f'unknown price list format: {format}')
+
+
+def fingerprint(stream):
+    '''
+    SHA-256 of the price list in a canonical form: line endings are
+    normalized, trailing whitespace and a UTF-8 byte order mark are
+    stripped, so the same price list re-posted from another system
+    hashes the same. Bytes are hashed as they are, in any encoding.
+    '''
+    digest = hashlib.sha256()
+    for number, line in enumerate(stream):
+        if isinstance(line, str):
+            line = line.encode()
+        if number == 0:
+            line = line.removeprefix(codecs.BOM_UTF8)
+        digest.update(line.rstrip())
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def save_upload(stream, directory, suffix='', chunk_size=64 * 1024):
+    '''
+    Copies the stream chunk by chunk to a new file in directory and
+    returns its path, None if the stream holds only whitespace.
+    '''
+    os.makedirs(directory, exist_ok=True)
+    empty = True
+    with tempfile.NamedTemporaryFile(
+        'wb', dir=directory, suffix=suffix, delete=False
+    ) as f:
+        if stream is not None:
+            for chunk in iter(lambda: stream.read(chunk_size), b''):
+                f.write(chunk)
+                empty = empty and not chunk.strip()
+    if empty:
+        os.remove(f.name)
+        return None
+    return f.name
+
+
+def delete_upload(path):
+    if path:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
@@ -0,0 +1,102 @@
+from itertools import islice
+
+from .models import CatalogEntry, Product, ProductInfo, ProductOffer, Shop
+
+
+ENTRY_FIELDS = (
+    'shop', 'shop_name', 'shop_status', 'product', 'product_name',
+    'category', 'category_name', 'external_id', 'model', 'quantity',
+    'price', 'price_rrc', 'parameters',
+)
+
+
+def build_catalog_entry(product_info):
+    product = product_info.product
+    return CatalogEntry(
+        product_info_id=product_info.id,
+        shop_id=product_info.shop_id,
+        shop_name=product_info.shop.name,
+        shop_status=product_info.shop.status,
+        product_id=product.id,
+        product_name=product.name,
+        category_id=product.category_id,
+        category_name=product.category.name,
+        external_id=product_info.external_id,
+        model=product_info.model,
+        quantity=product_info.quantity,
+        price=product_info.price,
+        price_rrc=product_info.price_rrc,
+        parameters={
+            product_parameter.parameter.name: product_parameter.value
+            for product_parameter in product_info.product_parameters.all()
+        },
+    )
+
+
+def refresh_catalog_entries(product_info_ids, chunk_size=1000):
+    '''
+    Upserts the catalog entries of the product info, a few queries
+    per chunk.
+    '''
+    product_info_ids = iter(product_info_ids)
+    while True:
+        chunk = list(islice(product_info_ids, chunk_size))
+        if not chunk:
+            return
+        product_infos = ProductInfo.objects.filter(
+            id__in=chunk
+        ).with_details().select_related('shop')
+        CatalogEntry.objects.bulk_create(
+            [
+                build_catalog_entry(product_info)
+                for product_info in product_infos
+            ],
+            update_conflicts=True,
+            unique_fields=('product_info',),
+            update_fields=ENTRY_FIELDS
+        )
+
+
+def rebuild_shop_catalog_entries(shop_id, chunk_size=1000):
+    '''
+    Replaces the catalog entries of the shop with the ones of its
+    active catalog version.
+    '''
+    shop = Shop.objects.get(id=shop_id)
+    CatalogEntry.objects.filter(shop_id=shop.id).delete()
+    refresh_catalog_entries(
+        ProductInfo.objects.filter(
+            shop_id=shop.id, version=shop.catalog_version
+        ).values_list('id', flat=True).iterator(chunk_size=chunk_size),
+        chunk_size
+    )
+
+
+def shop_product_ids(shop_id, versions):
+    '''
+    Ids of the products the shop offers in the catalog versions.
+    '''
+    return set(
+        ProductInfo.objects.filter(
+            shop_id=shop_id, version__in=versions
+        ).values_list('product_id', flat=True).distinct()
+    )
+
+
+def refresh_product_offers(product_ids, chunk_size=1000):
+    '''
+    Recomputes the ProductOffer rollups of the products, products
+    without offers lose their rollup.
+    '''
+    product_ids = iter(product_ids)
+    while True:
+        chunk = list(islice(product_ids, chunk_size))
+        if not chunk:
+            return
+        rows = Product.objects.filter(id__in=chunk).with_offers().values(
+            'id', 'min_price', 'max_price', 'quantity', 'shops'
+        )
+        ProductOffer.objects.filter(product_id__in=chunk).delete()
+        ProductOffer.objects.bulk_create(
+            ProductOffer(product_id=row.pop('id'), **row) for row in rows
+        )
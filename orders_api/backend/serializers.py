@@ -1,9 +1,14 @@
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth.hashers import make_password
+from django.db.models import Prefetch
 from rest_framework import serializers
+from .fieldsets import SparseFieldsMixin
 from .models import (
+    ORDER_ITEMS_TOTAL,
+    CatalogEntry,
     Category,
     Contact,
+    ImportJob,
     Order,
     OrderItem,
     Product,
@@ -58,18 +63,19 @@ class UserSerializer(serializers.ModelSerializer):
         return instance
 
 
-class CatygorySerializer(serializers.ModelSerializer):
+class CatygorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Category
         fields = '__all__'
 
 
-class ShopSerializer(serializers.ModelSerializer):
+class ShopSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Shop
-        fields = '__all__'
+        # the catalog bookkeeping columns are internal
+        fields = ('id', 'name', 'user', 'url', 'filename', 'status')
 
 class ProductSerializer(serializers.ModelSerializer):
     category = serializers.StringRelatedField()
@@ -87,7 +93,7 @@ class ProductParameterSerializer(serializers.ModelSerializer):
         fields = ('parameter', 'value',)
 
 
-class ProductInfoSerializer(serializers.ModelSerializer):
+class ProductInfoSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     product_parameters = ProductParameterSerializer(read_only=True, many=True)
 
@@ -97,8 +103,66 @@ class ProductInfoSerializer(serializers.ModelSerializer):
         #     'id', 'model', 'product', 'shop',
         #     'quantity', 'price', 'price_rrc', 'product_parameters',
         # )
-        fields = '__all__'
+        # the catalog version and content hash are internal
+        fields = (
+            'id', 'product', 'product_parameters', 'external_id', 'name',
+            'model', 'quantity', 'price', 'price_rrc', 'shop',
+        )
         read_only_fields = ('id',)
+        expandable_fields = ('product', 'product_parameters')
+
+    def narrow_queryset(self, queryset, extra=()):
+        '''
+        Loads only the relations of the requested fields, as primary
+        keys unless they are expanded.
+        '''
+        queryset = queryset.select_related(None).prefetch_related(None)
+        names = self.get_loaded_fields()
+        if 'product' in self.fields and 'product' in self.expanded:
+            queryset = queryset.select_related('product__category')
+            names.update(('product__name', 'product__category__name'))
+        if 'product_parameters' in self.fields:
+            if 'product_parameters' in self.expanded:
+                parameters = ProductParameter.objects.select_related(
+                    'parameter'
+                ).only('product_info', 'value', 'parameter__name')
+            else:
+                parameters = ProductParameter.objects.only('product_info')
+            parameters = parameters.order_by('id')
+            queryset = queryset.prefetch_related(
+                Prefetch('product_parameters', queryset=parameters)
+            )
+        return queryset.only(*names, *extra)
+
+
+class CatalogEntrySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(source='product_info_id', read_only=True)
+
+    class Meta:
+        model = CatalogEntry
+        fields = (
+            'id', 'external_id', 'model', 'price', 'price_rrc', 'quantity',
+            'shop', 'shop_name', 'shop_status', 'product', 'product_name',
+            'category', 'category_name', 'parameters',
+        )
+        read_only_fields = fields
+
+
+class ProductOfferSerializer(serializers.ModelSerializer):
+    product = serializers.IntegerField(source='id', read_only=True)
+    category = serializers.StringRelatedField()
+    min_price = serializers.IntegerField(read_only=True)
+    max_price = serializers.IntegerField(read_only=True)
+    quantity = serializers.IntegerField(read_only=True)
+    shops = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Product
+        fields = (
+            'product', 'name', 'category', 'min_price', 'max_price',
+            'quantity', 'shops',
+        )
+        read_only_fields = fields
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -107,7 +171,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ('product_info', 'quantity')
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
     total_sum = serializers.SerializerMethodField()
 
@@ -131,16 +195,29 @@ class OrderSerializer(serializers.ModelSerializer):
         return instance
     
     def get_total_sum(self, obj):
-        return sum(
-            item.quantity * item.product_info.price
-            for item in obj.items.all()
-        )
+        '''
+        The total_sum annotation of Order.objects.with_total_sum(),
+        aggregated in one query for an order without it.
+        '''
+        if hasattr(obj, 'total_sum'):
+            return obj.total_sum
+        return obj.items.aggregate(total=ORDER_ITEMS_TOTAL)['total'] or 0
 
 
-class ContactSerializer(serializers.ModelSerializer):
+class ContactSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Contact
         # fields = ('id', 'type', 'value',)
         fields = '__all__'
         read_only_fields = ('id', 'user')
+
+
+class ImportJobSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+
+    class Meta:
+        model = ImportJob
+        fields = (
+            'id', 'status', 'phase', 'mode', 'format', 'file', 'url',
+            'rows_processed', 'errors', 'report', 'created_at', 'updated_at',
+        )
@@ -0,0 +1,148 @@
+import re
+from bisect import bisect_left
+from heapq import nsmallest
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Collate, Lower
+
+from .cache import catalog_generation
+from .models import CatalogEntry, Product
+
+
+_trigram_available = {}
+_prefix_index = None
+
+
+def on_sale():
+    '''
+    Catalog entries of goods in stock at shops with status on.
+    '''
+    return CatalogEntry.objects.filter(quantity__gt=0, shop_status=True)
+
+
+def trigram_available():
+    '''
+    Whether the pg_trgm extension and its product name index exist,
+    migration 0020 skips them where pg_trgm is not available.
+    '''
+    database = connection.settings_dict['NAME']
+    if database not in _trigram_available:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_indexes WHERE indexname = %s",
+                ['product_name_trgm_idx']
+            )
+            _trigram_available[database] = cursor.fetchone() is not None
+    return _trigram_available[database]
+
+
+def suggest_queryset(term, later_words=False):
+    '''
+    Distinct names of products on sale that start with term, on
+    product_name_prefix_idx, or with later_words the other names with
+    a word after the first one that starts with it, on
+    product_name_trgm_idx where pg_trgm is available. Both are ordered
+    by the lowercase name.
+    '''
+    term = term.lower()
+    queryset = Product.objects.filter(
+        Exists(on_sale().filter(product=OuterRef('pk')))
+    ).annotate(lower_name=Collate(Lower('name'), 'C'))
+    if later_words:
+        queryset = queryset.annotate(words=Lower('name')).filter(
+            words__regex=r'\s' + re.escape(term)
+        ).exclude(lower_name__startswith=term)
+    else:
+        queryset = queryset.filter(lower_name__startswith=term)
+    return queryset.order_by(
+        'lower_name', Collate('name', 'C')
+    ).values_list(
+        'name', flat=True
+    ).distinct()
+
+
+class PrefixIndex:
+    '''
+    In-process index of product names: sorted lists of the lowercase
+    names and of the lowercase names from the start of each later
+    word, so binary searches find the names with a word that starts
+    with the term. Matches suggest_queryset: names that start with the
+    term first, then the names with a later word that does.
+    '''
+    def __init__(self, names):
+        starts = set()
+        keys = []
+        for name in names:
+            lower = name.lower()
+            starts.add((lower, name))
+            start = 0
+            for number, word in enumerate(lower.split()):
+                start = lower.index(word, start)
+                if number:
+                    keys.append((lower[start:], lower, name))
+                start += len(word)
+        self.starts = sorted(starts)
+        keys.sort()
+        self.keys = keys
+
+    def suggest(self, term, limit):
+        term = term.lower()
+        names = []
+        index = bisect_left(self.starts, (term,))
+        while index < len(self.starts) and len(names) < limit:
+            lower, name = self.starts[index]
+            if not lower.startswith(term):
+                break
+            names.append(name)
+            index += 1
+        if len(names) == limit:
+            return names
+        later = set()
+        index = bisect_left(self.keys, (term,))
+        while index < len(self.keys):
+            key, lower, name = self.keys[index]
+            if not key.startswith(term):
+                break
+            if not lower.startswith(term):
+                later.add((lower, name))
+            index += 1
+        names.extend(
+            name for lower, name in nsmallest(limit - len(names), later)
+        )
+        return names
+
+
+def get_prefix_index():
+    '''
+    The prefix index of the names of the goods on sale, rebuilt when
+    the catalog generation changes.
+    '''
+    global _prefix_index
+    generation = catalog_generation()
+    if _prefix_index is None or _prefix_index[0] != generation:
+        names = on_sale().values_list(
+            'product_name', flat=True
+        ).distinct()
+        _prefix_index = (generation, PrefixIndex(names.iterator()))
+    return _prefix_index[1]
+
+
+def suggest_names(term, limit):
+    '''
+    Up to limit names of products on sale with a word that starts with
+    term, names that start with it first, from the prefix index with
+    PRODUCT_SUGGEST_PREFIX_INDEX and from the database otherwise.
+    '''
+    term = term.strip()
+    if not term:
+        return []
+    if settings.PRODUCT_SUGGEST_PREFIX_INDEX:
+        return get_prefix_index().suggest(term, limit)
+    names = list(suggest_queryset(term)[:limit])
+    if len(names) < limit:
+        names.extend(
+            suggest_queryset(term, later_words=True)[:limit - len(names)]
+        )
+    return names
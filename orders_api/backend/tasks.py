@@ -1,7 +1,20 @@
+from contextlib import contextmanager
+
 from django.conf import settings
 from django.core.mail import EmailMultiAlternatives
+from django.db import connection
 from celery import shared_task
 
+from .fetcher import fetch_price_list
+from .importer import CatalogImporter, collect_catalog_versions
+from .models import ImportJob, Shop
+from .pricelist import (
+    delete_upload,
+    fingerprint,
+    guess_format,
+    read_price_list,
+)
+
 
 @shared_task()
 def send_mail_task(title: str, messege: str, email: str):
@@ -15,3 +28,162 @@ def send_mail_task(title: str, messege: str, email: str):
         [email]
     )
     msg.send()
+
+
+def open_price_list(job: ImportJob):
+    '''
+    Opens the price list source of the import job. The format of
+    a downloaded price list is taken from the response content type.
+    '''
+    if job.upload:
+        return open(job.upload, encoding='utf-8-sig', newline='')
+    if job.url:
+        result = fetch_price_list(job.url)
+        job.format = guess_format(result.content_type, job.url)
+        return result.file
+    return open(job.file, 'rb')
+
+
+def run_import(job: ImportJob, stream, progress=None):
+    '''
+    Imports the price list stream of the job and saves the outcome
+    on the job. A failed job keeps the phase and the row count it
+    had reached.
+    '''
+    def track(phase, rows_processed):
+        job.phase = phase
+        job.rows_processed = rows_processed
+        if progress is not None:
+            progress(phase, rows_processed)
+
+    job.status = 'running'
+    job.phase = 'parsing'
+    job.rows_processed = 0
+    job.save(update_fields=[
+        'status', 'phase', 'rows_processed', 'task_id', 'format',
+        'updated_at'
+    ])
+    try:
+        data = read_price_list(stream, job.format)
+        importer = CatalogImporter(job.user, mode=job.mode, progress=track)
+        report = importer.run(data)
+    except Exception as e:
+        job.status = 'failed'
+        job.errors = [f'{type(e).__name__}: {e}']
+    else:
+        job.status = 'done'
+        job.report = report
+        job.phase = ''
+        job.rows_processed = report['goods']
+    job.save()
+    if job.status == 'done':
+        Shop.objects.filter(id=report['shop']).update(
+            content_hash=job.content_hash
+        )
+        if job.mode == 'replace':
+            collect_catalog_versions(report['shop'])
+    return job.status
+
+
+@shared_task(bind=True)
+def import_price_list_task(self, job_id: int):
+    '''
+    Celery task that imports a shop price list of ImportJob.
+    Progress is published to the result backend while the import
+    transaction is open, the final state is saved on the job.
+    '''
+    job = ImportJob.objects.select_related('user').get(id=job_id)
+    job.task_id = self.request.id or ''
+
+    def progress(phase, rows_processed):
+        if self.request.id and not self.request.is_eager:
+            self.update_state(
+                state='PROGRESS',
+                meta={'phase': phase, 'rows_processed': rows_processed}
+            )
+
+    try:
+        try:
+            stream = open_price_list(job)
+        except Exception as e:
+            job.status = 'failed'
+            job.errors = [f'{type(e).__name__}: {e}']
+            job.save()
+            return job.status
+        with stream:
+            return run_import(job, stream, progress)
+    finally:
+        delete_upload(job.upload)
+
+
+@shared_task()
+def refresh_shop_catalogs():
+    '''
+    Celery beat task that queues a catalog refresh
+    for every active shop with a price list url.
+    '''
+    shop_ids = Shop.objects.filter(status=True).exclude(
+        url=''
+    ).values_list('id', flat=True)
+    for shop_id in shop_ids:
+        refresh_shop_catalog.delay(shop_id)
+    return len(shop_ids)
+
+
+# first key of the advisory locks of catalog refreshes, the second one
+# is the shop id
+CATALOG_REFRESH_LOCK = 1
+
+
+@contextmanager
+def advisory_lock(*keys):
+    '''
+    Takes the PostgreSQL session advisory lock of keys if it is free,
+    yields whether it did. The lock holds across worker processes and
+    outside of transactions, it is released on exit.
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(%s, %s)', keys)
+        locked = cursor.fetchone()[0]
+    try:
+        yield locked
+    finally:
+        if locked:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s, %s)', keys)
+
+
+@shared_task()
+def refresh_shop_catalog(shop_id: int):
+    '''
+    Celery task that re-imports the price list of a shop from Shop.url.
+
+    The fetch is conditional on the ETag/Last-Modified of the previous
+    one and the price list is only imported when its content hash
+    changed. One refresh per shop runs at a time.
+    '''
+    with advisory_lock(CATALOG_REFRESH_LOCK, shop_id) as locked:
+        if not locked:
+            return 'locked'
+        shop = Shop.objects.select_related('user').get(id=shop_id)
+        result = fetch_price_list(shop.url, shop.etag, shop.last_modified)
+        if result is None:
+            return 'not modified'
+        with result.file as stream:
+            content_hash = fingerprint(stream)
+            job_status = 'not modified'
+            if content_hash != shop.content_hash:
+                stream.seek(0)
+                job = ImportJob.objects.create(
+                    user=shop.user,
+                    mode=settings.CATALOG_REFRESH_MODE,
+                    url=shop.url,
+                    format=guess_format(result.content_type, shop.url),
+                    content_hash=content_hash
+                )
+                job_status = run_import(job, stream)
+        if job_status != 'failed':
+            Shop.objects.filter(id=shop.id).update(
+                etag=result.etag, last_modified=result.last_modified
+            )
+        return job_status
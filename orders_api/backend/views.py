@@ -1,44 +1,84 @@
+import json
+import os
 from datetime import datetime
 from distutils.util import strtobool
-import yaml
+from celery.result import AsyncResult
 
 from rest_framework.views import APIView
 from rest_framework import viewsets
 from rest_framework.generics import RetrieveUpdateAPIView, ListAPIView
 from rest_framework.response import Response
+from rest_framework.exceptions import ParseError
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.filters import OrderingFilter
+from rest_framework.throttling import ScopedRateThrottle
 from django_filters.rest_framework import DjangoFilterBackend
 
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
+from django.db import transaction
 from django.db.models import QuerySet
 from django.core.validators import URLValidator
 from django.core.exceptions import ValidationError
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 
-from backend.tasks import send_mail_task
+from backend.tasks import import_price_list_task, send_mail_task
+from .cache import (
+    CatalogCacheMixin,
+    CatalogETagMixin,
+    bump_catalog_generation,
+)
+from .export import STREAMS, CSVRenderer, NDJSONRenderer
+from .fastpath import (
+    FastPathMixin,
+    OrderValuesSerializer,
+    ProductInfoValuesSerializer,
+)
+from .fieldsets import SparseFieldsParamsMixin, SparseFieldsViewMixin
+from .filters import (
+    CatalogEntryFilterSet,
+    ProductParameterFilter,
+    ProductSearchFilter,
+)
+from .importer import CatalogImporter
+from .pagination import KeysetPagination
 from .permissions import IsShop
+from .pricelist import (
+    CONTENT_TYPES,
+    delete_upload,
+    find_json_key,
+    fingerprint,
+    guess_format,
+    save_upload,
+)
+from .readmodel import refresh_product_offers, shop_product_ids
+from .suggest import suggest_names
 
 from .models import (
+    CatalogEntry,
     ConfirmEmailToken,
     Contact,
+    ImportJob,
     Order,
     ProductInfo,
-    ProductParameter,
     Shop,
     Category,
-    Product,
-    Parameter
+    Product
 )
 from .serializers import (
+    CatalogEntrySerializer,
     CatygorySerializer,
     ContactSerializer,
+    ImportJobSerializer,
     OrderSerializer,
     ProductInfoSerializer,
+    ProductOfferSerializer,
     ShopSerializer,
     UserSerializer
 )
@@ -139,8 +179,17 @@ class PartnerUpdate(APIView):
     """
     View to update a partner's shop with product information.
    
+    The import runs in a celery task, the response carries the id
+    of the ImportJob to poll at partner/update/<job_id>.
+
     Request Parameters:
-    - YAML data containing information about the products to update. 
+    - url or file of the price list, or the price list itself as the
+      request body: YAML, JSON, JSON Lines or CSV chosen by the
+      Content-Type header (mode and force are then query parameters).
+    - mode: 'replace' (default) rebuilds the shop catalog,
+      'sync' updates only the goods that changed by external_id.
+    - force: import the price list even if its content hash matches
+      the last imported one.
     """
     permission_classes = [IsAuthenticated, IsShop]
     
@@ -148,52 +197,56 @@ class PartnerUpdate(APIView):
     #     return Response({'status': 'ok'})
 
     def post(self, request):
-        # Load YAML data from request
-        data, error = self.get_yaml_data(request)
-        print(data)
-        if data is None:
+        # Load price list source from request
+        source, data, error = self.get_source(request)
+        if source is None:
             return error
 
-        # create or get the shop
-        shop, _ = Shop.objects.get_or_create(
-            name=data['shop'], user_id=request.user.id
-        )
-
-        # create or update categories
-        for category in data['categories']:
-            category_object, _ = Category.objects.get_or_create(
-                id=category['id'], name=category['name']
+        params = request.query_params if 'upload' in source else data
+        mode = params.get('mode', 'replace')
+        if mode not in CatalogImporter.MODE_CHOICES:
+            delete_upload(source.get('upload'))
+            return Response(
+                {'error': f'unknown mode: {mode}'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            category_object.shops.add(shop.id)
-            category_object.save()
-
-        # delete existing product info for the shop
-        ProductInfo.objects.filter(shop_id=shop.id).delete()
-
-        # create or update products and product info
-        for item in data['goods']:
-            product, _ = Product.objects.get_or_create(
-                name=item['name'], category_id=item['category']
+        try:
+            force = strtobool(str(params.get('force', False)))
+        except ValueError:
+            delete_upload(source.get('upload'))
+            return Response(
+                {'error': f'invalid force: {params["force"]}'},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-            product_info = ProductInfo.objects.create(
-                product_id=product.id,
-                external_id=item['id'],
-                model=item['model'],
-                price=item['price'],
-                price_rrc=item['price_rrc'],
-                quantity=item['quantity'],
-                shop_id=shop.id
-            )
-            for name, value in item['parameters'].items():
-                parameter_object, _ = Parameter.objects.get_or_create(name=name)
-                ProductParameter.objects.create(
-                    product_info_id=product_info.id,
-                    parameter_id=parameter_object.id,
-                    value=value
+        # skip price lists that did not change since the last import
+        if 'url' not in source:
+            with open(source.get('upload') or source['file'], 'rb') as f:
+                source['content_hash'] = fingerprint(f)
+            if not force and Shop.objects.filter(
+                user=request.user, content_hash=source['content_hash']
+            ).exists():
+                delete_upload(source.get('upload'))
+                return Response(
+                    {'status': True, 'modified': False},
+                    status=status.HTTP_200_OK
                 )
 
-        return Response({'status': True}, status=status.HTTP_200_OK)
+        # hand the import off to celery
+        job = ImportJob.objects.create(user=request.user, mode=mode, **source)
+        transaction.on_commit(lambda: import_price_list_task.delay(job.id))
+
+        return Response(
+            {
+                'status': True,
+                'modified': True,
+                'job': job.id,
+                'url': reverse(
+                    'partner-update-job', kwargs={'job_id': job.id}
+                ),
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
 
         # # Create or update Shop
         # shop_data = {'name': data.get('shop')}
@@ -222,39 +275,112 @@ class PartnerUpdate(APIView):
         #     return Response(product_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         # return Response({'status': 'ok'})
 
-    def get_yaml_data(self, request):
-        url = request.data.get('url')
-        file = request.data.get('file')
+    def get_source(self, request):
+        """
+        Price list source of the request and the request data, which
+        carries mode and force unless the price list is the body.
+        """
+        upload, data, error = self.get_upload(request)
+        if error is not None:
+            return None, None, error
+        if upload is not None:
+            return upload, None, None
+        if data is None:
+            data = request.data
+
+        url = data.get('url')
+        file = data.get('file')
         if url:
             validate_url = URLValidator()
             try:
                 validate_url(url)
             except ValidationError as e:
-                return None, Response(
-                    {'error': str(e)}, status=status.HTTP_400_BAD_REQUEST
-                )
-            try:
-                data = yaml.load(request.body, Loader=yaml.FullLoader)
-            except yaml.YAMLError as e:
-                return None, Response(
+                return None, None, Response(
                     {'error': str(e)}, status=status.HTTP_400_BAD_REQUEST
                 )
+            return {'url': url, 'format': guess_format(name=url)}, data, None
         if file:
+            if not os.path.isfile(file):
+                return None, None, Response(
+                    {'error': f'No such file: {file!r}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            source = {'file': file, 'format': guess_format(name=file)}
+            return source, data, None
+        return None, None, Response(
+            {'error': 'url or file required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    def get_upload(self, request):
+        """
+        Price list posted as the request body, streamed to a file in
+        PRICE_LIST_UPLOAD_DIR that the worker imports and deletes.
+        A JSON body is a price list only when it has goods, otherwise
+        it carries url or file and is returned as the request data.
+        """
+        content_type = request.content_type.split(';')[0].strip().lower()
+        format = CONTENT_TYPES.get(content_type)
+        if format is None:
+            return None, None, None
+        upload = save_upload(
+            request.stream, settings.PRICE_LIST_UPLOAD_DIR, f'.{format}'
+        )
+        if upload is None:
+            return None, None, Response(
+                {'error': 'price list is empty'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if format == 'json':
+            with open(upload, 'rb') as f:
+                key = find_json_key(f, ('goods', 'url', 'file'))
+            if key != 'goods':
+                try:
+                    return None, self.load_json_data(upload), None
+                finally:
+                    delete_upload(upload)
+        return {'upload': upload, 'format': format}, None, None
+
+    def load_json_data(self, path):
+        if os.path.getsize(path) > settings.DATA_UPLOAD_MAX_MEMORY_SIZE:
+            raise ParseError('request body too large')
+        with open(path, 'rb') as f:
             try:
-                with open(file, 'r') as f:
-                    data = yaml.safe_load(f)
-            except FileNotFoundError as e:
-                return None, Response(
-                    {'error': str(e)}, status=status.HTTP_400_BAD_REQUEST
+                data = json.load(f)
+            except ValueError as e:
+                raise ParseError(f'JSON parse error - {e}')
+        return data if isinstance(data, dict) else {}
+
+
+class PartnerUpdateJob(SparseFieldsParamsMixin, APIView):
+    """
+    View to poll the state of a partner's price list import.
+    """
+    permission_classes = [IsAuthenticated, IsShop]
+    serializer_class = ImportJobSerializer
+
+    def get(self, request, job_id):
+        job = get_object_or_404(ImportJob, id=job_id, user=request.user)
+        fields, expand = self.get_sparse_fields()
+        data = self.serializer_class(job, fields=fields, expand=expand).data
+        if job.status == 'running' and job.task_id:
+            progress = AsyncResult(job.task_id).info
+            if isinstance(progress, dict):
+                data.update(
+                    (key, value) for key, value in progress.items()
+                    if key in data
                 )
-        return data, None
+        return Response(data)
 
 
-class CategoryListView(ListAPIView):
+class CategoryListView(
+    CatalogETagMixin, CatalogCacheMixin, SparseFieldsViewMixin, ListAPIView
+):
     """
     API view that returns a list of all categories.
     """
-    queryset = Category.objects.all()
+    cache_key_prefix = 'categories'
+    queryset = Category.objects.prefetch_related('shops')
     serializer_class = CatygorySerializer
 
 
@@ -266,33 +392,178 @@ class CategoryListView(ListAPIView):
 #     serializer_class = ShopSerializer
 
 
-class ShopListRetrieveViewSet(viewsets.ReadOnlyModelViewSet):
+class ShopListRetrieveViewSet(
+    CatalogETagMixin,
+    CatalogCacheMixin,
+    SparseFieldsViewMixin,
+    viewsets.ReadOnlyModelViewSet
+):
     """
     API viewset that provides list and retrieve actions for Shop model.
     """
+    cache_key_prefix = 'shops'
     queryset = Shop.objects.all()
     serializer_class = ShopSerializer
 
 
-class ProductInfoListView(ListAPIView):
+class ProductInfoListView(
+    CatalogETagMixin, SparseFieldsViewMixin, FastPathMixin, ListAPIView
+):
     """
     API view that returns a list of products
-    with optional filtering, ordering, and searching.
+    with optional filtering, ordering, and full-text search.
+    Only the active catalog version of each shop is listed,
+    paginated by cursor over the ordering with an id tiebreaker.
+
+    With ?flat=true the flattened rows of the catalog read model
+    (CatalogEntry) are listed instead, from a single query.
+    ?fields= and ?expand= trim the items and the columns loaded.
     """
-    queryset = ProductInfo.objects.all()
+    queryset = ProductInfo.objects.active().with_details()
     serializer_class = ProductInfoSerializer
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+    values_serializer_class = ProductInfoValuesSerializer
+    pagination_class = KeysetPagination
+    read_model_param = 'flat'
+    filter_backends = [
+        DjangoFilterBackend,
+        ProductParameterFilter,
+        OrderingFilter,
+        ProductSearchFilter,
+    ]
     filterset_fields = ['shop_id', 'product__category_id']
     ordering_fields = ['price', 'quantity']
-    search_fields = ['product__name', 'product__category__name']
+
+    def use_read_model(self):
+        if self.read_model_param is None:
+            return False
+        value = self.request.query_params.get(self.read_model_param)
+        try:
+            return bool(value and strtobool(value))
+        except ValueError:
+            return False
+
+    @property
+    def filterset_class(self):
+        if self.use_read_model():
+            return CatalogEntryFilterSet
+        return None
 
     def get_queryset(self):
-        queryset = ProductInfo.objects.all()
-        queryset = self.filter_queryset(queryset)
-        return queryset
+        # filter_queryset is applied by list()
+        if self.use_read_model():
+            return CatalogEntry.objects.all()
+        return ProductInfo.objects.active().with_details()
 
+    def get_serializer_class(self):
+        if self.use_read_model():
+            return CatalogEntrySerializer
+        return self.serializer_class
 
-class BasketView(APIView):
+
+class ProductFacetsView(ProductInfoListView):
+    """
+    API view that returns the number of products per parameter value
+    for the products listed with the same filters and search.
+    """
+    pagination_class = None
+    read_model_param = None
+
+    def get(self, request):
+        queryset = self.filter_queryset(ProductInfo.objects.active())
+        return Response({'facets': queryset.parameter_facets()})
+
+
+class ProductExportView(ListAPIView):
+    """
+    API view that streams the active catalog for bulk downloads,
+    as NDJSON (?format=jsonl, the default) or CSV (?format=csv),
+    with the filters and search of the product list.
+    Rows are read by a server-side cursor in chunks, so memory use
+    does not depend on the size of the catalog.
+    """
+    queryset = ProductInfo.objects.active()
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    pagination_class = None
+    filter_backends = [
+        DjangoFilterBackend,
+        ProductParameterFilter,
+        ProductSearchFilter,
+    ]
+    filterset_fields = ['shop_id', 'product__category_id']
+    chunk_size = 2000
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if not queryset.query.order_by:
+            queryset = queryset.order_by('pk')
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            STREAMS[renderer.format](queryset, self.chunk_size),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="products.{renderer.format}"'
+        )
+        return response
+
+
+class ProductOffersView(ListAPIView):
+    """
+    API view that returns per product the min and max price, the total
+    quantity and the number of shops of its offers, over the active
+    catalogs of shops with status on. The database aggregates them,
+    or with PRODUCT_OFFER_ROLLUPS they are read from the rollups the
+    importer refreshes.
+    """
+    serializer_class = ProductOfferSerializer
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['category_id']
+    ordering_fields = ['min_price', 'shops']
+    ordering = ('pk',)
+
+    def get_queryset(self):
+        if settings.PRODUCT_OFFER_ROLLUPS:
+            queryset = Product.objects.with_offer_rollups()
+        else:
+            queryset = Product.objects.with_offers()
+        return queryset.select_related('category')
+
+
+class ProductSuggestView(APIView):
+    """
+    API view that returns up to ?limit= names of products on sale
+    matching ?q= for autocomplete, from the database or with
+    PRODUCT_SUGGEST_PREFIX_INDEX from an in-process prefix index.
+    Throttled with its own rate, a client calls it per keystroke.
+    """
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'suggest'
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request):
+        limit = request.query_params.get('limit', self.default_limit)
+        try:
+            limit = min(int(limit), self.max_limit)
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if limit < 1:
+            return Response(
+                {'error': 'limit must be positive'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({
+            'suggestions': suggest_names(
+                request.query_params.get('q', ''), limit
+            )
+        })
+
+
+class BasketView(SparseFieldsParamsMixin, APIView):
     """
     API view for managing the user's shopping basket.
 
@@ -307,15 +578,20 @@ class BasketView(APIView):
     def get(self, request):
         basket = Order.objects.filter(
             user=request.user, status='basket'
-        ).all()
+        ).with_items()
         if basket is None:
             return Response(
                 {'error': 'basket not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        serializer = self.serializer_class(basket, many=True)
-        return Response(serializer.data)
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(basket, request, view=self)
+        fields, expand = self.get_sparse_fields()
+        serializer = self.serializer_class(
+            page, many=True, fields=fields, expand=expand
+        )
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
@@ -365,6 +641,15 @@ class PartnerStatus(APIView):
         if status_shop:
             # request.user.shop.update(status=strtobool(status_shop))
             request.user.shop.status = strtobool(status_shop)
+            request.user.shop.save(update_fields=['status'])
+            CatalogEntry.objects.filter(shop=request.user.shop).update(
+                shop_status=request.user.shop.status
+            )
+            if settings.PRODUCT_OFFER_ROLLUPS:
+                refresh_product_offers(shop_product_ids(
+                    request.user.shop.id, [request.user.shop.catalog_version]
+                ))
+            bump_catalog_generation()
             serializer = self.serializer_class(request.user.shop)
             return Response(serializer.data)
         else:
@@ -374,21 +659,25 @@ class PartnerStatus(APIView):
             )
 
 
-class PartnerOrderListView(ListAPIView):
+class PartnerOrderListView(
+    SparseFieldsViewMixin, FastPathMixin, ListAPIView
+):
     """
     API view that returns a list of orders that belong to the partner.
     """
     permission_classes = (IsAuthenticated, IsShop)
     serializer_class = OrderSerializer
+    values_serializer_class = OrderValuesSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         queryset = Order.objects.filter(
             items__product_info__shop__user__id=self.request.user.id
-        ).exclude(status='basket').distinct()
+        ).exclude(status='basket').distinct().with_items()
         return queryset
 
 
-class ContactView(APIView):
+class ContactView(SparseFieldsParamsMixin, APIView):
     """
     API view for managing contacts associated with the authenticated user.
 
@@ -402,7 +691,10 @@ class ContactView(APIView):
 
     def get(self, request):
         contacts = Contact.objects.filter(user=request.user)
-        serializer = self.serializer_class(contacts, many=True)
+        fields, expand = self.get_sparse_fields()
+        serializer = self.serializer_class(
+            contacts, many=True, fields=fields, expand=expand
+        )
         return Response(serializer.data)
 
     def post(self, request):
@@ -432,7 +724,7 @@ class ContactView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class OrderView(APIView):
+class OrderView(SparseFieldsParamsMixin, APIView):
     """
     API view for retrieving and updating orders belonging to the authenticated user.
 
@@ -444,9 +736,14 @@ class OrderView(APIView):
     def get(self, request):
         queryset = Order.objects.filter(
             user=request.user
+        ).with_items()
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        fields, expand = self.get_sparse_fields()
+        serializer = OrderSerializer(
+            page, many=True, fields=fields, expand=expand
         )
-        serializer = OrderSerializer(queryset, many=True)
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request):
         order_id = request.data.get('id')
@@ -0,0 +1,92 @@
+'''
+Compares the parse time and memory cost of the price list formats
+accepted by PartnerUpdate: YAML, JSON, JSON Lines and CSV, all with
+the schema of data/shop_1.yaml scaled to the given number of goods.
+The columnar CSV reader is also compared with a csv.DictReader
+that builds a dict per row.
+
+Usage: python -m benchmarks.pricelist_formats [--goods 100000]
+'''
+import argparse
+import csv
+import multiprocessing
+import os
+import tempfile
+from itertools import cycle
+
+import yaml
+
+from backend import pricelist
+from benchmarks.pricelist_parser import run
+
+
+SHOP_FILE = os.path.join(
+    os.path.dirname(__file__), os.pardir, os.pardir, 'data', 'shop_1.yaml'
+)
+
+
+def scale_price_list(goods_count):
+    with open(SHOP_FILE) as f:
+        data = yaml.safe_load(f)
+    goods = data['goods']
+    data['goods'] = [
+        dict(item, id=i, price=item['price'] + i % 100)
+        for i, item in zip(range(goods_count), cycle(goods))
+    ]
+    return data
+
+
+def write_price_lists(tmp, data):
+    paths = {}
+    for format in pricelist.READERS:
+        paths[format] = os.path.join(tmp, f'price_list.{format}')
+        with open(paths[format], 'w', newline='') as f:
+            pricelist.write_price_list(f, data, format)
+    return paths
+
+
+def read(path, format):
+    with open(path, 'rb') as f:
+        data = pricelist.read_price_list(f, format)
+        return sum(1 for _ in data['goods'])
+
+
+def read_csv_dicts(path):
+    with open(path, newline='') as f:
+        goods = 0
+        for row in csv.DictReader(f):
+            pricelist.make_item({
+                'id': int(row.pop('id')),
+                'category': int(row.pop('category')),
+                'model': row.pop('model'),
+                'name': row.pop('name'),
+                'price': int(row.pop('price')),
+                'price_rrc': int(row.pop('price_rrc')),
+                'quantity': int(row.pop('quantity')),
+                'category_name': row.pop('category_name'),
+                'parameters': {
+                    name: value for name, value in row.items() if value
+                },
+            })
+            goods += 1
+        return goods
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--goods', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_price_lists(tmp, scale_price_list(args.goods))
+        for format, path in paths.items():
+            size = os.path.getsize(path) / 2 ** 20
+            print(f'{format:<6} {size:>7.1f} MiB')
+        for format, path in paths.items():
+            run(format, read, path, format)
+        run('csv, DictReader', read_csv_dicts, paths['csv'])
+
+
+if __name__ == '__main__':
+    multiprocessing.set_start_method('fork')
+    main()
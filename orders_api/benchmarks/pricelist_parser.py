@@ -0,0 +1,102 @@
+'''
+Compares the memory and time cost of parsing a price list with
+yaml.safe_load (the whole document at once) against the streaming
+backend.pricelist reader.
+
+Usage: python -m benchmarks.pricelist_parser [--goods 50000]
+'''
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+from time import perf_counter
+
+import yaml
+
+from backend import pricelist
+
+
+def write_price_list(path, goods):
+    with open(path, 'w') as f:
+        f.write('shop: Связной\ncategories:\n')
+        f.write('  - id: 224\n    name: Смартфоны\n')
+        f.write('goods:\n')
+        for i in range(goods):
+            f.write(
+                f'  - id: {i}\n'
+                f'    category: 224\n'
+                f'    model: apple/iphone/xs-max\n'
+                f'    name: Смартфон Apple iPhone XS Max {i}GB (золотистый)\n'
+                f'    price: {110000 + i}\n'
+                f'    price_rrc: 116990\n'
+                f'    quantity: {i % 20}\n'
+                f'    parameters:\n'
+                f'      "Диагональ (дюйм)": 6.5\n'
+                f'      "Разрешение (пикс)": 2688x1242\n'
+                f'      "Встроенная память (Гб)": 512\n'
+                f'      "Цвет": золотистый\n'
+            )
+
+
+def current_rss_kb():
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def safe_load(path):
+    with open(path) as f:
+        data = yaml.safe_load(f)
+    return sum(1 for _ in data['goods'])
+
+
+def stream(path, loader=None):
+    if loader is not None:
+        pricelist.SafeLoader = loader
+    with open(path) as f:
+        data = pricelist.read_price_list(f)
+        return sum(1 for _ in data['goods'])
+
+
+def measure(queue, func, path, *args):
+    baseline = current_rss_kb()
+    start = perf_counter()
+    goods = func(path, *args)
+    duration = perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((goods, duration, max(peak - baseline, 0)))
+
+
+def run(name, func, path, *args):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=measure, args=(queue, func, path, *args)
+    )
+    process.start()
+    goods, duration, peak = queue.get()
+    process.join()
+    print(
+        f'{name:<28} {goods:>9} goods {duration:>8.2f} s '
+        f'{peak / 1024:>9.1f} MiB peak'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--goods', type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'price_list.yaml')
+        write_price_list(path, args.goods)
+        print(f'price list: {os.path.getsize(path) / 2 ** 20:.1f} MiB')
+        run('yaml.safe_load (current)', safe_load, path)
+        run('streaming, pure python', stream, path, yaml.SafeLoader)
+        if hasattr(yaml, 'CSafeLoader'):
+            run('streaming, libyaml', stream, path, yaml.CSafeLoader)
+
+
+if __name__ == '__main__':
+    multiprocessing.set_start_method('fork')
+    main()
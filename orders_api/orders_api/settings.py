@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 import os
 from pathlib import Path
 
+from celery.schedules import crontab
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites',
+    'django.contrib.postgres',
 
     'rest_framework',
     'rest_framework.authtoken',
@@ -155,7 +158,8 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_THROTTLE_RATES': {
         'user': '40/min',
-        'anon': '20/min'
+        'anon': '20/min',
+        'suggest': '600/min'
     },
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     # 'DEFAULT_PERMISSION_CLASSES': [
@@ -206,8 +210,56 @@ SPECTACULAR_SETTINGS = {
     # OTHER SETTINGS
 }
 
+# Cached responses of the catalog views are keyed on a generation
+# counter bumped by imports (backend.cache). The counter is shared by
+# the web and Celery worker processes, so the responses cache is Redis,
+# tests use locmem (orders_api.settings_test)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv(
+            'RESPONSE_CACHE_URL', 'redis://localhost:6379/1'
+        ),
+    },
+}
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_TIMEOUT = 24 * 60 * 60
+
+# /products and partner/orders build their items from values() rows
+# (backend.fastpath) instead of the serializers
+FAST_SERIALIZERS = True
+
+# products/offers reads the ProductOffer rollups refreshed by imports
+# instead of aggregating the offers per request
+PRODUCT_OFFER_ROLLUPS = False
+
+# products/suggest matches names in an in-process prefix index rebuilt
+# when the catalog generation changes instead of querying the database
+PRODUCT_SUGGEST_PREFIX_INDEX = False
+
 CELERY_BROKER_URL = 'redis://localhost:6379'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379'
+CELERY_BEAT_SCHEDULE = {
+    'refresh-shop-catalogs': {
+        'task': 'backend.tasks.refresh_shop_catalogs',
+        'schedule': crontab(minute='*/30'),
+    },
+}
 # CELERY_ACCEPT_CONTENT = ['application/json']
 # CELERY_RESULT_SERIALIZER = 'json'
 # CELERY_TASK_SERIALIZER = 'json'
+
+# Price lists fetched from Shop.url
+PRICE_LIST_FETCH_TIMEOUT = 30
+PRICE_LIST_FETCH_POOL_SIZE = 10
+PRICE_LIST_FETCH_RETRIES = 3
+CATALOG_REFRESH_MODE = 'sync'
+
+# Price lists posted as the request body are streamed to files here
+# for the Celery workers, a directory shared with them
+PRICE_LIST_UPLOAD_DIR = os.getenv(
+    'PRICE_LIST_UPLOAD_DIR', str(BASE_DIR / 'uploads')
+)
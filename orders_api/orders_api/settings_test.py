@@ -0,0 +1,20 @@
+'''
+Settings of the test suite: the caches are per process and uploaded
+price lists go to a temporary directory.
+'''
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+    },
+}
+
+PRICE_LIST_UPLOAD_DIR = tempfile.mkdtemp(prefix='price-lists-')
@@ -27,7 +27,12 @@ from backend.views import (
     PartnerOrderListView,
     PartnerStatus,
     PartnerUpdate,
+    PartnerUpdateJob,
+    ProductExportView,
+    ProductFacetsView,
     ProductInfoListView,
+    ProductOffersView,
+    ProductSuggestView,
     RegisterUser,
     ShopListRetrieveViewSet,
     # ShopListView
@@ -61,10 +66,15 @@ urlpatterns = [
     path('categories', CategoryListView.as_view(), name='categories'),
     # path('shops', ShopListView.as_view(), name='shops'),
     path('products', ProductInfoListView.as_view(), name='products'),
+    path('products/facets', ProductFacetsView.as_view(), name='product-facets'),
+    path('products/export', ProductExportView.as_view(), name='product-export'),
+    path('products/offers', ProductOffersView.as_view(), name='product-offers'),
+    path('products/suggest', ProductSuggestView.as_view(), name='product-suggest'),
     path('basket', BasketView.as_view(), name='basket'),
     path('order', OrderView.as_view(), name='order'),
 
     path('partner/update', PartnerUpdate.as_view(), name='partner-update'),
+    path('partner/update/<int:job_id>', PartnerUpdateJob.as_view(), name='partner-update-job'),
     path('partner/status', PartnerStatus.as_view(), name='partner-status'),
     path('partner/orders', PartnerOrderListView.as_view(), name='partner-orders'),
     
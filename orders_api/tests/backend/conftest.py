@@ -0,0 +1,15 @@
+import pytest
+from django.core.cache import caches
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    '''
+    Resets the caches between tests, throttling counts
+    requests in them and catalog responses are cached.
+    '''
+    for cache in caches.all():
+        cache.clear()
+    yield
+    for cache in caches.all():
+        cache.clear()
@@ -0,0 +1,67 @@
+import json
+
+from django.db import connection
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+def analyze(*models):
+    '''
+    Refreshes the planner statistics of the tables of the models
+    after seeding them.
+    '''
+    with connection.cursor() as cursor:
+        for model in models:
+            cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+
+class ExplainMixin:
+    '''
+    Test case mixin that checks the plan PostgreSQL chooses for a
+    queryset on the seeded data.
+    '''
+    INDEX_SCANS = ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan')
+
+    def explain(self, queryset):
+        '''
+        Plan of the queryset with sequential scans disabled: seeded
+        tables are small enough for a sequential scan to win, this
+        asks for the index the planner picks for larger ones.
+        '''
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+            try:
+                plan = queryset.explain(format='json')
+            finally:
+                cursor.execute('RESET enable_seqscan')
+        return json.loads(plan)[0]['Plan']
+
+    def assertIndexScan(self, queryset, index, model=None):
+        '''
+        Fails unless the plan scans index and, if model is given,
+        never reads the table of the model sequentially.
+        '''
+        nodes = list(plan_nodes(self.explain(queryset)))
+        plan = json.dumps(nodes[0], indent=2)
+        self.assertTrue(
+            any(
+                node['Node Type'] in self.INDEX_SCANS
+                and node.get('Index Name') == index
+                for node in nodes
+            ),
+            f'{index} is not used:\n{plan}'
+        )
+        if model is not None:
+            table = model._meta.db_table
+            self.assertFalse(
+                any(
+                    node['Node Type'] == 'Seq Scan'
+                    and node.get('Relation Name') == table
+                    for node in nodes
+                ),
+                f'{table} is scanned sequentially:\n{plan}'
+            )
@@ -0,0 +1,40 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from backend.cache import get_response_cache
+
+
+class QueryBudgetMixin:
+    '''
+    Test case mixin that checks the query count of a list endpoint
+    does not depend on the number of rows it returns.
+    '''
+    query_budget_sizes = (1, 10)
+
+    def assertQueryBudget(self, url, make_rows, budget=None, params=None):
+        '''
+        Requests url after make_rows(count) added rows up to each of
+        query_budget_sizes and fails when the query count differs
+        between the sizes or exceeds budget. Returns the query count.
+        Cached responses are dropped first, the budget is for a miss.
+        '''
+        counts = []
+        rows = 0
+        for size in self.query_budget_sizes:
+            make_rows(size - rows)
+            rows = size
+            get_response_cache().clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            counts.append(len(queries))
+        sql = '\n'.join(query['sql'] for query in queries.captured_queries)
+        self.assertEqual(
+            len(set(counts)), 1,
+            f'query count grows with rows {counts} '
+            f'for sizes {self.query_budget_sizes}:\n{sql}'
+        )
+        if budget is not None:
+            self.assertLessEqual(counts[-1], budget, sql)
+        return counts[-1]
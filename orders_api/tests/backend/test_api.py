@@ -1,26 +1,46 @@
+import csv
+import io
+import json
+import os
+import tempfile
 import time
+from base64 import urlsafe_b64encode
+from unittest import mock
+
 import pytest
+from django.conf import settings
+from django.db import connection
 from django.urls import reverse
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APIClient, APITestCase
 from rest_framework.authtoken.models import Token
 from model_bakery import baker
 import yaml
 
+from backend.cache import response_cache_stats
+from backend.importer import CatalogImporter
 from backend.models import (
+    CatalogEntry,
     Category,
     ConfirmEmailToken,
     Contact,
+    ImportJob,
     Order,
+    OrderItem,
     Product,
     ProductInfo,
+    ProductOffer,
     ProductParameter,
     Shop,
     User,
     Parameter
 )
 from backend.serializers import OrderSerializer, ShopSerializer
+from backend.suggest import trigram_available
+from backend.views import ProductExportView
+from backend.tasks import import_price_list_task
 
 
 @pytest.fixture
@@ -172,6 +192,118 @@ class TestShopListRetrieveViewSet(APITestCase):
         response = self.client.get(f'/shops/{shop_id}/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['id'], shop_id)
+        self.assertEqual(
+            set(response.data),
+            {'id', 'name', 'user', 'url', 'filename', 'status'}
+        )
+
+
+class TestCatalogResponseCache(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='shop',
+            email='shop@example.com',
+            password='testpass',
+            type='shop'
+        )
+        self.shop = baker.make(Shop, user=self.user, name='Связной')
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_repeated_requests_hit_cache(self):
+        url = reverse('categories')
+        stats = response_cache_stats()
+        self.assertEqual(self.get(url)['X-Cache'], 'MISS')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(url)
+
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response_cache_stats()['hits'], stats['hits'] + 1)
+        self.assertEqual(
+            response_cache_stats()['misses'], stats['misses'] + 1
+        )
+
+    def test_import_invalidates_cache(self):
+        url = reverse('categories')
+        self.assertEqual(self.get(url).data, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CatalogImporter(self.user).run({
+                'shop': 'Связной',
+                'categories': [{'id': 224, 'name': 'Смартфоны'}],
+                'goods': [],
+            })
+        response = self.get(url)
+
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(
+            [category['name'] for category in response.data], ['Смартфоны']
+        )
+
+    def test_shop_status_invalidates_cache(self):
+        url = f'/shops/{self.shop.id}/'
+        self.assertTrue(self.get(url).data['status'])
+        self.client.force_authenticate(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('partner-status'), data={'status': 'false'}
+            )
+        response = self.get(url)
+
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertFalse(response.data['status'])
+
+
+class TestCatalogETags(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='shop',
+            email='shop@example.com',
+            password='testpass',
+            type='shop'
+        )
+        self.shop = baker.make(Shop, user=self.user, name='Связной')
+        baker.make(ProductInfo, shop=self.shop, _quantity=3)
+
+    def test_unchanged_catalog_is_not_modified(self):
+        for url in (reverse('products'), reverse('categories'), '/shops/'):
+            etag = self.client.get(url)['ETag']
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(
+                response.status_code, status.HTTP_304_NOT_MODIFIED
+            )
+            self.assertEqual(response['ETag'], etag)
+            self.assertEqual(len(queries), 0)
+
+    def test_etag_depends_on_query(self):
+        url = reverse('products')
+        etag = self.client.get(url, {'ordering': 'price'})['ETag']
+        response = self.client.get(
+            url, {'ordering': '-price'}, HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_import_changes_etag(self):
+        url = reverse('products')
+        etag = self.client.get(url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CatalogImporter(self.user).run({
+                'shop': 'Связной', 'categories': [], 'goods': [],
+            })
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [])
 
 
 class TestProductInfoListView(APITestCase):
@@ -200,8 +332,10 @@ class TestProductInfoListView(APITestCase):
         response = self.client.get(self.url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['id'], self.product_info.id)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['id'], self.product_info.id)
+        for name in ('version', 'content_hash'):
+            self.assertNotIn(name, response.data['results'][0])
 
     def test_filter_by_shop_id(self):
         another_product_info = baker.make(ProductInfo)
@@ -210,8 +344,8 @@ class TestProductInfoListView(APITestCase):
         )
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['id'], self.product_info.id)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['id'], self.product_info.id)
 
     def test_filter_by_product_category_id(self):
         another_category = baker.make(Category)
@@ -222,8 +356,8 @@ class TestProductInfoListView(APITestCase):
         )
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['id'], self.product_info.id)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['id'], self.product_info.id)
 
     def test_order_by_price(self):
         another_product_info = baker.make(
@@ -232,32 +366,782 @@ class TestProductInfoListView(APITestCase):
         response = self.client.get(self.url, {'ordering': 'price'})
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
-        self.assertEqual(response.data[0]['id'], self.product_info.id)
-        self.assertEqual(response.data[1]['id'], another_product_info.id)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(response.data['results'][0]['id'], self.product_info.id)
+        self.assertEqual(response.data['results'][1]['id'], another_product_info.id)
 
     def test_order_by_quantity(self):
         another_product_info = baker.make(ProductInfo, quantity=10)
         response = self.client.get(self.url, {'ordering': 'quantity'})
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
-        self.assertEqual(response.data[0]['id'], another_product_info.id)
-        self.assertEqual(response.data[1]['id'], self.product_info.id)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(response.data['results'][0]['id'], another_product_info.id)
+        self.assertEqual(response.data['results'][1]['id'], self.product_info.id)
 
     def test_search_by_product_name(self):
         response = self.client.get(self.url, {'search': self.product.name})
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['id'], self.product_info.id)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['id'], self.product_info.id)
 
     def test_search_by_category_name(self):
         response = self.client.get(self.url, {'search': self.category.name})
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['id'], self.product_info.id)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['id'], self.product_info.id)
+
+    def test_inactive_catalog_version_hidden(self):
+        baker.make(
+            ProductInfo, product=self.product, shop=self.shop,
+            version=self.shop.catalog_version + 1
+        )
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['id'], self.product_info.id)
+
+
+class TestProductCatalogEntries(APITestCase):
+    def setUp(self):
+        self.url = reverse('products')
+        self.user = User.objects.create_user(
+            username='shop',
+            email='shop@example.com',
+            password='testpass',
+            type='shop'
+        )
+        CatalogImporter(self.user).run({
+            'shop': 'Связной',
+            'categories': [
+                {'id': 224, 'name': 'Смартфоны'},
+                {'id': 15, 'name': 'Аксессуары'},
+            ],
+            'goods': [
+                {
+                    'id': 1000 + i,
+                    'category': 224 if i % 2 else 15,
+                    'model': f'model/{i}',
+                    'name': f'Смартфон {i}' if i % 2 else f'Чехол {i}',
+                    'price': 1000 - i,
+                    'price_rrc': 2000,
+                    'quantity': i,
+                    'parameters': {'Цвет': 'черный' if i < 3 else 'белый'},
+                }
+                for i in range(6)
+            ],
+        })
+
+    def get(self, params):
+        response = self.client.get(self.url, dict(params, flat='true'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_list_catalog_entries(self):
+        product_info = ProductInfo.objects.get(external_id=1001)
+
+        data = self.get({'ordering': 'price', 'page_size': 2})
+
+        self.assertEqual(
+            [item['external_id'] for item in data['results']], [1005, 1004]
+        )
+        data = self.get({'product__category_id': 224, 'ordering': 'quantity'})
+        item = data['results'][0]
+        self.assertEqual(item['id'], product_info.id)
+        self.assertEqual(item['product_name'], 'Смартфон 1')
+        self.assertEqual(item['category_name'], 'Смартфоны')
+        self.assertEqual(item['shop_name'], 'Связной')
+        self.assertEqual(item['parameters'], {'Цвет': 'черный'})
+
+    def test_filter_catalog_entries(self):
+        data = self.get({
+            'shop_id': self.user.shop.id,
+            'search': 'смартфон',
+            'param[Цвет]': 'белый',
+        })
+
+        self.assertEqual(
+            {item['external_id'] for item in data['results']}, {1003, 1005}
+        )
+
+    def test_catalog_entries_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.get({'ordering': '-price'})
+
+        self.assertEqual(len(data['results']), 6)
+        self.assertEqual(len(queries), 1)
+
+    def test_shop_status_is_updated(self):
+        self.client.force_authenticate(self.user)
+        self.client.post(reverse('partner-status'), data={'status': 'false'})
+
+        self.assertFalse(
+            any(item['shop_status'] for item in self.get({})['results'])
+        )
+
+
+class TestSparseFieldsets(APITestCase):
+    def setUp(self):
+        self.url = reverse('products')
+        self.shop = baker.make(Shop)
+        self.product_info = baker.make(ProductInfo, shop=self.shop)
+        self.product_parameter = baker.make(
+            ProductParameter, product_info=self.product_info
+        )
+
+    def get(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, queries.captured_queries
+
+    def test_fields_trim_items_and_columns(self):
+        data, queries = self.get(self.url, {'fields': 'id,price'})
+
+        self.assertEqual(data['results'], [
+            {'id': self.product_info.id, 'price': self.product_info.price},
+        ])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('model', queries[0]['sql'])
+        self.assertNotIn('backend_product"', queries[0]['sql'])
+
+    def test_shallow_relations(self):
+        data, queries = self.get(self.url, {
+            'fields': 'id,product,product_parameters', 'expand': '',
+        })
+
+        self.assertEqual(data['results'], [{
+            'id': self.product_info.id,
+            'product': self.product_info.product_id,
+            'product_parameters': [self.product_parameter.id],
+        }])
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('backend_parameter"', queries[1]['sql'])
+
+    def test_expanded_relation(self):
+        data, queries = self.get(self.url, {'expand': 'product_parameters'})
+        item = data['results'][0]
+
+        self.assertEqual(item['product'], self.product_info.product_id)
+        self.assertEqual(item['product_parameters'], [{
+            'parameter': self.product_parameter.parameter.name,
+            'value': self.product_parameter.value,
+        }])
+        self.assertEqual(item['model'], self.product_info.model)
+
+    def test_fields_of_shops(self):
+        data, queries = self.get(
+            f'/shops/{self.shop.id}/', {'fields': 'id,name,unknown'}
+        )
+
+        self.assertEqual(data, {'id': self.shop.id, 'name': self.shop.name})
+        self.assertNotIn('catalog_version', queries[-1]['sql'])
+
+
+class TestProductExport(APITestCase):
+    def setUp(self):
+        self.url = reverse('product-export')
+        self.user = User.objects.create_user(
+            username='shop',
+            email='shop@example.com',
+            password='testpass',
+            type='shop'
+        )
+        CatalogImporter(self.user).run({
+            'shop': 'Связной',
+            'categories': [{'id': 224, 'name': 'Смартфоны'}],
+            'goods': [
+                {
+                    'id': 1000 + i,
+                    'category': 224,
+                    'model': f'model/{i}',
+                    'name': f'Смартфон {i}',
+                    'price': 1000 + i,
+                    'price_rrc': 2000,
+                    'quantity': i,
+                    'parameters': (
+                        {'Цвет': 'черный', 'Память': 64} if i % 2
+                        else {'Цвет': 'белый'}
+                    ),
+                }
+                for i in range(5)
+            ],
+        })
+
+    def content(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_ndjson(self):
+        response = self.client.get(self.url)
+        lines = self.content(response).splitlines()
+
+        self.assertEqual(
+            response['Content-Type'], 'application/x-ndjson; charset=utf-8'
+        )
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            json.loads(
+                self.client.get(reverse('products'), {'ordering': 'price'})
+                .content
+            )['results']
+        )
+
+    def test_export_csv(self):
+        response = self.client.get(self.url, {'format': 'csv'})
+        rows = list(csv.reader(io.StringIO(self.content(response))))
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(rows[0], [
+            'id', 'external_id', 'product', 'category', 'name', 'model',
+            'price', 'price_rrc', 'quantity', 'shop', 'Память', 'Цвет',
+        ])
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[2][1:], [
+            '1001', 'Смартфон 1', 'Смартфоны', '', 'model/1',
+            '1001', '2000', '1', str(self.user.shop.id), '64', 'черный',
+        ])
+
+    def test_export_filters(self):
+        response = self.client.get(self.url, {'param[Цвет]': 'белый'})
+        items = [
+            json.loads(line) for line in self.content(response).splitlines()
+        ]
+
+        self.assertEqual(
+            [item['external_id'] for item in items], [1000, 1002, 1004]
+        )
+
+    def test_export_csv_header_lists_all_parameters(self):
+        response = self.client.get(
+            self.url, {'format': 'csv', 'param[Цвет]': 'белый'}
+        )
+        rows = list(csv.reader(io.StringIO(self.content(response))))
+
+        # the header is built before the goods are read
+        self.assertEqual(rows[0][-2:], ['Память', 'Цвет'])
+        self.assertEqual([row[-2:] for row in rows[1:]], [['', 'белый']] * 3)
+
+    def test_export_reads_in_chunks(self):
+        with mock.patch.object(ProductExportView, 'chunk_size', 2):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.url)
+                lines = self.content(response).splitlines()
+
+        self.assertEqual(len(lines), 5)
+        # a fetch and a parameter query per chunk, cursor setup
+        parameter_queries = [
+            query for query in queries.captured_queries
+            if 'backend_productparameter' in query['sql']
+        ]
+        self.assertEqual(len(parameter_queries), 3)
+
+
+class TestProductOffers(APITestCase):
+    def setUp(self):
+        self.url = reverse('product-offers')
+        self.users = [
+            User.objects.create_user(
+                username=f'shop-{number}',
+                email=f'shop-{number}@example.com',
+                password='testpass',
+                type='shop'
+            )
+            for number in range(3)
+        ]
+        for number, user in enumerate(self.users):
+            self.import_price_list(user, number)
+        shop = self.users[2].shop
+        shop.status = False
+        shop.save()
+
+    def import_price_list(self, user, number, mode='replace'):
+        CatalogImporter(user, mode=mode).run({
+            'shop': f'Магазин {number}',
+            'categories': [{'id': 224, 'name': 'Смартфоны'}],
+            'goods': [
+                {
+                    'id': 1000 + i,
+                    'category': 224,
+                    'model': f'model/{i}',
+                    'name': f'Смартфон {i}',
+                    'price': 1000 * (i + 1) + 100 * number,
+                    'price_rrc': 20000,
+                    'quantity': 10 * number + i,
+                    'parameters': {},
+                }
+                for i in range(3 + number)
+            ],
+        })
+
+    def get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {offer['name']: offer for offer in response.data['results']}
+
+    def test_offers(self):
+        offers = self.get()
+
+        # shop 0 has Смартфон 0 out of stock
+        self.assertEqual(offers['Смартфон 0'], {
+            'product': Product.objects.get(name='Смартфон 0').id,
+            'name': 'Смартфон 0',
+            'category': 'Смартфоны',
+            'min_price': 1100,
+            'max_price': 1100,
+            'quantity': 10,
+            'shops': 1,
+        })
+        self.assertEqual(offers['Смартфон 1']['shops'], 2)
+        self.assertEqual(offers['Смартфон 3']['shops'], 1)
+        # only the shop with status off sells Смартфон 4
+        self.assertNotIn('Смартфон 4', offers)
+
+    def test_offers_ordered_by_min_price_pages(self):
+        response = self.client.get(
+            self.url, {'ordering': '-min_price', 'page_size': 3}
+        )
+        offers = response.data['results']
+        offers += self.client.get(response.data['next']).data['results']
+
+        self.assertEqual(
+            [offer['name'] for offer in offers],
+            ['Смартфон 3', 'Смартфон 2', 'Смартфон 1', 'Смартфон 0']
+        )
+
+    def test_offer_rollups(self):
+        with override_settings(PRODUCT_OFFER_ROLLUPS=True):
+            for number, user in enumerate(self.users):
+                self.import_price_list(user, number, mode='sync')
+            self.assertEqual(ProductOffer.objects.count(), 4)
+            self.client.force_authenticate(self.users[2])
+            self.client.post(
+                reverse('partner-status'), data={'status': 'true'}
+            )
+            offers = self.get()
+
+        self.assertEqual(ProductOffer.objects.count(), 5)
+        self.assertEqual(offers, self.get())
+        self.assertEqual(offers['Смартфон 0']['shops'], 2)
+        self.assertEqual(offers['Смартфон 0']['max_price'], 1200)
+
+    def test_offers_skip_retired_goods(self):
+        with override_settings(PRODUCT_OFFER_ROLLUPS=True):
+            order = Order.objects.create(user=self.users[1])
+            OrderItem.objects.create(
+                order=order,
+                product_info=ProductInfo.objects.active().get(
+                    shop__user=self.users[1], product__name='Смартфон 3'
+                ),
+                quantity=1
+            )
+            # sync retires the ordered good with zero quantity
+            CatalogImporter(self.users[1], mode='sync').run({
+                'shop': 'Магазин 1',
+                'categories': [{'id': 224, 'name': 'Смартфоны'}],
+                'goods': [],
+            })
+            offers = self.get()
+
+        self.assertEqual(offers, self.get())
+        self.assertNotIn('Смартфон 3', offers)
+        self.assertEqual(offers['Смартфон 1']['shops'], 1)
+
+
+class TestProductSuggest(APITestCase):
+    def setUp(self):
+        self.url = reverse('product-suggest')
+        self.user = User.objects.create_user(
+            username='shop',
+            email='shop@example.com',
+            password='testpass',
+            type='shop'
+        )
+        self.import_price_list([
+            'Смартфон Apple iPhone XR',
+            'Смартфон Apple iPhone 11',
+            'Смартфон Xiaomi Redmi',
+            'Чехол для iPhone',
+        ])
+        # not in any catalog
+        Product.objects.create(
+            name='Смартфон Nokia',
+            category=Category.objects.get(name='Смартфоны')
+        )
+
+    def import_price_list(self, names):
+        CatalogImporter(self.user).run({
+            'shop': 'Магазин',
+            'categories': [{'id': 224, 'name': 'Смартфоны'}],
+            'goods': [
+                {
+                    'id': number,
+                    'category': 224,
+                    'model': f'model/{number}',
+                    'name': name,
+                    'price': 1000,
+                    'price_rrc': 1200,
+                    'quantity': 1,
+                    'parameters': {},
+                }
+                for number, name in enumerate(names)
+            ],
+        })
+
+    def suggest(self, term, **params):
+        response = self.client.get(self.url, {'q': term, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['suggestions']
+
+    def test_suggest_prefix(self):
+        self.assertEqual(
+            self.suggest('смартфон a'),
+            ['Смартфон Apple iPhone 11', 'Смартфон Apple iPhone XR']
+        )
+        self.assertEqual(len(self.suggest('СМ')), 3)
+        self.assertEqual(
+            self.suggest('см', limit=1), ['Смартфон Apple iPhone 11']
+        )
+        self.assertEqual(self.suggest(' '), [])
+        self.assertEqual(self.suggest('nokia'), [])
+
+    def test_suggest_later_words(self):
+        self.assertEqual(
+            self.suggest('iphone'),
+            [
+                'Смартфон Apple iPhone 11',
+                'Смартфон Apple iPhone XR',
+                'Чехол для iPhone',
+            ]
+        )
+        # names that start with the term come first
+        self.assertEqual(
+            self.suggest('ч', limit=2), ['Чехол для iPhone']
+        )
+        self.assertEqual(self.suggest('apple iphone x'), [
+            'Смартфон Apple iPhone XR'
+        ])
+        # words are matched from their start only
+        self.assertEqual(self.suggest('phone'), [])
+        self.assertEqual(self.suggest('nokia'), [])
+
+    def test_suggest_modes_agree(self):
+        self.import_price_list([
+            'Смартфон Apple iPhone XR',
+            'Смартфон Apple iPhone 11',
+            'Смартфон Xiaomi Redmi',
+            'Чехол для iPhone',
+            'iPhone 12 mini',
+            'Кабель Lightning для iPhone',
+        ])
+        terms = [
+            'iph', 'смартфон a', 'чех', 'для i', 'i', 'x', '1', 'hone'
+        ]
+        for limit in (2, 10):
+            database = [self.suggest(term, limit=limit) for term in terms]
+            with override_settings(PRODUCT_SUGGEST_PREFIX_INDEX=True):
+                prefix = [self.suggest(term, limit=limit) for term in terms]
+
+            self.assertEqual(database, prefix)
+        self.assertEqual(database[0], [
+            'iPhone 12 mini',
+            'Кабель Lightning для iPhone',
+            'Смартфон Apple iPhone 11',
+            'Смартфон Apple iPhone XR',
+            'Чехол для iPhone',
+        ])
+
+    def test_suggest_only_goods_on_sale(self):
+        CatalogEntry.objects.filter(
+            product_name='Смартфон Xiaomi Redmi'
+        ).update(quantity=0)
+        CatalogEntry.objects.filter(
+            product_name='Чехол для iPhone'
+        ).update(shop_status=False)
+
+        self.assertEqual(self.suggest('смартфон x'), [])
+        self.assertEqual(self.suggest('чехол'), [])
+        with override_settings(PRODUCT_SUGGEST_PREFIX_INDEX=True):
+            self.assertEqual(self.suggest('xiaomi'), [])
+            self.assertEqual(self.suggest('чехол'), [])
+
+    def test_suggest_limit_is_validated(self):
+        for limit in ('x', '0'):
+            response = self.client.get(self.url, {'q': 'см', 'limit': limit})
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST
+            )
+
+    def test_suggest_prefix_index(self):
+        with override_settings(PRODUCT_SUGGEST_PREFIX_INDEX=True):
+            self.assertEqual(
+                self.suggest('iphone'),
+                [
+                    'Смартфон Apple iPhone 11',
+                    'Смартфон Apple iPhone XR',
+                    'Чехол для iPhone',
+                ]
+            )
+            self.assertEqual(self.suggest('nokia'), [])
+            # the import bumps the catalog generation
+            with self.captureOnCommitCallbacks(execute=True):
+                self.import_price_list(['Смартфон Nokia'])
+            self.assertEqual(self.suggest('nok'), ['Смартфон Nokia'])
+            self.assertEqual(self.suggest('iphone'), [])
+
+
+class TestProductSearch(APITestCase):
+    def setUp(self):
+        self.url = reverse('products')
+        shop = baker.make(Shop)
+        self.phones = Category.objects.create(name='Смартфоны')
+        self.accessories = Category.objects.create(name='Аксессуары')
+        self.phone = baker.make(
+            ProductInfo,
+            shop=shop,
+            product=Product.objects.create(
+                name='Смартфон Apple iPhone XR (красный)',
+                category=self.phones
+            )
+        )
+        self.case = baker.make(
+            ProductInfo,
+            shop=shop,
+            product=Product.objects.create(
+                name='Чехол для смартфона Apple',
+                category=self.accessories
+            )
+        )
+
+    def search(self, term, **params):
+        response = self.client.get(self.url, {'search': term, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']]
+
+    def test_search_uses_russian_stemming(self):
+        self.assertEqual(
+            set(self.search('смартфонов')), {self.phone.id, self.case.id}
+        )
+        self.assertEqual(self.search('красные'), [self.phone.id])
+
+    def test_search_matches_all_words_by_prefix(self):
+        self.assertEqual(self.search('iph красн'), [self.phone.id])
+        self.assertEqual(self.search('чехол iphone'), [])
+
+    def test_search_is_ranked(self):
+        self.assertEqual(
+            self.search('смартфон'), [self.phone.id, self.case.id]
+        )
+        self.assertEqual(
+            self.search('смартфон', ordering='-price', page_size=1)[:1],
+            [max(
+                [self.phone, self.case],
+                key=lambda product_info: (
+                    product_info.price, product_info.id
+                )
+            ).id]
+        )
+
+    def test_search_follows_category_rename(self):
+        self.phones.name = 'Телефоны'
+        self.phones.save()
+
+        self.assertEqual(self.search('телефон'), [self.phone.id])
+
+    def test_search_pages(self):
+        first = self.client.get(
+            self.url, {'search': 'apple', 'page_size': 1}
+        ).data
+        second = self.client.get(first['next']).data
+
+        self.assertEqual(
+            {first['results'][0]['id'], second['results'][0]['id']},
+            {self.phone.id, self.case.id}
+        )
+
+    def test_search_ignores_query_syntax(self):
+        self.assertEqual(
+            set(self.search("!:*&|'")), {self.phone.id, self.case.id}
+        )
+
+
+class TestProductParameterFilter(APITestCase):
+    def setUp(self):
+        shop = baker.make(Shop)
+        self.color = Parameter.objects.create(name='Цвет')
+        self.memory = Parameter.objects.create(name='Встроенная память (Гб)')
+        self.product_infos = {}
+        for key, color, memory in [
+            ('black-64', 'черный', '64'),
+            ('black-256', 'черный', '256'),
+            ('white-64', 'белый', '64'),
+            ('red', 'красный', None),
+        ]:
+            product_info = baker.make(ProductInfo, shop=shop)
+            ProductParameter.objects.create(
+                product_info=product_info, parameter=self.color, value=color
+            )
+            if memory:
+                ProductParameter.objects.create(
+                    product_info=product_info,
+                    parameter=self.memory,
+                    value=memory,
+                    numeric_value=int(memory)
+                )
+            self.product_infos[key] = product_info.id
+
+    def filter(self, params):
+        response = self.client.get(reverse('products'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {item['id'] for item in response.data['results']}
+
+    def ids(self, *keys):
+        return {self.product_infos[key] for key in keys}
+
+    def test_filter_by_parameter(self):
+        self.assertEqual(
+            self.filter({'param[Цвет]': 'черный'}),
+            self.ids('black-64', 'black-256')
+        )
+
+    def test_filter_by_many_values_and_parameters(self):
+        self.assertEqual(
+            self.filter({
+                'param[Цвет]': ['черный', 'белый'],
+                'param[Встроенная память (Гб)]': '64',
+            }),
+            self.ids('black-64', 'white-64')
+        )
+
+    def test_filter_by_numeric_range(self):
+        memory = 'Встроенная память (Гб)'
+        self.assertEqual(
+            self.filter({f'param_min[{memory}]': '100'}),
+            self.ids('black-256')
+        )
+        self.assertEqual(
+            self.filter({
+                f'param_min[{memory}]': '64',
+                f'param_max[{memory}]': '64,0',
+                'param[Цвет]': 'белый',
+            }),
+            self.ids('white-64')
+        )
+
+    def test_filter_by_invalid_number(self):
+        response = self.client.get(
+            reverse('products'), {'param_max[Цвет]': 'черный'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_by_unknown_parameter(self):
+        self.assertEqual(self.filter({'param[Вес]': '1'}), set())
+
+    def test_facets(self):
+        response = self.client.get(
+            reverse('product-facets'), {'param[Цвет]': 'черный'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['facets'], [
+            {
+                'parameter': 'Встроенная память (Гб)',
+                'values': [
+                    {'value': '256', 'count': 1},
+                    {'value': '64', 'count': 1},
+                ],
+            },
+            {
+                'parameter': 'Цвет',
+                'values': [{'value': 'черный', 'count': 2}],
+            },
+        ])
+
+    def test_facets_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('product-facets'))
+
+        self.assertEqual(len(response.data['facets']), 2)
+        self.assertEqual(len(queries), 1)
+
+
+class TestKeysetPagination(APITestCase):
+    def setUp(self):
+        self.url = reverse('products')
+        shop = baker.make(Shop)
+        self.product_infos = [
+            baker.make(ProductInfo, shop=shop, price=price, quantity=i)
+            for i, price in enumerate([300, 100, 200, 100, 300, 100, 200])
+        ]
+
+    def walk(self, url, link='next'):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(item['id'] for item in response.data['results'])
+            last = response.data
+            url = response.data[link]
+        return ids, last
+
+    def test_pages_follow_ordering_with_id_tiebreaker(self):
+        for ordering in ('price', '-price', 'quantity'):
+            field = ordering.lstrip('-')
+            expected = [
+                product_info.id
+                for product_info in sorted(
+                    self.product_infos,
+                    key=lambda product_info: (
+                        getattr(product_info, field), product_info.id
+                    ),
+                    reverse=ordering.startswith('-')
+                )
+            ]
+            ids, _ = self.walk(
+                f'{self.url}?ordering={ordering}&page_size=2'
+            )
+
+            self.assertEqual(ids, expected)
+
+    def test_previous_pages(self):
+        forward, last = self.walk(f'{self.url}?ordering=price&page_size=3')
+        ids, first = self.walk(last['previous'], link='previous')
+
+        self.assertIsNone(first['previous'])
+        self.assertEqual(ids, forward[3:6] + forward[:3])
+        self.assertIsNotNone(self.client.get(last['previous']).data['next'])
+
+    def test_cursor_pages_do_not_use_offset(self):
+        response = self.client.get(self.url, {'page_size': 2})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(response.data['next'])
+
+        self.assertFalse(
+            any('OFFSET' in query['sql'] for query in queries)
+        )
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'garbage'})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_values_of_wrong_type(self):
+        for values in (['abc', 1], [100, 'abc'], [[1], {}]):
+            cursor = urlsafe_b64encode(
+                json.dumps([values, False]).encode()
+            ).decode()
+            response = self.client.get(
+                self.url, {'ordering': 'price', 'cursor': cursor}
+            )
+
+            self.assertEqual(
+                response.status_code, status.HTTP_404_NOT_FOUND
+            )
 
 
 class TestBasketView(APITestCase):
@@ -281,8 +1165,16 @@ class TestBasketView(APITestCase):
         response = self.client.get(self.url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0], self.serializer.data)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0], self.serializer.data)
+
+    def test_get_basket_sparse_fields(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url, {'fields': 'id,items'})
+
+        self.assertEqual(response.data['results'], [{
+            'id': self.order.id, 'items': self.serializer.data['items']
+        }])
 
     def test_add_to_basket(self):
         self.client.force_authenticate(user=self.user)
@@ -382,6 +1274,11 @@ class TestContactView(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 3)
 
+    def test_get_contacts_sparse_fields(self):
+        contact = baker.make(Contact, user=self.user)
+        response = self.client.get(self.url, {'fields': 'id'})
+        self.assertEqual(response.data, [{'id': contact.id}])
+
     def test_create_contact_phone(self):
         data = {
             'type': 'phone',
@@ -428,8 +1325,38 @@ class TestOrderView(APITestCase):
     def test_get_orders(self):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['id'], self.order.id)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['id'], self.order.id)
+
+    def test_get_orders_sparse_fields(self):
+        response = self.client.get(self.url, {'fields': 'id,status'})
+
+        self.assertEqual(
+            response.data['results'],
+            [{'id': self.order.id, 'status': self.order.status}]
+        )
+
+    def test_get_orders_total_sum(self):
+        for quantity, price in ((2, 1500), (3, 999)):
+            baker.make(
+                OrderItem,
+                order=self.order,
+                quantity=quantity,
+                product_info__price=price
+            )
+        other = baker.make(Order, user=self.user)
+        response = self.client.get(self.url)
+
+        totals = {
+            order['id']: order['total_sum']
+            for order in response.data['results']
+        }
+        self.assertEqual(totals, {self.order.id: 5997, other.id: 0})
+        self.assertIsInstance(totals[self.order.id], int)
+        self.assertEqual(OrderSerializer(other).data['total_sum'], 0)
+        self.assertEqual(
+            OrderSerializer(self.order).data['total_sum'], 5997
+        )
 
     def test_update_order(self):
         data = {'id': self.order.id}
@@ -501,14 +1428,44 @@ class PartnerUpdateTest(APITestCase):
         )
         self.client.force_authenticate(user=self.user)
         self.url = reverse('partner-update')
+        self.file = str(settings.BASE_DIR.parent / 'data' / 'shop_1.yaml')
+
+    def post_import(self, data, url=None, **kwargs):
+        with mock.patch.object(
+            import_price_list_task, 'delay', new=import_price_list_task
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    url or self.url, data=data, **kwargs
+                )
+        return response
 
     def test_partner_update_success_file(self):
-        data = {
-            'file': '/home/jerry/netology_hw/netology_dplm/data/shop_1.yaml'
-        }
-        response = self.client.post(self.url, data=data)
+        data = {'file': self.file}
+        response = self.post_import(data)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], True)
+
+        response = self.client.get(response.data['url'])
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, {'status': True})
+        self.assertEqual(response.data['status'], 'done')
+        self.assertEqual(response.data['rows_processed'], 4)
+        self.assertEqual(response.data['report']['goods'], 4)
+        self.assertEqual(
+            ProductInfo.objects.filter(shop__user=self.user).count(), 4
+        )
+
+    def test_partner_update_returns_before_import(self):
+        with mock.patch.object(import_price_list_task, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    self.url, data={'file': self.file}
+                )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        delay.assert_called_once_with(response.data['job'])
+        job = ImportJob.objects.get(id=response.data['job'])
+        self.assertEqual(job.status, 'queued')
+        self.assertFalse(ProductInfo.objects.exists())
 
     def test_partner_update_bad_request(self):
         data = {
@@ -516,3 +1473,201 @@ class PartnerUpdateTest(APITestCase):
         }
         response = self.client.post(self.url, data=data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_partner_update_sync_mode(self):
+        data = {'file': self.file}
+        self.post_import(data)
+        response = self.post_import({**data, 'mode': 'sync', 'force': True})
+        job = ImportJob.objects.get(id=response.data['job'])
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.report['inserted'], 0)
+        self.assertEqual(job.report['updated'], 0)
+        self.assertEqual(job.report['deleted'], 0)
+
+    def test_partner_update_not_modified(self):
+        self.post_import({'file': self.file})
+        response = self.post_import({'file': self.file})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'status': True, 'modified': False})
+        self.assertEqual(ImportJob.objects.count(), 1)
+
+    def test_partner_update_changed_content(self):
+        self.post_import({'file': self.file})
+        with open(self.file) as f:
+            content = f.read()
+        with tempfile.NamedTemporaryFile('w', suffix='.yaml') as f:
+            f.write(content.replace('price: 110000', 'price: 100000'))
+            f.flush()
+            response = self.post_import({'file': f.name})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(
+            Shop.objects.get(user=self.user).content_hash,
+            ImportJob.objects.get(id=response.data['job']).content_hash
+        )
+
+    def test_partner_update_file_encodings(self):
+        with open(self.file, encoding='utf-8') as f:
+            content = f.read()
+        with tempfile.NamedTemporaryFile(suffix='.yaml') as f:
+            f.write(content.encode('utf-16'))
+            f.flush()
+            response = self.post_import({'file': f.name})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = ImportJob.objects.get(id=response.data['job'])
+        self.assertEqual(job.status, 'done', job.errors)
+
+        # a byte order mark does not change the hash of the body
+        response = self.post_import(
+            content.encode('utf-8-sig'), content_type='application/x-yaml'
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        response = self.post_import(
+            content.encode(), content_type='application/x-yaml'
+        )
+        self.assertEqual(response.data, {'status': True, 'modified': False})
+
+    def test_partner_update_force(self):
+        self.post_import({'file': self.file})
+        response = self.post_import({'file': self.file, 'force': True})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+    def test_partner_update_unknown_mode(self):
+        data = {'file': self.file, 'mode': 'merge'}
+        response = self.client.post(self.url, data=data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_partner_update_invalid_force(self):
+        data = {'file': self.file, 'force': 'maybe'}
+        response = self.client.post(self.url, data=data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'error': 'invalid force: maybe'})
+
+        with open(self.file, 'rb') as f:
+            response = self.client.post(
+                f'{self.url}?force=maybe', data=f.read(),
+                content_type='application/x-yaml'
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(os.listdir(settings.PRICE_LIST_UPLOAD_DIR), [])
+
+    def test_partner_update_failed_job(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.yaml') as f:
+            f.write('shop: [')
+            f.flush()
+            response = self.post_import({'file': f.name})
+        response = self.client.get(response.data['url'])
+        self.assertEqual(response.data['status'], 'failed')
+        self.assertTrue(response.data['errors'])
+
+    def test_partner_update_json_body(self):
+        with open(self.file) as f:
+            document = yaml.safe_load(f)
+        response = self.post_import(
+            json.dumps(document), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = ImportJob.objects.get(id=response.data['job'])
+        self.assertEqual(job.format, 'json')
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.rows_processed, 4)
+        # the body was stored for the worker and deleted after the import
+        self.assertEqual(
+            os.path.dirname(job.upload), settings.PRICE_LIST_UPLOAD_DIR
+        )
+        self.assertFalse(os.path.exists(job.upload))
+
+    def test_partner_update_body_waits_for_worker(self):
+        with open(self.file, 'rb') as f:
+            body = f.read()
+        with mock.patch.object(import_price_list_task, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    self.url, data=body, content_type='application/x-yaml'
+                )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = ImportJob.objects.get(id=delay.call_args.args[0])
+        with open(job.upload, 'rb') as f:
+            self.assertEqual(f.read(), body)
+
+        self.assertEqual(import_price_list_task(job.id), 'done')
+        self.assertFalse(os.path.exists(job.upload))
+
+    def test_partner_update_not_modified_body(self):
+        with open(self.file, 'rb') as f:
+            body = f.read()
+        self.post_import(body, content_type='application/x-yaml')
+        response = self.post_import(body, content_type='application/x-yaml')
+        self.assertEqual(response.data, {'status': True, 'modified': False})
+        self.assertEqual(os.listdir(settings.PRICE_LIST_UPLOAD_DIR), [])
+
+    def test_partner_update_empty_body(self):
+        response = self.client.post(
+            self.url, data=' \n', content_type='text/csv'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'error': 'price list is empty'})
+
+    def test_partner_update_csv_body(self):
+        self.post_import({'file': self.file})
+        body = (
+            'id,category,category_name,model,name,price,price_rrc,quantity,'
+            'Цвет\n'
+            '4216292,224,,apple/iphone/xs-max,Смартфон,1000,1100,1,золотой\n'
+            '1,999,Планшеты,apple/ipad,Планшет,500,600,2,\n'
+        )
+        response = self.post_import(
+            body, url=f'{self.url}?mode=sync', content_type='text/csv'
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = ImportJob.objects.get(id=response.data['job'])
+        self.assertEqual((job.format, job.mode), ('csv', 'sync'))
+        self.assertEqual(job.status, 'done', job.errors)
+        self.assertEqual(job.report['inserted'], 1)
+        self.assertEqual(job.report['updated'], 1)
+        self.assertEqual(job.report['deleted'], 3)
+        self.assertTrue(
+            Category.objects.filter(
+                id=999, name='Планшеты', shops__user=self.user
+            ).exists()
+        )
+
+    def test_partner_update_csv_unknown_category(self):
+        body = (
+            'id,category,model,name,price,price_rrc,quantity\n'
+            '1,999,apple/ipad,Планшет,500,600,2\n'
+        )
+        self.post_import({'file': self.file})
+        response = self.post_import(body, content_type='text/csv')
+        job = ImportJob.objects.get(id=response.data['job'])
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('999', job.errors[0])
+
+    def test_partner_update_failed_job_keeps_progress(self):
+        self.post_import({'file': self.file})
+        body = (
+            'id,category,model,name,price,price_rrc,quantity\n'
+            '1,224,apple/iphone,Смартфон,1000,1100,1\n'
+            '2,224,apple/iphone,Смартфон,1000,1100,1\n'
+            '3,999,apple/ipad,Планшет,500,600,2\n'
+        )
+        with mock.patch.object(CatalogImporter, 'batch_size', 2):
+            response = self.post_import(body, content_type='text/csv')
+        job = ImportJob.objects.get(id=response.data['job'])
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual((job.phase, job.rows_processed), ('goods', 2))
+
+    def test_partner_update_job_sparse_fields(self):
+        response = self.post_import({'file': self.file})
+        response = self.client.get(
+            response.data['url'], {'fields': 'status,rows_processed'}
+        )
+        self.assertEqual(
+            response.data, {'status': 'done', 'rows_processed': 4}
+        )
+
+    def test_partner_update_job_of_another_user(self):
+        job = baker.make(ImportJob)
+        response = self.client.get(
+            reverse('partner-update-job', kwargs={'job_id': job.id})
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,103 @@
+import io
+import tempfile
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TransactionTestCase
+
+from backend.management.commands.benchmark_import import (
+    compare_results,
+    run_benchmark,
+)
+from backend.management.commands.benchmark_serializers import (
+    run_benchmark as run_serializer_benchmark,
+)
+from backend.management.commands.benchmark_suggest import (
+    run_benchmark as run_suggest_benchmark,
+)
+from backend.models import ProductInfo
+from backend.pricelist import read_price_list
+
+
+class GeneratePriceListTest(SimpleTestCase):
+    def test_generate_price_list(self):
+        for format in ('yaml', 'csv'):
+            with tempfile.TemporaryDirectory() as tmp:
+                call_command(
+                    'generate_price_list',
+                    '--shops=2', '--goods=5', '--categories=3',
+                    '--parameters=3', f'--format={format}',
+                    f'--output={tmp}', stdout=io.StringIO()
+                )
+                with open(f'{tmp}/shop_2.{format}', 'rb') as f:
+                    data = read_price_list(f, format)
+                    goods = list(data['goods'])
+
+            self.assertEqual(len(goods), 5)
+            self.assertEqual(len(goods[0].parameters), 3)
+            self.assertTrue(all(1 <= item.category <= 3 for item in goods))
+
+    def test_generate_price_list_is_reproducible(self):
+        outputs = []
+        for _ in range(2):
+            stdout = io.StringIO()
+            call_command(
+                'generate_price_list', '--goods=5', '--seed=7', stdout=stdout
+            )
+            outputs.append(stdout.getvalue())
+
+        self.assertEqual(outputs[0], outputs[1])
+
+
+class BenchmarkImportTest(TransactionTestCase):
+    def test_run_benchmark(self):
+        results = run_benchmark(shops=2, goods=20, rounds=2, mode='sync')
+
+        self.assertEqual([result['goods'] for result in results], [40, 40])
+        self.assertTrue(all(result['queries'] for result in results))
+        self.assertEqual(ProductInfo.objects.active().count(), 40)
+
+    def test_run_benchmark_csv_body(self):
+        results = run_benchmark(goods=20, format='csv', source='body')
+
+        self.assertEqual(results[0]['goods'], 20)
+
+    def test_compare_results(self):
+        baseline = [{'round': 1, 'wall': 2.0, 'queries': 50, 'peak_rss': 0}]
+        result = {'round': 1, 'wall': 2.2, 'queries': 50, 'peak_rss': 0.5}
+
+        self.assertEqual(compare_results([result], baseline, 0.25), [])
+        self.assertEqual(
+            len(compare_results(
+                [dict(result, wall=3.0, queries=51)], baseline, 0.25
+            )),
+            2
+        )
+
+
+class BenchmarkSerializersTest(TransactionTestCase):
+    def test_run_benchmark(self):
+        results = run_serializer_benchmark(
+            goods=20, orders=5, page_size=10, repeat=1
+        )
+
+        self.assertEqual(
+            [(result['endpoint'], result['path']) for result in results],
+            [
+                ('products', 'serializer'),
+                ('products', 'fast'),
+                ('orders', 'serializer'),
+                ('orders', 'fast'),
+            ]
+        )
+        self.assertEqual(results[2]['rows'], 5)
+
+
+class BenchmarkSuggestTest(TransactionTestCase):
+    def test_run_benchmark(self):
+        results = run_suggest_benchmark(goods=30, requests=20, limit=5)
+
+        self.assertEqual(
+            [result['backend'] for result in results], ['database', 'prefix']
+        )
+        self.assertTrue(all(result['suggestions'] for result in results))
+        self.assertTrue(all(result['p99_ms'] >= 0 for result in results))
@@ -0,0 +1,84 @@
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from backend.importer import CatalogImporter
+from backend.models import Order, OrderItem, ProductInfo, User
+from backend.serializers import ProductInfoSerializer
+from backend.management.commands.generate_price_list import (
+    generate_price_list,
+)
+
+
+class FastPathTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='shop',
+            email='shop@example.com',
+            password='testpass',
+            type='shop'
+        )
+        CatalogImporter(self.user).run(
+            generate_price_list(categories=3, goods=30, parameters=3)
+        )
+        product_infos = list(ProductInfo.objects.active().order_by('id'))
+        for number in range(5):
+            order = Order.objects.create(user=self.user, status='new')
+            for index, product_info in enumerate(
+                product_infos[number:number + 3]
+            ):
+                OrderItem.objects.create(
+                    order=order, product_info=product_info, quantity=index + 1
+                )
+        Order.objects.create(user=self.user)
+        self.client.force_authenticate(self.user)
+
+    def pages(self, url, params):
+        '''
+        Contents of all pages of url, following the next links.
+        '''
+        contents = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            contents.append(response.content)
+            if not response.data['next']:
+                return contents
+            response = self.client.get(response.data['next'])
+
+    def assertSameContent(self, url, params=None):
+        with override_settings(FAST_SERIALIZERS=False):
+            expected = self.pages(url, params)
+        with override_settings(FAST_SERIALIZERS=True):
+            contents = self.pages(url, params)
+
+        self.assertEqual(contents, expected)
+
+    def test_products(self):
+        url = reverse('products')
+        self.assertSameContent(url, {'page_size': 7})
+        self.assertSameContent(url, {'ordering': '-price', 'page_size': 7})
+        self.assertSameContent(url, {'search': 'товар', 'page_size': 7})
+        self.assertSameContent(url, {'param[Параметр 2]': 'черный'})
+
+    def test_products_skip_serializer(self):
+        with override_settings(FAST_SERIALIZERS=True), mock.patch.object(
+            ProductInfoSerializer, 'to_representation'
+        ) as to_representation:
+            response = self.client.get(reverse('products'))
+
+        self.assertEqual(len(response.data['results']), 30)
+        to_representation.assert_not_called()
+
+    def test_partner_orders(self):
+        self.assertSameContent(reverse('partner-orders'), {'page_size': 2})
+
+    def test_sparse_fieldsets_use_serializer(self):
+        with override_settings(FAST_SERIALIZERS=True):
+            response = self.client.get(
+                reverse('products'), {'fields': 'id,price'}
+            )
+
+        self.assertEqual(set(response.data['results'][0]), {'id', 'price'})
@@ -0,0 +1,369 @@
+from django.test import TestCase
+
+from backend.importer import (
+    CatalogImporter,
+    collect_catalog_versions,
+    fingerprint_item,
+    parse_number,
+)
+from backend.pricelist import Item
+from backend.models import (
+    CatalogEntry,
+    Category,
+    Order,
+    OrderItem,
+    Parameter,
+    Product,
+    ProductInfo,
+    ProductParameter,
+    Shop,
+    User,
+)
+
+
+def make_price_list(goods_count, shop='Связной'):
+    return {
+        'shop': shop,
+        'categories': [
+            {'id': 224, 'name': 'Смартфоны'},
+            {'id': 15, 'name': 'Аксессуары'},
+        ],
+        'goods': [
+            {
+                'id': 1000 + i,
+                'category': 224 if i % 2 else 15,
+                'model': f'model/{i}',
+                'name': f'Товар {i % 10}',
+                'price': 100 + i,
+                'price_rrc': 200 + i,
+                'quantity': i,
+                'parameters': {
+                    'Цвет': 'черный',
+                    'Встроенная память (Гб)': 64 * (i % 4 + 1),
+                },
+            }
+            for i in range(goods_count)
+        ],
+    }
+
+
+class CatalogImporterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='shop',
+            email='shop@example.com',
+            password='testpass',
+            type='shop'
+        )
+
+    def test_import_creates_catalog(self):
+        report = CatalogImporter(self.user).run(make_price_list(20))
+
+        self.assertEqual(report['goods'], 20)
+        self.assertEqual(report['product_parameters'], 40)
+        self.assertEqual(Category.objects.count(), 2)
+        self.assertEqual(Product.objects.count(), 10)
+        self.assertEqual(Parameter.objects.count(), 2)
+        self.assertEqual(ProductInfo.objects.count(), 20)
+        self.assertEqual(ProductParameter.objects.count(), 40)
+        product_info = ProductInfo.objects.get(external_id=1003)
+        self.assertEqual(product_info.product.name, 'Товар 3')
+        self.assertEqual(product_info.product.category_id, 224)
+        self.assertEqual(
+            product_info.product_parameters.get(
+                parameter__name='Встроенная память (Гб)'
+            ).value,
+            '256'
+        )
+
+    def test_import_stores_numeric_parameter_values(self):
+        data = make_price_list(1)
+        data['goods'][0]['parameters']['Диагональ (дюйм)'] = 6.5
+
+        CatalogImporter(self.user).run(data)
+
+        self.assertEqual(
+            dict(ProductParameter.objects.values_list(
+                'parameter__name', 'numeric_value'
+            )),
+            {
+                'Цвет': None,
+                'Встроенная память (Гб)': 64,
+                'Диагональ (дюйм)': 6.5,
+            }
+        )
+
+    def test_parse_number(self):
+        for value, number in [
+            ('512', 512), ('6.5', 6.5), (' -6,5 ', -6.5),
+            ('2688x1242', None), ('', None), ('1e3', None), ('9' * 400, None),
+        ]:
+            self.assertEqual(parse_number(value), number, value)
+
+    def test_reimport_replaces_shop_catalog(self):
+        CatalogImporter(self.user).run(make_price_list(20))
+        report = CatalogImporter(self.user).run(make_price_list(5))
+
+        self.assertEqual(report['version'], 2)
+        self.assertEqual(report['deleted'], 20)
+        self.assertEqual(ProductInfo.objects.active().count(), 5)
+        self.assertEqual(Product.objects.count(), 10)
+        self.assertEqual(Parameter.objects.count(), 2)
+
+    def test_import_writes_new_catalog_version(self):
+        CatalogImporter(self.user).run(make_price_list(20))
+        shop = Shop.objects.get(user=self.user)
+        seen = []
+
+        def progress(phase, rows):
+            shop.refresh_from_db()
+            seen.append((
+                phase,
+                shop.catalog_version,
+                ProductInfo.objects.active().count()
+            ))
+
+        CatalogImporter(self.user, batch_size=2, progress=progress).run(
+            make_price_list(5)
+        )
+
+        for phase, version, count in seen:
+            self.assertEqual((version, count), (1, 20))
+        shop.refresh_from_db()
+        self.assertEqual(shop.catalog_version, 2)
+        self.assertEqual(ProductInfo.objects.active().count(), 5)
+
+    def test_collect_catalog_versions(self):
+        CatalogImporter(self.user).run(make_price_list(20))
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(
+            order=order,
+            product_info=ProductInfo.objects.get(external_id=1000),
+            quantity=1
+        )
+        CatalogImporter(self.user).run(make_price_list(5))
+
+        deleted = collect_catalog_versions(
+            Shop.objects.get(user=self.user).id, chunk_size=7
+        )
+
+        self.assertEqual(deleted, 19)
+        self.assertEqual(ProductInfo.objects.count(), 6)
+        self.assertEqual(ProductInfo.objects.active().count(), 5)
+        self.assertTrue(OrderItem.objects.filter(order=order).exists())
+
+    def test_duplicate_goods_are_upserted(self):
+        data = make_price_list(3)
+        duplicate = dict(data['goods'][0], price=1)
+        data['goods'].append(duplicate)
+
+        CatalogImporter(self.user, batch_size=2).run(data)
+
+        self.assertEqual(ProductInfo.objects.active().count(), 3)
+        self.assertEqual(ProductInfo.objects.get(external_id=1000).price, 1)
+        self.assertEqual(ProductParameter.objects.count(), 6)
+
+    def test_existing_catalog_keys_are_reused(self):
+        category = Category.objects.create(id=224, name='Смартфоны')
+        product = Product.objects.create(name='Товар 1', category=category)
+        parameter = Parameter.objects.create(name='Цвет')
+
+        CatalogImporter(self.user).run(make_price_list(2))
+
+        self.assertEqual(
+            ProductInfo.objects.get(external_id=1001).product, product
+        )
+        self.assertEqual(Parameter.objects.count(), 2)
+        self.assertTrue(
+            parameter.product_parameters.filter(
+                product_info__external_id=1001
+            ).exists()
+        )
+
+    def test_import_without_shop_uses_user_shop(self):
+        CatalogImporter(self.user).run(make_price_list(2))
+        data = {
+            'shop': None,
+            'categories': [],
+            'goods': [
+                Item(1, 224, 'm', 'Товар 1', 10, 20, 1, (('Цвет', 'red'),)),
+                Item(2, 7, 'm', 'Планшет', 10, 20, 1, (), 'Планшеты'),
+            ],
+        }
+
+        report = CatalogImporter(self.user, mode='sync').run(data)
+
+        self.assertEqual(report['shop'], Shop.objects.get(user=self.user).id)
+        self.assertEqual(report['inserted'], 2)
+        self.assertEqual(
+            Category.objects.get(id=7).shops.get().user, self.user
+        )
+
+    def test_import_without_shop_requires_user_shop(self):
+        data = {'shop': None, 'categories': [], 'goods': []}
+
+        with self.assertRaises(ValueError):
+            CatalogImporter(self.user).run(data)
+
+    def test_fingerprint_ignores_parameter_types(self):
+        item = make_price_list(1)['goods'][0]
+
+        self.assertEqual(
+            fingerprint_item(item),
+            fingerprint_item(dict(item, parameters={
+                name: str(value)
+                for name, value in reversed(item['parameters'].items())
+            }))
+        )
+
+    def test_import_rebuilds_catalog_entries(self):
+        CatalogImporter(self.user).run(make_price_list(20))
+        data = make_price_list(5)
+        data['categories'][0]['name'] = 'Телефоны'
+        CatalogImporter(self.user).run(data)
+
+        self.assertEqual(
+            set(CatalogEntry.objects.values_list('product_info', flat=True)),
+            set(ProductInfo.objects.active().values_list('id', flat=True))
+        )
+        entry = CatalogEntry.objects.get(external_id=1003)
+        self.assertEqual(entry.product_name, 'Товар 3')
+        self.assertEqual(entry.category_name, 'Телефоны')
+        self.assertEqual(entry.shop_name, 'Связной')
+        self.assertEqual(entry.price, 103)
+        self.assertEqual(entry.parameters, {
+            'Цвет': 'черный',
+            'Встроенная память (Гб)': '256',
+        })
+
+    def test_query_count_does_not_grow_with_goods(self):
+        small = CatalogImporter(self.user, batch_size=100).run(
+            make_price_list(10)
+        )
+        large = CatalogImporter(self.user, batch_size=100).run(
+            make_price_list(100)
+        )
+
+        self.assertEqual(large['goods'], 100)
+        self.assertLessEqual(large['queries'], small['queries'])
+
+
+class CatalogSyncTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='shop',
+            email='shop@example.com',
+            password='testpass',
+            type='shop'
+        )
+        CatalogImporter(self.user).run(make_price_list(10))
+        self.product_info_ids = dict(
+            ProductInfo.objects.values_list('external_id', 'id')
+        )
+
+    def test_sync_writes_only_changes(self):
+        data = make_price_list(12)
+        data['goods'] = data['goods'][2:]
+        data['goods'][0]['price'] = 1
+        data['goods'][1]['parameters']['Цвет'] = 'белый'
+
+        report = CatalogImporter(self.user, mode='sync').run(data)
+
+        self.assertEqual(report['inserted'], 2)
+        self.assertEqual(report['updated'], 2)
+        self.assertEqual(report['deleted'], 2)
+        self.assertEqual(ProductInfo.objects.count(), 10)
+        self.assertEqual(ProductInfo.objects.get(external_id=1002).price, 1)
+        self.assertEqual(
+            ProductParameter.objects.get(
+                product_info__external_id=1003, parameter__name='Цвет'
+            ).value,
+            'белый'
+        )
+        for external_id in range(1002, 1010):
+            self.assertEqual(
+                ProductInfo.objects.get(external_id=external_id).id,
+                self.product_info_ids[external_id]
+            )
+
+    def test_sync_unchanged_price_list(self):
+        report = CatalogImporter(self.user, mode='sync').run(
+            make_price_list(10)
+        )
+
+        self.assertEqual(report['inserted'], 0)
+        self.assertEqual(report['updated'], 0)
+        self.assertEqual(report['deleted'], 0)
+
+    def test_sync_skips_goods_with_unchanged_fingerprint(self):
+        data = make_price_list(10)
+        data['goods'][0]['price'] = 1
+        changed = CatalogImporter(self.user, mode='sync').run(data)
+        unchanged = CatalogImporter(self.user, mode='sync').run(data)
+
+        self.assertEqual(changed['updated'], 1)
+        self.assertEqual(unchanged['updated'], 0)
+        self.assertLess(unchanged['queries'], changed['queries'])
+        self.assertEqual(
+            ProductInfo.objects.get(external_id=1000).content_hash,
+            fingerprint_item(data['goods'][0])
+        )
+
+    def test_sync_retires_ordered_goods(self):
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(
+            order=order,
+            product_info_id=self.product_info_ids[1000],
+            quantity=1
+        )
+        data = make_price_list(10)
+        data['goods'] = data['goods'][1:]
+
+        report = CatalogImporter(self.user, mode='sync').run(data)
+
+        self.assertEqual(report['retired'], 1)
+        self.assertEqual(ProductInfo.objects.get(external_id=1000).quantity, 0)
+        self.assertTrue(OrderItem.objects.filter(order=order).exists())
+
+    def test_sync_restores_retired_goods(self):
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(
+            order=order,
+            product_info_id=self.product_info_ids[1001],
+            quantity=1
+        )
+        data = make_price_list(10)
+        CatalogImporter(self.user, mode='sync').run(
+            dict(data, goods=[data['goods'][0], *data['goods'][2:]])
+        )
+
+        report = CatalogImporter(self.user, mode='sync').run(data)
+
+        self.assertEqual(report['updated'], 1)
+        product_info = ProductInfo.objects.get(external_id=1001)
+        self.assertEqual(product_info.id, self.product_info_ids[1001])
+        self.assertEqual(product_info.quantity, 1)
+        self.assertEqual(
+            CatalogEntry.objects.get(external_id=1001).quantity, 1
+        )
+
+    def test_sync_refreshes_catalog_entries(self):
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(
+            order=order,
+            product_info_id=self.product_info_ids[1000],
+            quantity=1
+        )
+        data = make_price_list(12)
+        data['goods'] = data['goods'][1:]
+        data['goods'][0]['parameters']['Цвет'] = 'белый'
+
+        CatalogImporter(self.user, mode='sync').run(data)
+
+        entries = {
+            entry.external_id: entry for entry in CatalogEntry.objects.all()
+        }
+        self.assertEqual(set(entries), set(range(1000, 1012)))
+        self.assertEqual(entries[1000].quantity, 0)
+        self.assertEqual(entries[1001].parameters['Цвет'], 'белый')
+        self.assertEqual(entries[1011].product_name, 'Товар 1')
@@ -0,0 +1,164 @@
+from django.test import TestCase
+
+from backend.models import (
+    CatalogEntry,
+    Category,
+    Order,
+    OrderItem,
+    Product,
+    ProductInfo,
+    Shop,
+    User,
+)
+
+from backend.readmodel import rebuild_shop_catalog_entries
+from backend.suggest import suggest_queryset, trigram_available
+
+from .explain import ExplainMixin, analyze
+
+
+SHOPS = 20
+GOODS = 250
+USERS = 100
+
+
+class HotQueryIndexTest(ExplainMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        categories = Category.objects.bulk_create(
+            Category(name=f'Категория {number}') for number in range(10)
+        )
+        products = Product.objects.bulk_create(
+            Product(
+                name=f'Товар {number}',
+                category=categories[number % len(categories)]
+            )
+            for number in range(GOODS)
+        )
+        users = User.objects.bulk_create(
+            User(
+                username=f'user-{number}',
+                email=f'user-{number}@example.com',
+                type='shop' if number < SHOPS else 'buyer'
+            )
+            for number in range(USERS)
+        )
+        shops = Shop.objects.bulk_create(
+            Shop(name=f'Магазин {number}', user=users[number])
+            for number in range(SHOPS)
+        )
+        product_infos = ProductInfo.objects.bulk_create(
+            ProductInfo(
+                external_id=number,
+                product=product,
+                shop=shop,
+                name=product.name,
+                model='model',
+                quantity=number % 100,
+                price=(number * 7919) % 100000,
+                price_rrc=100000,
+                version=version,
+            )
+            for shop in shops
+            for version in (0, 1)
+            for number, product in enumerate(products)
+        )
+        orders = Order.objects.bulk_create(
+            Order(
+                user=users[SHOPS + number % (USERS - SHOPS)],
+                status='basket' if number % 10 == 0 else 'new'
+            )
+            for number in range(2000)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order=order,
+                product_info=product_infos[
+                    (number * 997 + index) % len(product_infos)
+                ],
+                quantity=1
+            )
+            for number, order in enumerate(orders)
+            for index in range(3)
+        )
+        for shop in shops:
+            rebuild_shop_catalog_entries(shop.id)
+        cls.shop = shops[0]
+        cls.category = categories[0]
+        cls.buyer = users[SHOPS]
+        analyze(
+            Category, Product, User, Shop, ProductInfo, Order, OrderItem,
+            CatalogEntry
+        )
+
+    def test_products_of_shop(self):
+        self.assertIndexScan(
+            ProductInfo.objects.active().filter(
+                shop_id=self.shop.id
+            ).order_by('-pk')[:101],
+            'product_info_shop_version_idx',
+            ProductInfo
+        )
+
+    def test_products_by_price(self):
+        self.assertIndexScan(
+            ProductInfo.objects.active().order_by('price', 'pk')[:101],
+            'product_info_price_id_idx',
+            ProductInfo
+        )
+
+    def test_products_of_category_by_quantity(self):
+        self.assertIndexScan(
+            ProductInfo.objects.active().filter(
+                product__category_id=self.category.id
+            ).order_by('quantity', 'pk')[:101],
+            'product_info_quantity_id_idx',
+            ProductInfo
+        )
+
+    def test_catalog_entries_of_shop(self):
+        self.assertIndexScan(
+            CatalogEntry.objects.filter(shop_id=self.shop.id).order_by(
+                '-pk'
+            )[:101],
+            'catalog_entry_shop_idx',
+            CatalogEntry
+        )
+
+    def test_product_offers(self):
+        self.assertIndexScan(
+            Product.objects.with_offers().order_by('pk')[:101],
+            'product_info_offer_idx',
+            ProductInfo
+        )
+
+    def test_product_suggest(self):
+        # shorter than a trigram, matched by prefix with or without pg_trgm
+        self.assertIndexScan(
+            suggest_queryset('то')[:10], 'product_name_prefix_idx', Product
+        )
+
+    def test_product_suggest_trigram(self):
+        if not trigram_available():
+            self.skipTest('pg_trgm is not installed')
+        self.assertIndexScan(
+            suggest_queryset('вар 1', later_words=True)[:10],
+            'product_name_trgm_idx',
+            Product
+        )
+
+    def test_basket(self):
+        self.assertIndexScan(
+            Order.objects.filter(user=self.buyer, status='basket'),
+            'order_basket_user_idx',
+            Order
+        )
+
+    def test_partner_orders(self):
+        self.assertIndexScan(
+            Order.objects.filter(
+                items__product_info__shop__user__id=self.shop.user_id
+            ).exclude(status='basket').distinct().order_by('-pk')[:101],
+            'order_item_product_info_idx',
+            OrderItem
+        )
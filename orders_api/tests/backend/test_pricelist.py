@@ -0,0 +1,215 @@
+import csv
+import io
+import json
+import types
+
+import pytest
+import yaml
+from django.conf import settings
+
+from backend.pricelist import (
+    Item,
+    PriceListError,
+    find_json_key,
+    fingerprint,
+    guess_format,
+    make_item,
+    read_price_list,
+)
+
+
+SHOP_FILE = settings.BASE_DIR.parent / 'data' / 'shop_1.yaml'
+
+GOODS = (
+    '{"id": 1, "category": 5, "model": "m", "name": "Флешка",'
+    ' "price": 10, "price_rrc": 12, "quantity": 3,'
+    ' "parameters": {"Цвет": "red"}}'
+)
+ITEM = Item(1, 5, 'm', 'Флешка', 10, 12, 3, (('Цвет', 'red'),))
+
+
+def test_read_price_list_matches_safe_load():
+    with open(SHOP_FILE) as f:
+        expected = yaml.safe_load(f)
+    with open(SHOP_FILE) as f:
+        data = read_price_list(f)
+        assert isinstance(data['goods'], types.GeneratorType)
+        data['goods'] = list(data['goods'])
+
+    expected['goods'] = [make_item(goods) for goods in expected['goods']]
+    assert data == expected
+
+
+def test_read_price_list_json():
+    document = (
+        '{"shop": "Связной", "categories": [{"id": 5, "name": "Flash"}],'
+        f' "goods": [{GOODS}]}}'
+    )
+    for format in ('yaml', 'json'):
+        data = read_price_list(io.StringIO(document), format)
+
+        assert data['shop'] == 'Связной'
+        assert isinstance(data['goods'], types.GeneratorType)
+        assert list(data['goods']) == [ITEM]
+
+
+def test_read_price_list_json_bytes():
+    stream = io.BytesIO(
+        '{"shop": "Связной", "categories": [],'
+        f' "goods": [{GOODS}, {GOODS}], "ignored": [}}'.encode('utf-8-sig')
+    )
+    data = read_price_list(stream, 'json')
+
+    assert list(data['goods']) == [ITEM, ITEM]
+
+
+def test_read_price_list_json_goods_before_header():
+    stream = io.StringIO(f'{{"goods": [{GOODS}], "shop": "Связной"}}')
+    data = read_price_list(stream, 'json')
+
+    assert data == {'goods': [ITEM], 'shop': 'Связной'}
+
+
+@pytest.mark.parametrize('document', [
+    '', '[]', '{"shop": "DNS"', '{"goods": [1 2]}'
+])
+def test_read_price_list_json_invalid(document):
+    with pytest.raises(ValueError):
+        list(read_price_list(io.StringIO(document), 'json')['goods'])
+
+
+def test_read_price_list_jsonl():
+    stream = io.BytesIO(
+        '{"shop": "Связной", "categories": []}\n'
+        f'{GOODS}\n\n{GOODS}\n'.encode()
+    )
+    data = read_price_list(stream, 'jsonl')
+
+    assert data['shop'] == 'Связной'
+    assert isinstance(data['goods'], types.GeneratorType)
+    assert list(data['goods']) == [ITEM, ITEM]
+
+
+def test_read_price_list_csv():
+    stream = io.StringIO()
+    writer = csv.writer(stream)
+    writer.writerow([
+        'id', 'category', 'category_name', 'model', 'name',
+        'price', 'price_rrc', 'quantity', 'Цвет', 'Вес',
+    ])
+    writer.writerow([1, 5, 'Flash', 'm', 'Флешка', 10, 12, 3, 'red', ''])
+    stream.seek(0)
+
+    data = read_price_list(io.BytesIO(stream.getvalue().encode()), 'csv')
+
+    assert data['shop'] is None
+    assert list(data['goods']) == [ITEM._replace(category_name='Flash')]
+
+
+def test_read_price_list_csv_missing_columns():
+    with pytest.raises(PriceListError):
+        read_price_list(io.StringIO('id,name\n1,Флешка\n'), 'csv')
+
+
+def test_price_list_formats_agree():
+    with open(SHOP_FILE) as f:
+        document = yaml.safe_load(f)
+    header = {'shop': document['shop'], 'categories': document['categories']}
+    lines = [json.dumps(header)] + [
+        json.dumps(goods) for goods in document['goods']
+    ]
+
+    expected = list(read_price_list(io.StringIO(json.dumps(document)))['goods'])
+    assert list(
+        read_price_list(io.StringIO(json.dumps(document)), 'json')['goods']
+    ) == expected
+    assert list(
+        read_price_list(io.StringIO('\n'.join(lines)), 'jsonl')['goods']
+    ) == expected
+
+
+@pytest.mark.parametrize('content_type,name,format', [
+    ('text/csv; charset=utf-8', '', 'csv'),
+    ('application/x-ndjson', 'price.yaml', 'jsonl'),
+    ('application/octet-stream', 'https://shop.example/price.JSON?v=1', 'json'),
+    ('', 'price.unknown', 'yaml'),
+])
+def test_guess_format(content_type, name, format):
+    assert guess_format(content_type, name) == format
+
+
+def test_read_price_list_goods_before_header():
+    stream = io.StringIO(
+        f'goods:\n  - {GOODS}\nshop: Связной\ncategories: []\n'
+    )
+    data = read_price_list(stream)
+
+    assert data == {'goods': [ITEM], 'shop': 'Связной', 'categories': []}
+
+
+def test_read_price_list_aliases():
+    stream = io.StringIO(
+        'shop: s\ncategories: []\ngoods:\n'
+        '  - &g {id: 1, category: 5, model: m, name: Флешка, price: 10,'
+        ' price_rrc: 12, quantity: 3, parameters: {"Цвет": red}}\n'
+        '  - *g\n'
+    )
+    goods = list(read_price_list(stream)['goods'])
+
+    assert goods == [ITEM, ITEM]
+
+
+def test_fingerprint_ignores_line_endings():
+    document = 'shop: Связной\ngoods: []\n'
+
+    assert fingerprint(io.StringIO(document)) == fingerprint(
+        io.BytesIO(document.replace('\n', '  \r\n').encode())
+    )
+    assert fingerprint(io.StringIO(document)) != fingerprint(
+        io.StringIO(document.replace('Связной', 'DNS'))
+    )
+
+
+def test_fingerprint_hashes_bytes():
+    document = 'shop: Связной\ngoods: []\n'
+
+    assert fingerprint(io.StringIO(document)) == fingerprint(
+        io.BytesIO(document.encode('utf-8-sig'))
+    )
+    # not UTF-8, hashed without decoding
+    assert fingerprint(io.BytesIO(document.encode('utf-16'))) != fingerprint(
+        io.StringIO(document)
+    )
+
+
+@pytest.mark.parametrize('chunk_size', [3, 64 * 1024])
+@pytest.mark.parametrize('document, key', [
+    ({'shop': 'DNS', 'categories': [{'id': 1}], 'goods': []}, 'goods'),
+    ({'mode': 'sync', 'force': 123, 'url': 'http://x'}, 'url'),
+    ({'mode': 'sync'}, None),
+    ([{'goods': []}], None),
+])
+def test_find_json_key(document, key, chunk_size):
+    stream = io.BytesIO(json.dumps(document).encode('utf-8-sig'))
+
+    assert find_json_key(
+        stream, ('goods', 'url', 'file'), chunk_size=chunk_size
+    ) == key
+
+
+def test_find_json_key_stops_at_key():
+    stream = io.BytesIO(b'{"shop": "DNS", "goods": [{"id": not json')
+
+    assert find_json_key(stream, ('goods',)) == 'goods'
+    assert find_json_key(io.BytesIO(b'{"shop": not json'), ('goods',)) is None
+
+
+@pytest.mark.parametrize('document', ['', '- 1\n- 2\n'])
+def test_read_price_list_invalid(document):
+    with pytest.raises(yaml.YAMLError):
+        read_price_list(io.StringIO(document))
+
+
+def test_read_price_list_unknown_format():
+    with pytest.raises(PriceListError):
+        read_price_list(io.StringIO(''), 'xml')
@@ -0,0 +1,92 @@
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework.test import APITestCase
+
+from backend.models import (
+    Category,
+    Order,
+    OrderItem,
+    ProductInfo,
+    ProductParameter,
+    Shop,
+    User,
+)
+
+from .query_budget import QueryBudgetMixin
+
+
+class ListQueryBudgetTest(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='shop',
+            email='shop@example.com',
+            password='testpass',
+            type='shop'
+        )
+        self.shop = baker.make(Shop, user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def make_product_infos(self, count):
+        for product_info in baker.make(
+            ProductInfo, shop=self.shop, _quantity=count
+        ):
+            baker.make(
+                ProductParameter, product_info=product_info, _quantity=2
+            )
+
+    def make_orders(self, count, status='new'):
+        for order in baker.make(
+            Order, user=self.user, status=status, _quantity=count
+        ):
+            baker.make(
+                OrderItem,
+                order=order,
+                product_info__shop=self.shop,
+                _quantity=2
+            )
+
+    def test_product_info_list(self):
+        self.assertQueryBudget(
+            reverse('products'), self.make_product_infos, budget=2
+        )
+
+    def test_product_info_list_filtered(self):
+        self.assertQueryBudget(
+            reverse('products'),
+            self.make_product_infos,
+            budget=3,
+            params={'shop_id': self.shop.id, 'ordering': 'price'}
+        )
+
+    def test_product_facets(self):
+        self.assertQueryBudget(
+            reverse('product-facets'), self.make_product_infos, budget=1
+        )
+
+    def test_category_list(self):
+        def make_categories(count):
+            for category in baker.make(Category, _quantity=count):
+                category.shops.add(self.shop)
+
+        self.assertQueryBudget(reverse('categories'), make_categories)
+
+    def test_shop_list(self):
+        self.assertQueryBudget(
+            '/shops/', lambda count: baker.make(Shop, _quantity=count)
+        )
+
+    def test_order_list(self):
+        # totals are annotated, the items are one prefetch
+        self.assertQueryBudget(reverse('order'), self.make_orders, budget=2)
+
+    def test_partner_order_list(self):
+        self.assertQueryBudget(
+            reverse('partner-orders'), self.make_orders, budget=2
+        )
+
+    def test_basket(self):
+        self.assertQueryBudget(
+            reverse('basket'),
+            lambda count: self.make_orders(count, status='basket'),
+            budget=2
+        )
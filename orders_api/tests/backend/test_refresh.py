@@ -0,0 +1,143 @@
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase
+from model_bakery import baker
+
+from backend.models import ImportJob, ProductInfo, Shop, User
+from backend.tasks import (
+    CATALOG_REFRESH_LOCK,
+    refresh_shop_catalog,
+    refresh_shop_catalogs,
+)
+
+
+SHOP_FILE = settings.BASE_DIR.parent / 'data' / 'shop_1.yaml'
+
+
+class PriceListHandler(BaseHTTPRequestHandler):
+    '''
+    Serves the price list of the server with ETag validation.
+    '''
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        etag = f'"{zlib.crc32(self.server.price_list)}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-yaml')
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', 'Wed, 21 Oct 2015 07:28:00 GMT')
+        self.end_headers()
+        self.wfile.write(self.server.price_list)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RefreshShopCatalogTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), PriceListHandler)
+        cls.server.requests = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.thread.join()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.requests.clear()
+        self.server.price_list = SHOP_FILE.read_bytes()
+        self.user = User.objects.create_user(
+            username='shop',
+            email='shop@example.com',
+            password='testpass',
+            type='shop'
+        )
+        self.shop = baker.make(
+            Shop,
+            name='Связной',
+            user=self.user,
+            url=f'http://127.0.0.1:{self.server.server_port}/shop_1.yaml',
+            content_hash='',
+            etag='',
+            last_modified='',
+        )
+
+    def test_refresh_imports_price_list(self):
+        self.assertEqual(refresh_shop_catalog(self.shop.id), 'done')
+
+        self.shop.refresh_from_db()
+        self.assertEqual(ProductInfo.objects.active().count(), 4)
+        self.assertEqual(
+            self.shop.etag, f'"{zlib.crc32(self.server.price_list)}"'
+        )
+        self.assertTrue(self.shop.content_hash)
+        self.assertEqual(ImportJob.objects.get().status, 'done')
+
+    def test_refresh_is_conditional(self):
+        refresh_shop_catalog(self.shop.id)
+
+        self.assertEqual(refresh_shop_catalog(self.shop.id), 'not modified')
+        self.shop.refresh_from_db()
+        self.assertEqual(
+            self.server.requests[-1]['If-None-Match'], self.shop.etag
+        )
+        self.assertEqual(ImportJob.objects.count(), 1)
+
+    def test_refresh_skips_unchanged_content(self):
+        refresh_shop_catalog(self.shop.id)
+        Shop.objects.filter(id=self.shop.id).update(etag='', last_modified='')
+
+        self.assertEqual(refresh_shop_catalog(self.shop.id), 'not modified')
+        self.assertEqual(ImportJob.objects.count(), 1)
+
+    def test_refresh_imports_changed_content(self):
+        refresh_shop_catalog(self.shop.id)
+        self.server.price_list = self.server.price_list.replace(
+            b'price: 110000', b'price: 100000'
+        )
+
+        self.assertEqual(refresh_shop_catalog(self.shop.id), 'done')
+        self.assertEqual(
+            ProductInfo.objects.active().get(external_id=4216292).price,
+            100000
+        )
+
+    def test_refresh_runs_once_per_shop(self):
+        # another worker's database session holds the shop's lock
+        other = connections.create_connection(DEFAULT_DB_ALIAS)
+        keys = (CATALOG_REFRESH_LOCK, self.shop.id)
+        try:
+            with other.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_lock(%s, %s)', keys)
+                self.assertEqual(
+                    refresh_shop_catalog(self.shop.id), 'locked'
+                )
+                cursor.execute('SELECT pg_advisory_unlock(%s, %s)', keys)
+        finally:
+            other.close()
+        self.assertEqual(self.server.requests, [])
+
+        refresh_shop_catalog(self.shop.id)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_refresh_shop_catalogs_queues_active_shops(self):
+        baker.make(Shop, status=False, url='http://127.0.0.1/off.yaml')
+        baker.make(Shop, status=True, url='')
+
+        with mock.patch.object(refresh_shop_catalog, 'delay') as delay:
+            self.assertEqual(refresh_shop_catalogs(), 1)
+        delay.assert_called_once_with(self.shop.id)